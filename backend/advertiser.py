@@ -1,17 +1,25 @@
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException, Response, Depends
 from pydantic import BaseModel
 from typing import Dict
-from sentence_transformers import SentenceTransformer, util
-import torch
+import asyncio
 import logging
-import requests
-import re
 import urllib3
 import warnings
 import ssl
 from urllib.parse import urlparse
 from exa_agent import exa_agent, QueryRequest as ExaQueryRequest
 from imggen import image_gen_service, AdCampaignRequest
+from page_fetcher import fetch_basic_html, describe_fetch_error, load_snapshot
+from page_document import PageDocument
+from site_features import site_features
+from embedding_cache import embedding_cache
+from encoders import metric_encoder
+from batching import get_batcher
+from metric_matcher import MetricMatcher
+from query_cache import QueryCache
+from query_router import KeywordTrie, TwoStageRouter, synonyms_from_keywords
+import stats
+from warmup import warmup
 
 # Disable SSL warnings for competitive analysis
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -19,18 +27,25 @@ warnings.filterwarnings('ignore', message='Unverified HTTPS request')
 import json
 import os
 
-# Initialize Gemini AI
-try:
-    import google.generativeai as genai
+# Gemini AI is configured during warm-up (see initialize_services)
+GEMINI_AVAILABLE = False
+gemini_model = None
+
+def initialize_services():
+    """Initialize the Gemini client used for competitive analysis."""
+    global GEMINI_AVAILABLE, gemini_model
     
-    # Configure Gemini API
-    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', 'your-gemini-api-key-here')
-    genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel('gemini-pro')
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-    print("Google Generative AI not installed. Gemini features will be disabled.")
+    try:
+        import google.generativeai as genai
+        
+        # Configure Gemini API
+        GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', 'your-gemini-api-key-here')
+        genai.configure(api_key=GEMINI_API_KEY)
+        gemini_model = genai.GenerativeModel('gemini-pro')
+        GEMINI_AVAILABLE = True
+    except ImportError:
+        GEMINI_AVAILABLE = False
+        print("Google Generative AI not installed. Gemini features will be disabled.")
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -38,9 +53,6 @@ logger = logging.getLogger(__name__)
 # Initialize router
 router = APIRouter()
 
-# Load the model at startup (shared across services)
-model = SentenceTransformer('all-MiniLM-L6-v2')
-
 class UserQuery(BaseModel):
     query: str
 
@@ -48,6 +60,9 @@ class CompetitiveIntelligenceRequest(BaseModel):
     query: str
     my_website: str = None
     competitor_website: str = None
+    # Stored page snapshots to analyze instead of fetching the live sites
+    my_snapshot_id: str = None
+    competitor_snapshot_id: str = None
 
 # Advertiser data endpoints
 @router.get("/impressions")
@@ -172,6 +187,10 @@ ADVERTISER_METRICS = {
     "roi": "ROI / ROAS"
 }
 
+# Keywords that name one metric outright (lexical routing stage); generic ones
+# that name no single metric are left to the embedding stage
+ADVERTISER_SYNONYMS = synonyms_from_keywords(ADVERTISER_KEYWORDS, ADVERTISER_METRICS)
+
 # Function mapping for advertiser
 ADVERTISER_FUNCTION_MAP = {
     "impressions": get_impressions,
@@ -184,13 +203,35 @@ ADVERTISER_FUNCTION_MAP = {
     "roi": get_roi
 }
 
-# Pre-compute embeddings
-advertiser_keywords_embeddings = model.encode(ADVERTISER_KEYWORDS)
+# Embeddings are computed during warm-up (see load_metric_embeddings)
 advertiser_metric_texts = [f"{key}: {desc}" for key, desc in ADVERTISER_METRICS.items()]
 advertiser_metric_keys = list(ADVERTISER_METRICS.keys())
-advertiser_metric_embeddings = model.encode(advertiser_metric_texts)
+advertiser_metric_embeddings = None
+advertiser_matcher = None
+
+# Cache of normalized chat query -> (matched metric, similarity)
+advertiser_query_cache = QueryCache.from_env()
+stats.register("advertiser_query_cache", advertiser_query_cache.get_stats)
+
+# Lexical fast path -> query cache -> embedding matcher
+advertiser_query_router = TwoStageRouter(
+    "advertiser",
+    KeywordTrie.from_catalogue(advertiser_metric_keys, ADVERTISER_SYNONYMS),
+    advertiser_query_cache
+)
+stats.register("advertiser_query_router", advertiser_query_router.get_stats)
+
+def load_metric_embeddings():
+    """Load metric embeddings from the on-disk cache (encoding only new texts)."""
+    global advertiser_metric_embeddings, advertiser_matcher
+    
+    advertiser_metric_embeddings = embedding_cache.encode(advertiser_metric_texts)
+    advertiser_matcher = MetricMatcher(advertiser_metric_keys, advertiser_metric_embeddings)
+    phrases = [phrase for phrase, _ in advertiser_query_router.trie.phrase_list()]
+    advertiser_query_router.set_phrase_similarities(advertiser_matcher, embedding_cache.encode(phrases))
+    advertiser_query_cache.clear()
 
-@router.post("/exa-competitive-intelligence")
+@router.post("/exa-competitive-intelligence", dependencies=[Depends(warmup.require("advertiser"))])
 async def exa_competitive_intelligence(request: ExaQueryRequest):
     """Get AI-powered competitive intelligence using Exa web search."""
     logger.info(f"Advertiser Exa competitive intelligence request: {request.query}")
@@ -307,120 +348,76 @@ Focus on actionable, data-driven insights that will help improve competitive pos
             "fallback_insights": "Using basic competitive analysis only"
         }
 
-@router.post("/competitive-intelligence")
+@router.post("/competitive-intelligence", dependencies=[Depends(warmup.require("advertiser"))])
 async def competitive_intelligence_comparison(request: CompetitiveIntelligenceRequest):
     """Perform detailed competitive intelligence comparison between two websites."""
     logger.info(f"Competitive intelligence comparison: {request.my_website} vs {request.competitor_website}")
     
     try:
-        # Import needed modules at the top level
-        import requests
-        import re
-        from urllib.parse import urlparse
-        
         # Function to fetch and analyze website with comprehensive metrics
-        def analyze_website(url: str) -> dict:
+        async def analyze_website(url: str, snapshot_id: str = None) -> dict:
             try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) ApeleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                }
+                if snapshot_id:
+                    snapshot = await load_snapshot(snapshot_id)
+                    url = snapshot.url
+                    html = snapshot.html
+                else:
+                    # Shared pooled client and page cache (certificate checks are skipped as before)
+                    html, _, _ = await fetch_basic_html(url)
                 
-                # Handle SSL warnings and timeout
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore", urllib3.exceptions.InsecureRequestWarning)
-                    response = requests.get(url, headers=headers, timeout=30, verify=False)
-                    response.raise_for_status()
-                html = response.text
+                features = await site_features.extract_async(PageDocument(html, url))
                 
                 # Enhanced content analysis
-                text_content = re.sub(r'<[^>]+>', ' ', html)  # Replace tags with spaces
-                text_content = re.sub(r'\s+', ' ', text_content).strip()  # Normalize whitespace
-                words = text_content.split()
-                word_count = len(words)
-                char_count = len(text_content)
+                word_count = features["word_count"]
+                char_count = features["char_count"]
                 
                 # Advanced SEO analysis
-                title_match = re.search(r'<title[^>]*>(.*?)</title>', html, re.IGNORECASE | re.DOTALL)
-                title = title_match.group(1).strip() if title_match else "No title found"
+                title = features["title"] if features["title"] is not None else "No title found"
                 title_length = len(title)
                 
-                # Multiple meta description patterns
-                meta_desc_patterns = [
-                    r'<meta[^>]*name=["\']description["\'][^>]*content=["\']([^"\'>]*)["\']',
-                    r'<meta[^>]*content=["\']([^"\'>]*)["\'][^>]*name=["\']description["\']',
-                    r'<meta[^>]*property=["\']og:description["\'][^>]*content=["\']([^"\'>]*)["\']'
-                ]
-                meta_description = "No meta description"
-                for pattern in meta_desc_patterns:
-                    match = re.search(pattern, html, re.IGNORECASE)
-                    if match:
-                        meta_description = match.group(1).strip()
-                        break
+                meta_description = features["meta_description"] if features["meta_description"] is not None else "No meta description"
                 meta_desc_length = len(meta_description)
                 
                 # Comprehensive heading analysis
-                h1_matches = re.findall(r'<h1[^>]*>(.*?)</h1>', html, re.IGNORECASE | re.DOTALL)
-                h2_matches = re.findall(r'<h2[^>]*>(.*?)</h2>', html, re.IGNORECASE | re.DOTALL)
-                h3_matches = re.findall(r'<h3[^>]*>(.*?)</h3>', html, re.IGNORECASE | re.DOTALL)
-                
-                h1_count = len(h1_matches)
-                h2_count = len(h2_matches)
-                h3_count = len(h3_matches)
+                headings = features["heading_counts"]
+                h1_count = headings["h1"]
+                h2_count = headings["h2"]
+                h3_count = headings["h3"]
                 total_headings = h1_count + h2_count + h3_count
                 
-                h1_text = [re.sub(r'<[^>]+>', '', h1).strip() for h1 in h1_matches]
+                h1_text = features["h1_text"]
                 
                 # Enhanced technical analysis
-                link_count = len(re.findall(r'<a\s+[^>]*href=', html, re.IGNORECASE))
-                external_links = len(re.findall(r'<a\s+[^>]*href=["\'][^"\'>]*://(?!(?:www\.)?%s)' % re.escape(urlparse(url).netloc.replace('www.', '')), html, re.IGNORECASE))
+                link_count = features["link_count"]
+                external_links = features["external_link_count"]
                 internal_links = max(0, link_count - external_links)
                 
-                image_count = len(re.findall(r'<img\s+[^>]*src=', html, re.IGNORECASE))
-                alt_text_images = len(re.findall(r'<img[^>]*alt=["\'][^"\'>]+["\']', html, re.IGNORECASE))
+                image_count = features["image_count"]
+                alt_text_images = features["image_alt_count"]
                 image_seo_score = (alt_text_images / image_count * 100) if image_count > 0 else 0
                 
                 # Social media and contact analysis
-                social_patterns = {
-                    'facebook': r'(?:facebook\.com|fb\.com)',
-                    'twitter': r'(?:twitter\.com|x\.com)',
-                    'linkedin': r'linkedin\.com',
-                    'instagram': r'instagram\.com',
-                    'youtube': r'youtube\.com',
-                    'tiktok': r'tiktok\.com',
-                    'pinterest': r'pinterest\.com'
-                }
-                
-                social_presence = {}
-                total_social_mentions = 0
-                for platform, pattern in social_patterns.items():
-                    mentions = len(re.findall(pattern, html, re.IGNORECASE))
-                    social_presence[platform] = mentions
-                    total_social_mentions += mentions
+                social_presence = features["social_presence"]
+                total_social_mentions = sum(social_presence.values())
                 
                 # Enhanced ad and monetization analysis
-                ad_patterns = [
-                    r'google-ads', r'adsystem', r'doubleclick', r'adsense', 
-                    r'advertisement', r'sponsored', r'adnxs', r'amazon-adsystem',
-                    r'googlesyndication', r'googletagmanager', r'facebook\.net',
-                    r'outbrain', r'taboola', r'media\.net'
-                ]
-                ad_indicators = sum(len(re.findall(pattern, html, re.IGNORECASE)) for pattern in ad_patterns)
+                ad_indicators = sum(features["ad_tags"].values())
                 
                 # Performance and technical indicators
-                script_count = len(re.findall(r'<script[^>]*>', html, re.IGNORECASE))
-                external_scripts = len(re.findall(r'<script[^>]*src=["\'][^"\'>]*://(?!(?:www\.)?%s)' % re.escape(urlparse(url).netloc.replace('www.', '')), html, re.IGNORECASE))
+                script_count = features["script_count"]
+                external_scripts = features["external_script_count"]
                 
-                css_count = len(re.findall(r'<link[^>]*rel=["\']stylesheet["\']', html, re.IGNORECASE))
-                external_css = len(re.findall(r'<link[^>]*rel=["\']stylesheet["\'][^>]*href=["\'][^"\'>]*://(?!(?:www\.)?%s)' % re.escape(urlparse(url).netloc.replace('www.', '')), html, re.IGNORECASE))
+                css_count = features["stylesheet_count"]
+                external_css = features["external_stylesheet_count"]
                 
                 # Content quality indicators
-                paragraphs = len(re.findall(r'<p[^>]*>', html, re.IGNORECASE))
-                lists = len(re.findall(r'<(?:ul|ol)[^>]*>', html, re.IGNORECASE))
-                forms = len(re.findall(r'<form[^>]*>', html, re.IGNORECASE))
+                paragraphs = features["paragraph_count"]
+                lists = features["list_count"]
+                forms = features["form_count"]
                 
                 # Mobile and responsive indicators
-                viewport_meta = len(re.findall(r'<meta[^>]*name=["\']viewport["\']', html, re.IGNORECASE)) > 0
-                responsive_images = len(re.findall(r'<img[^>]*(?:srcset|sizes)=', html, re.IGNORECASE))
+                viewport_meta = features["has_viewport_meta"]
+                responsive_images = features["responsive_image_count"]
                 
                 # Calculate SEO score (0-100)
                 seo_factors = {
@@ -482,13 +479,18 @@ async def competitive_intelligence_comparison(request: CompetitiveIntelligenceRe
                 logger.error(f"Website analysis failed for {url}: {e}")
                 return {
                     "url": url,
-                    "error": f"Analysis failed: {str(e)}",
+                    "error": f"Analysis failed: {describe_fetch_error(e)}",
                     "domain": urlparse(url).netloc if url else "unknown"
                 }
         
         # Analyze both websites
-        my_analysis = analyze_website(request.my_website) if request.my_website else None
-        competitor_analysis = analyze_website(request.competitor_website) if request.competitor_website else None
+        async def analyze_optional(url, snapshot_id):
+            return await analyze_website(url, snapshot_id) if url or snapshot_id else None
+        
+        my_analysis, competitor_analysis = await asyncio.gather(
+            analyze_optional(request.my_website, request.my_snapshot_id),
+            analyze_optional(request.competitor_website, request.competitor_snapshot_id)
+        )
         
         # Generate comprehensive competitive insights
         if my_analysis and competitor_analysis and 'error' not in my_analysis and 'error' not in competitor_analysis:
@@ -788,7 +790,7 @@ async def competitive_intelligence_comparison(request: CompetitiveIntelligenceRe
         logger.error(f"Competitive intelligence comparison failed: {e}")
         raise HTTPException(status_code=500, detail=f"Competitive intelligence comparison failed: {str(e)}")
 
-@router.post("/analyze-campaign")
+@router.post("/analyze-campaign", dependencies=[Depends(warmup.require("advertiser"))])
 async def analyze_campaign(request: AdCampaignRequest):
     """Analyze ad campaign data with AI insights."""
     logger.info(f"Advertiser campaign analysis request for domain: {request.domain}")
@@ -809,7 +811,7 @@ async def analyze_campaign(request: AdCampaignRequest):
         logger.error(f"Campaign analysis failed: {e}")
         raise HTTPException(status_code=500, detail=f"Campaign analysis failed: {str(e)}")
 
-@router.post("/generate-banner-concept")
+@router.post("/generate-banner-concept", dependencies=[Depends(warmup.require("advertiser"))])
 async def generate_banner_concept(request: AdCampaignRequest):
     """Generate banner concept and creative suggestions."""
     logger.info(f"Banner concept generation request for {request.banner_size} banner")
@@ -830,7 +832,7 @@ async def generate_banner_concept(request: AdCampaignRequest):
         logger.error(f"Banner concept generation failed: {e}")
         raise HTTPException(status_code=500, detail=f"Banner concept generation failed: {str(e)}")
 
-@router.post("/generate-banner-image")
+@router.post("/generate-banner-image", dependencies=[Depends(warmup.require("advertiser"))])
 async def generate_banner_image(request: AdCampaignRequest):
     """Generate actual banner image file."""
     logger.info(f"Banner image generation request for {request.banner_size} banner")
@@ -844,7 +846,16 @@ async def generate_banner_image(request: AdCampaignRequest):
         logger.error(f"Banner image generation failed: {e}")
         raise HTTPException(status_code=500, detail=f"Banner image generation failed: {str(e)}")
 
-@router.post("/query")
+async def _embedding_scores(query: str):
+    """Embedding stage of the query router: encode (batched) and score every metric."""
+    if advertiser_matcher is None:
+        # Encoding the catalogue takes seconds; keep it off the event loop
+        await asyncio.to_thread(load_metric_embeddings)
+    
+    query_embedding = await get_batcher(metric_encoder).encode(query)
+    return advertiser_matcher.scores(query_embedding)
+
+@router.post("/query", dependencies=[Depends(warmup.require("advertiser"))])
 async def handle_advertiser_query(user_query: UserQuery):
     """Handle natural language queries for advertiser metrics."""
     query = user_query.query.lower()
@@ -853,16 +864,12 @@ async def handle_advertiser_query(user_query: UserQuery):
     if query in advertiser_metric_keys:
         result = ADVERTISER_FUNCTION_MAP[query]()
     else:
-        # Semantic search for metric
-        query_embedding = model.encode(query)
-        metric_similarities = util.cos_sim(query_embedding, advertiser_metric_embeddings)[0]
-        max_similarity_idx = torch.argmax(metric_similarities).item()
-        max_similarity = metric_similarities[max_similarity_idx].item()
+        # Keyword fast path, then semantic search for metric
+        found_metric, max_similarity, stage = await advertiser_query_router.route(query, _embedding_scores)
 
-        if max_similarity < 0.3:  # Threshold for minimum relevance
+        if stage != "lexical" and max_similarity < 0.3:  # Threshold for minimum relevance (a named metric needs none)
             return {"error": "No matching advertiser metric found. Try asking about impressions, clicks, conversions, CPC, CPM, CPA, spend, or ROI."}
 
-        found_metric = advertiser_metric_keys[max_similarity_idx]
         result = ADVERTISER_FUNCTION_MAP[found_metric]()
     
     # Add chart context
@@ -877,6 +884,7 @@ def advertiser_info():
     return {
         "service": "advertiser",
         "description": "Advertiser campaign metrics and performance data",
+        "readiness": warmup.router_status("advertiser"),
         "available_metrics": list(ADVERTISER_METRICS.keys()),
         "endpoints": {
             "/query": "Natural language query endpoint",
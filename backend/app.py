@@ -1,18 +1,65 @@
+# Installed before any other import so module import times are captured (STARTUP_PROFILE=1)
+import startup_profile
+startup_profile.install_from_env()
+from startup_profile import startup_profiler
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+import publisher
+import advertiser
 from publisher import router as publisher_router
 from advertiser import router as advertiser_router
-from ragengine import router as rag_router
-from keywordanalysis import router as keyword_router
+from ragengine import router as rag_router, rag_engine
+from keywordanalysis import router as keyword_router, keyword_analysis_service
+from imggen import image_gen_service
 from exa_agent import exa_agent
+from encoders import metric_encoder
+from warmup import warmup
+from browser_pool import browser_pool
+from http_client import http_client
+from cpu_pool import cpu_pool
+import batching
+import stats
 import os
 
+# --- Background warm-up (runs in this order after the server starts) ---
+warmup.register("publisher_embeddings", publisher.load_metric_embeddings)
+warmup.register("advertiser_embeddings", advertiser.load_metric_embeddings)
+warmup.register("metric_encoder", metric_encoder.load, fork_safe=metric_encoder.fork_safe)
+warmup.register("publisher_services", publisher.initialize_services, fork_safe=False)
+warmup.register("advertiser_services", advertiser.initialize_services, fork_safe=False)
+warmup.register("exa_agent", exa_agent.initialize, fork_safe=False)
+warmup.register("rag_engine", rag_engine.initialize, fork_safe=False)
+warmup.register("keyword_analysis", keyword_analysis_service.initialize, fork_safe=False)
+warmup.register("image_generation", image_gen_service.initialize, fork_safe=False)
+
+warmup.declare_router("publisher", ["metric_encoder", "publisher_embeddings", "publisher_services", "exa_agent"])
+warmup.declare_router("advertiser", ["metric_encoder", "advertiser_embeddings", "advertiser_services", "exa_agent", "image_generation"])
+warmup.declare_router("rag", ["rag_engine"])
+warmup.declare_router("keyword", ["keyword_analysis"])
+
+startup_profiler.log_report("imports")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	http_client.start()
+	warmup.start().add_done_callback(lambda _: startup_profiler.log_report("warm-up"))
+	yield
+	await warmup.stop()
+	await batching.stop_all()
+	await browser_pool.stop()
+	await http_client.stop()
+	cpu_pool.stop()
+
 # --- FastAPI setup ---
 app = FastAPI(
 	title="MediaNet API",
 	description="Publisher and Advertiser Analytics API",
 	version="3.0",
+	lifespan=lifespan,
 )
 
 # --- CORS (adjust origins for your deployment) ---
@@ -41,8 +88,6 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # --- Health endpoints ---
 @app.get("/")
 async def health_check():
-	from ragengine import rag_engine
-	
 	exa_status = "available" if exa_agent.exa_client and exa_agent.gemini_model else "unavailable"
 	rag_status = "available" if rag_engine.is_initialized else "unavailable"
 	
@@ -51,6 +96,7 @@ async def health_check():
 		"services": ["publisher", "advertiser", "rag", "keyword"], 
 		"exa_agent": exa_status,
 		"rag_engine": rag_status,
+		"readiness": warmup.report()["routers"],
 		"features": {
 			"publisher": ["analytics", "website_analysis", "content_strategy"],
 			"advertiser": ["analytics", "competitive_intelligence", "banner_generation"],
@@ -63,6 +109,20 @@ async def health_check():
 async def health():
 	return {"status": "ok"}
 
+@app.get("/ready")
+async def ready():
+	report = warmup.report()
+	warming = any(status == "warming" for status in report["routers"].values())
+	return JSONResponse(status_code=503 if warming else 200, content=report)
+
+@app.get("/debug/stats")
+async def debug_stats():
+	return stats.snapshot()
+
+@app.get("/debug/startup")
+async def debug_startup():
+	return startup_profiler.report()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
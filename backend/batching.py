@@ -0,0 +1,146 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+import stats
+from stats import Histogram
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_SIZE = int(os.getenv("ENCODER_BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("ENCODER_BATCH_MAX_WAIT_MS", "5"))
+
+class MicroBatchEncoder:
+    """
+    Asyncio micro-batcher in front of a sentence encoder.
+    Concurrent single-sentence requests are collected for up to
+    max_wait_ms or max_batch_size items, encoded in one batched call on a
+    worker thread, and the rows are fanned back out to the callers.
+    """
+
+    def __init__(self, encoder, max_batch_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.encoder = encoder
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_wait_ms = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100, 250])
+        self.encode_ms = Histogram([1, 2, 5, 10, 25, 50, 100, 250, 500])
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Encode one sentence, sharing a forward pass with concurrent callers."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        """Fill batch in place, so items already taken off the queue are visible to _run if cancelled."""
+        batch.append(await self._queue.get())
+        deadline = self._loop.time() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Take whatever else is already queued, up to the batch limit
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _run(self):
+        while True:
+            batch: List[Tuple[str, asyncio.Future, float]] = []
+            try:
+                await self._collect(batch)
+                await self._encode_batch(batch)
+            except asyncio.CancelledError:
+                # The encode thread cannot be interrupted; its callers must not wait on it forever
+                self._cancel_futures(future for _, future, _ in batch)
+                raise
+
+    async def _encode_batch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        started = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for _, _, enqueued in batch:
+            self.queue_wait_ms.observe((started - enqueued) * 1000)
+
+        try:
+            vectors = await asyncio.to_thread(self.encoder.encode, [text for text, _, _ in batch])
+        except Exception as e:
+            logger.error(f"Batched encode of {len(batch)} sentences failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.encode_ms.observe((time.perf_counter() - started) * 1000)
+
+        for (_, future, _), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    @staticmethod
+    def _cancel_futures(futures):
+        for future in futures:
+            if not future.done():
+                future.cancel()
+
+    async def stop(self):
+        """Stop the worker task; callers in the in-flight batch and still queued are cancelled."""
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        if self._queue is not None:
+            queued = []
+            while not self._queue.empty():
+                queued.append(self._queue.get_nowait()[1])
+            self._cancel_futures(queued)
+        self._worker = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "encoder": self.encoder.cache_key,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "encode_ms": self.encode_ms.snapshot()
+        }
+
+# One batcher per encoder cache key, so callers sharing a model share batches
+_batchers: Dict[str, MicroBatchEncoder] = {}
+
+def get_batcher(encoder) -> MicroBatchEncoder:
+    """Return the shared micro-batcher for an encoder."""
+    batcher = _batchers.get(encoder.cache_key)
+    if batcher is None:
+        batcher = _batchers[encoder.cache_key] = MicroBatchEncoder(encoder)
+    return batcher
+
+async def stop_all():
+    """Stop every batcher worker (called on app shutdown)."""
+    for batcher in list(_batchers.values()):
+        await batcher.stop()
+
+stats.register("encoder_batchers", lambda: {key: b.get_stats() for key, b in _batchers.items()})
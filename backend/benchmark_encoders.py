@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark the metric-router encoder backends (torch vs ONNX int8)
+
+Reports single-query latency, batched throughput, embedding agreement and
+routing agreement (same metric chosen, same accept/reject at the 0.3
+threshold) for the publisher and advertiser metric catalogues.
+
+Usage: python benchmark_encoders.py [--backends torch,onnx] [--runs 200]
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from encoders import create_encoder
+from publisher import publisher_metric_texts
+from advertiser import advertiser_metric_texts
+
+SIMILARITY_THRESHOLD = 0.3
+
+SAMPLE_QUERIES = [
+    "show revenue", "what's my rpm", "clicks today", "how many impressions did we get",
+    "earnings this month", "ecpm trend", "traffic by country", "mobile vs desktop split",
+    "site wise earnings", "how much money did I make", "ad views last week", "click through rate",
+    "how much did I spend", "cost per click", "what is my roas", "return on investment",
+    "sign ups from the campaign", "purchases completed", "cost per thousand impressions",
+    "cost per acquisition this week", "total budget used", "conversion funnel", "ad spend breakdown",
+    "how is my campaign doing", "weather in paris", "tell me a joke", "best pizza nearby",
+    "which device do readers use", "revenue per mille", "where do my visitors come from"
+]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def normalize(embeddings):
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+def route(query_embeddings, metric_embeddings):
+    """Return (best index, best similarity) per query, as the routers compute it."""
+    similarities = normalize(query_embeddings) @ normalize(metric_embeddings).T
+    best = similarities.argmax(axis=1)
+    return best, similarities[np.arange(len(best)), best]
+
+def benchmark_backend(name, runs):
+    encoder = create_encoder(name)
+    start = time.perf_counter()
+    encoder.load()
+    load_seconds = time.perf_counter() - start
+    encoder.encode(["warm up"])
+
+    latencies = []
+    for i in range(runs):
+        query = SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]
+        start = time.perf_counter()
+        encoder.encode([query])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    batch = SAMPLE_QUERIES * 4
+    start = time.perf_counter()
+    for _ in range(5):
+        encoder.encode(batch)
+    throughput = len(batch) * 5 / (time.perf_counter() - start)
+
+    return encoder, {
+        "load_s": load_seconds,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+        "throughput_qps": throughput
+    }
+
+def compare_routing(reference, candidate, metric_texts):
+    ref_best, ref_sim = route(reference.encode(SAMPLE_QUERIES), reference.encode(metric_texts))
+    cand_best, cand_sim = route(candidate.encode(SAMPLE_QUERIES), candidate.encode(metric_texts))
+    ref_accept = ref_sim >= SIMILARITY_THRESHOLD
+    cand_accept = cand_sim >= SIMILARITY_THRESHOLD
+    agree = (ref_accept == cand_accept) & (~ref_accept | (ref_best == cand_best))
+    return float(agree.mean()), float(np.abs(ref_sim - cand_sim).max())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="torch,onnx")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    print(f"🧪 Benchmarking encoder backends: {', '.join(backends)} ({args.runs} single-query runs)\n")
+
+    encoders = {}
+    print(f"{'backend':<12}{'load s':>9}{'p50 ms':>9}{'p95 ms':>9}{'batch q/s':>12}")
+    for name in backends:
+        encoder, result = benchmark_backend(name, args.runs)
+        encoders[name] = encoder
+        print(f"{name:<12}{result['load_s']:>9.2f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['throughput_qps']:>12.1f}")
+
+    reference_name = backends[0]
+    reference = encoders[reference_name]
+    for name in backends[1:]:
+        candidate = encoders[name]
+        cosines = np.sum(
+            normalize(reference.encode(SAMPLE_QUERIES)) * normalize(candidate.encode(SAMPLE_QUERIES)),
+            axis=1
+        )
+        print(f"\n📊 {name} vs {reference_name}")
+        print(f"   Embedding cosine: mean {cosines.mean():.4f}, min {cosines.min():.4f}")
+        for label, texts in (("publisher", publisher_metric_texts), ("advertiser", advertiser_metric_texts)):
+            agreement, max_delta = compare_routing(reference, candidate, texts)
+            print(f"   {label:<11} routing agreement {agreement * 100:.1f}%, max similarity delta {max_delta:.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark the single-pass tag scanner against the per-counter regexes
+
+Times html_features.scan_tags and scan_tags_regex on synthetic pages of
+increasing size (or on HTML files given on the command line), checks that
+both return identical counts, and prints the speedup.
+
+Usage: python benchmark_html_features.py [--runs 20] [page.html ...]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from html_features import scan_tags, scan_tags_regex
+
+DOMAIN = "example.com"
+
+BLOCKS = [
+    '<div class="card"><h2>Story headline</h2><p>Some paragraph text about the story, with a '
+    '<a href="https://www.example.com/story">link</a> and <a href="https://partner.org/x">another</a>.</p></div>',
+    '<img src="/img/a.jpg" alt="Photo" srcset="/img/a-2x.jpg 2x" loading="lazy">',
+    '<img src="https://cdn.images.net/b.png">',
+    '<script src="https://www.googletagmanager.com/gtm.js?id=GTM-1" async></script>',
+    '<script>window.dataLayer = window.dataLayer || []; function gtag(){dataLayer.push(arguments);}</script>',
+    '<link rel="stylesheet" href="https://fonts.googleapis.com/css?family=Roboto">',
+    '<link rel="preload" href="/static/app.css" as="style">',
+    '<ul class="nav"><li><a href="/">Home</a></li><li><a href="/about">About</a></li></ul>',
+    '<form action="/search" method="get"><input type="text" name="q"><button>Go</button></form>',
+    '<iframe src="https://googleads.g.doubleclick.net/pagead/ads?client=ca-pub-1" width="300" height="250"></iframe>',
+    '<section><p>Plain text paragraph with no markup inside it at all, just words for the reader.</p></section>',
+    '<script>!function(e,t){var n=e.adsbygoogle=e.adsbygoogle||[];' + 'n.push({slot:"1234",sizes:[[300,250]]});' * 40
+    + 'if(t.readyState!=="loading"){n.push({})}}(window,document);</script>'
+]
+
+def synthetic_page(blocks: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    head = ('<html><head><title>Benchmark page</title><meta name="viewport" content="width=device-width">'
+            '<meta name="description" content="A synthetic page"></head><body>')
+    return head + "".join(rng.choice(BLOCKS) for _ in range(blocks)) + "</body></html>"
+
+def time_ms(function, html, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(html, DOMAIN)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("files", nargs="*", help="HTML files to benchmark instead of synthetic pages")
+    args = parser.parse_args()
+
+    if args.files:
+        pages = [(path, open(path, encoding="utf-8", errors="replace").read()) for path in args.files]
+    else:
+        pages = [(f"synthetic x{blocks}", synthetic_page(blocks)) for blocks in (100, 1000, 10000)]
+
+    print(f"{'page':<24} {'KiB':>8} {'regex ms':>10} {'scan ms':>10} {'speedup':>8}  match")
+    for name, html in pages:
+        reference = scan_tags_regex(html, DOMAIN)
+        result = scan_tags(html, DOMAIN)
+        match = reference.tags == result.tags and reference.external == result.external
+        regex_ms = time_ms(scan_tags_regex, html, args.runs)
+        scan_ms = time_ms(scan_tags, html, args.runs)
+        print(f"{name[-24:]:<24} {len(html) / 1024:>8.0f} {regex_ms:>10.2f} {scan_ms:>10.2f} "
+              f"{regex_ms / scan_ms:>7.1f}x  {'yes' if match else 'NO'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any
+
+import stats
+from http_client import USER_AGENT
+from stats import Histogram
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_POOL_MAX_PAGES", "4"))
+BROWSER_RECYCLE_AFTER = int(os.getenv("BROWSER_POOL_RECYCLE_AFTER", "200"))
+
+def launch_options() -> Dict[str, Any]:
+    """Chromium launch options shared by every pooled browser."""
+    options = {
+        'headless': True,
+        'args': [
+            '--no-sandbox',
+            '--disable-dev-shm-usage',
+            '--disable-gpu',
+            '--disable-software-rasterizer',
+            '--disable-background-timer-throttling',
+            '--disable-backgrounding-occluded-windows',
+            '--disable-renderer-backgrounding',
+            '--disable-web-security',
+            '--disable-features=VizDisplayCompositor'
+        ]
+    }
+    if sys.platform == "win32":
+        options['args'].extend([
+            '--disable-extensions',
+            '--no-first-run',
+            '--disable-default-apps'
+        ])
+    return options
+
+class _PooledBrowser:
+    """A launched browser plus the bookkeeping needed to recycle it."""
+
+    def __init__(self, browser, generation: int):
+        self.browser = browser
+        self.generation = generation
+        self.pages_opened = 0
+        self.active = 0
+        self.retiring = False
+
+    @property
+    def alive(self) -> bool:
+        return self.browser.is_connected()
+
+class BrowserPool:
+    """
+    Long-lived Chromium shared by all rendered fetches.
+    Each page gets its own fresh context (isolated cookies/storage), the
+    number of concurrent pages is capped by a semaphore, a crashed browser
+    is relaunched on the next request, and a browser is retired after
+    recycle_after pages to bound renderer memory growth.
+    """
+
+    def __init__(self, max_pages: int = BROWSER_MAX_PAGES, recycle_after: int = BROWSER_RECYCLE_AFTER):
+        self.max_pages = max(1, max_pages)
+        self.recycle_after = max(1, recycle_after)
+        self._playwright = None
+        self._current: Optional[_PooledBrowser] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._generation = 0
+        self.launches = 0
+        self.crashes = 0
+        self.recycles = 0
+        self.pages_served = 0
+        self.page_wait_ms = Histogram([1, 5, 10, 50, 100, 500, 1000, 5000])
+        self.launch_ms = Histogram([100, 250, 500, 1000, 2000, 5000])
+
+    def _bind_loop(self):
+        # Playwright objects belong to the loop that created them
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_pages)
+            self._lock = asyncio.Lock()
+            self._playwright = None
+            self._current = None
+
+    async def _acquire_browser(self) -> _PooledBrowser:
+        async with self._lock:
+            current = self._current
+            if current is not None and not current.alive:
+                self.crashes += 1
+                logger.warning(f"⚠️ Pooled browser #{current.generation} disconnected; relaunching")
+                self._current = current = None
+            if current is None:
+                current = self._current = await self._launch()
+            current.pages_opened += 1
+            current.active += 1
+            if current.pages_opened >= self.recycle_after:
+                # Later pages go to a fresh browser; this one closes once idle
+                current.retiring = True
+                self._current = None
+                self.recycles += 1
+            return current
+
+    async def _launch(self) -> _PooledBrowser:
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+        start = time.perf_counter()
+        browser = await self._playwright.chromium.launch(**launch_options())
+        self.launch_ms.observe((time.perf_counter() - start) * 1000)
+        self._generation += 1
+        self.launches += 1
+        logger.info(f"✅ Launched pooled browser #{self._generation}")
+        return _PooledBrowser(browser, self._generation)
+
+    async def _release_browser(self, pooled: _PooledBrowser):
+        pooled.active -= 1
+        if pooled.retiring and pooled.active == 0:
+            logger.info(f"Recycling pooled browser #{pooled.generation} after {pooled.pages_opened} pages")
+            try:
+                await pooled.browser.close()
+            except Exception as e:
+                logger.warning(f"⚠️ Closing retired browser failed: {e}")
+
+    @asynccontextmanager
+    async def page(self, **context_options):
+        """Yield a page in a fresh browser context; the context is closed afterwards."""
+        self._bind_loop()
+        waited = time.perf_counter()
+        async with self._semaphore:
+            self.page_wait_ms.observe((time.perf_counter() - waited) * 1000)
+            pooled = await self._acquire_browser()
+            context = None
+            try:
+                context = await pooled.browser.new_context(user_agent=USER_AGENT, **context_options)
+                yield await context.new_page()
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        logger.warning(f"⚠️ Closing browser context failed: {e}")
+                self.pages_served += 1
+                await self._release_browser(pooled)
+
+    async def stop(self):
+        """Close the browser and the Playwright driver (called on app shutdown)."""
+        if self._lock is None:
+            return
+        async with self._lock:
+            if self._current is not None:
+                try:
+                    await self._current.browser.close()
+                except Exception as e:
+                    logger.warning(f"⚠️ Closing pooled browser failed: {e}")
+                self._current = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+        logger.info("Browser pool stopped")
+
+    def get_stats(self) -> Dict[str, Any]:
+        current = self._current
+        return {
+            "max_pages": self.max_pages,
+            "recycle_after": self.recycle_after,
+            "browser_generation": current.generation if current else None,
+            "browser_pages_opened": current.pages_opened if current else 0,
+            "active_pages": current.active if current else 0,
+            "pages_served": self.pages_served,
+            "launches": self.launches,
+            "crashes": self.crashes,
+            "recycles": self.recycles,
+            "page_wait_ms": self.page_wait_ms.snapshot(),
+            "launch_ms": self.launch_ms.snapshot()
+        }
+
+# Create singleton pool instance
+browser_pool = BrowserPool()
+
+stats.register("browser_pool", browser_pool.get_stats)
@@ -0,0 +1,141 @@
+import os
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+import stats
+from stats import Histogram
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# CPU_POOL_WORKERS=0 keeps all analysis inline
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Pages smaller than this are analyzed inline; pool round-trips cost more than they save
+CPU_OFFLOAD_MIN_BYTES = int(os.getenv("CPU_OFFLOAD_MIN_BYTES", str(256 * 1024)))
+# Tasks allowed in flight before callers wait for a slot
+CPU_POOL_MAX_QUEUE = int(os.getenv("CPU_POOL_MAX_QUEUE", str(max(1, CPU_POOL_WORKERS) * 4)))
+# Modules the forkserver imports once so new workers start warm
+CPU_POOL_PRELOAD = ["site_features"]
+
+def _timed(fn: Callable, args: tuple):
+    """Run fn in a worker and report how long it took there."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+class CpuPool:
+    """
+    Bounded process pool for CPU-heavy page analysis.
+    Work on inputs below CPU_OFFLOAD_MIN_BYTES runs inline; larger inputs
+    go to worker processes so regex-heavy parsing of multi-MB pages does
+    not stall the event loop, and parallel audits use several cores.
+    Workers come from a forkserver (spawn where unavailable), never from a
+    fork of the threaded server process.
+    """
+
+    def __init__(self, workers: int = CPU_POOL_WORKERS, min_bytes: int = CPU_OFFLOAD_MIN_BYTES,
+                 max_queue: int = CPU_POOL_MAX_QUEUE):
+        self.workers = max(0, workers)
+        self.min_bytes = min_bytes
+        self.max_queue = max(1, max_queue)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.inline = 0
+        self.offloaded = 0
+        self.failures = 0
+        self.latency_ms = Histogram([5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000])
+        self.queue_wait_ms = Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000])
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            context = multiprocessing.get_context(method)
+            if method == "forkserver":
+                context.set_forkserver_preload(CPU_POOL_PRELOAD)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            logger.info(f"✅ CPU pool started ({self.workers} {method} workers, offload from {self.min_bytes} bytes)")
+        return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_queue)
+            self._loop = loop
+        return self._slots
+
+    def offloads(self, size: int) -> bool:
+        return self.enabled and size >= self.min_bytes
+
+    async def run(self, fn: Callable, *args, size: int, inline: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Run fn(*args) in the pool when size (bytes of input) is large enough,
+        otherwise inline (via the inline callable, if given, so callers can
+        reuse state the worker would have to rebuild). fn and its arguments
+        must be picklable.
+        """
+        if not self.offloads(size):
+            self.inline += 1
+            return inline() if inline is not None else fn(*args)
+
+        start = time.perf_counter()
+        # Depth counts tasks waiting for a slot as well as those in the pool
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            async with self._get_slots():
+                future = asyncio.get_running_loop().run_in_executor(self._get_executor(), _timed, fn, args)
+                result, worker_seconds = await future
+        except BrokenProcessPool as e:
+            # A worker died (e.g. OOM-killed); start a fresh pool next time and finish this one inline
+            self.failures += 1
+            logger.error(f"❌ CPU pool broken, running inline: {e}")
+            broken, self._executor = self._executor, None
+            if broken is not None:
+                broken.shutdown(wait=False, cancel_futures=True)
+            return inline() if inline is not None else fn(*args)
+        finally:
+            self.queue_depth -= 1
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.offloaded += 1
+        self.latency_ms.observe(elapsed_ms)
+        self.queue_wait_ms.observe(max(elapsed_ms - worker_seconds * 1000, 0.0))
+        return result
+
+    def stop(self):
+        """Shut the workers down (called on app shutdown)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("CPU pool stopped")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": self._executor is not None,
+            "offload_min_bytes": self.min_bytes,
+            "max_queue": self.max_queue,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "inline": self.inline,
+            "offloaded": self.offloaded,
+            "failures": self.failures,
+            "latency_ms": self.latency_ms.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot()
+        }
+
+# Create singleton pool instance
+cpu_pool = CpuPool()
+
+stats.register("cpu_pool", cpu_pool.get_stats)
@@ -0,0 +1,173 @@
+import os
+import time
+import threading
+from collections import deque, OrderedDict
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+
+import stats
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "60"))
+# Adaptive timeout = p95 latency x multiplier, clamped to [min, max]; max is also the default
+FETCH_TIMEOUT_MIN = float(os.getenv("FETCH_TIMEOUT_MIN", "5"))
+FETCH_TIMEOUT_MAX = float(os.getenv("FETCH_TIMEOUT_MAX", "30"))
+FETCH_TIMEOUT_MULTIPLIER = float(os.getenv("FETCH_TIMEOUT_MULTIPLIER", "3"))
+# Domains tracked at once; the least recently fetched are forgotten past this
+DOMAIN_HEALTH_MAX_DOMAINS = int(os.getenv("DOMAIN_HEALTH_MAX_DOMAINS", "1000"))
+# Successful fetches needed before a domain's own latency sets its timeout
+MIN_LATENCY_SAMPLES = 5
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of fetching from a domain whose circuit is open."""
+
+    def __init__(self, domain: str, retry_in: float):
+        super().__init__(f"Circuit open for {domain}: skipping fetch for {retry_in:.0f}s after repeated failures")
+        self.domain = domain
+        self.retry_in = retry_in
+
+def domain_of(url: str) -> str:
+    return (urlparse(url).hostname or url).lower()
+
+def _percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class DomainHealth:
+    """Circuit breaker state and recent fetch latencies (per mode) of one domain."""
+
+    def __init__(self, domain: str):
+        self.domain = domain
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        self.latencies: Dict[str, deque] = {}
+
+    def timeout(self, mode: str) -> float:
+        samples = self.latencies.get(mode)
+        if not samples or len(samples) < MIN_LATENCY_SAMPLES:
+            return FETCH_TIMEOUT_MAX
+        timeout = _percentile(samples, 0.95) * FETCH_TIMEOUT_MULTIPLIER
+        return min(max(timeout, FETCH_TIMEOUT_MIN), FETCH_TIMEOUT_MAX)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+            "latency": {
+                mode: {
+                    "samples": len(samples),
+                    "p50_seconds": round(_percentile(samples, 0.5), 3),
+                    "p95_seconds": round(_percentile(samples, 0.95), 3),
+                    "timeout_seconds": round(self.timeout(mode), 2)
+                }
+                for mode, samples in self.latencies.items() if samples
+            }
+        }
+
+class DomainHealthTracker:
+    """
+    Per-domain circuit breakers and adaptive timeouts for site fetching.
+    After CIRCUIT_FAILURE_THRESHOLD consecutive failures a domain's circuit
+    opens and fetches fail fast; after the cooldown one trial fetch is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    Timeouts follow each domain's own p95 latency once enough samples exist.
+    State is kept for the max_domains most recently fetched domains.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 cooldown_seconds: float = CIRCUIT_COOLDOWN_SECONDS, window: int = 50,
+                 max_domains: int = DOMAIN_HEALTH_MAX_DOMAINS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self.window = window
+        self.max_domains = max(1, max_domains)
+        self._domains: "OrderedDict[str, DomainHealth]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _get(self, url: str) -> DomainHealth:
+        domain = domain_of(url)
+        health = self._domains.get(domain)
+        if health is None:
+            health = self._domains[domain] = DomainHealth(domain)
+            while len(self._domains) > self.max_domains:
+                self._domains.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._domains.move_to_end(domain)
+        return health
+
+    def before_fetch(self, url: str, mode: str) -> float:
+        """Check the circuit for url's domain and return the timeout (seconds) to use."""
+        with self._lock:
+            health = self._get(url)
+            if health.state == OPEN:
+                elapsed = time.monotonic() - health.opened_at
+                if elapsed < self.cooldown_seconds or health.trial_in_flight:
+                    health.rejected += 1
+                    raise CircuitOpenError(health.domain, max(self.cooldown_seconds - elapsed, 0))
+                health.state = HALF_OPEN
+            if health.state == HALF_OPEN:
+                if health.trial_in_flight:
+                    health.rejected += 1
+                    raise CircuitOpenError(health.domain, self.cooldown_seconds)
+                health.trial_in_flight = True
+            return health.timeout(mode)
+
+    def record_success(self, url: str, mode: str, seconds: float):
+        with self._lock:
+            health = self._get(url)
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.state = CLOSED
+            health.trial_in_flight = False
+            health.latencies.setdefault(mode, deque(maxlen=self.window)).append(seconds)
+
+    def record_failure(self, url: str, error: BaseException):
+        with self._lock:
+            health = self._get(url)
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.last_error = f"{type(error).__name__}: {error}"[:200]
+            was_trial = health.state == HALF_OPEN
+            health.trial_in_flight = False
+            if was_trial or health.consecutive_failures >= self.failure_threshold:
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+
+    def release(self, url: str):
+        """Forget an in-flight trial that ended without a verdict (e.g. cancelled)."""
+        with self._lock:
+            self._get(url).trial_in_flight = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            domains = {domain: health.snapshot() for domain, health in self._domains.items()}
+        return {
+            "failure_threshold": self.failure_threshold,
+            "cooldown_seconds": self.cooldown_seconds,
+            "tracked_domains": len(domains),
+            "max_domains": self.max_domains,
+            "evictions": self.evictions,
+            "open_circuits": sorted(d for d, s in domains.items() if s["state"] != CLOSED),
+            "domains": domains
+        }
+
+# Create singleton tracker instance
+domain_health = DomainHealthTracker()
+
+stats.register("domain_health", domain_health.get_stats)
@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Any, Optional
+
+import numpy as np
+
+import stats
+from encoders import metric_encoder
+
+# Advisory file locks serialize cache updates across worker processes (POSIX only)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "embeddings")
+)
+# Superseded matrix files are swept once they are this old, long after any
+# worker that read the previous manifest has mapped them
+EMBEDDING_CACHE_SWEEP_AFTER_SECONDS = float(os.getenv("EMBEDDING_CACHE_SWEEP_AFTER_SECONDS", "3600"))
+
+def text_key(text: str) -> str:
+    """Content address of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk cache of sentence embeddings.
+
+    Each model gets one float32 .npy matrix plus a JSON manifest mapping
+    text hashes to rows. Matrices are opened with mmap_mode='r', so every
+    worker shares the same page-cache pages and nothing is re-encoded
+    unless a text has never been seen before. The manifest is replaced
+    atomically and points at an immutable matrix file, so concurrent
+    workers never observe a half-written cache; updates hold a per-model
+    file lock, so workers warming up together never drop each other's rows.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._stores: Dict[str, Tuple[Optional[np.ndarray], Dict[str, int]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _manifest_path(self, model_key: str) -> str:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_key)
+        return os.path.join(self.cache_dir, f"{safe_name}.json")
+
+    def _read_store(self, model_key: str) -> Tuple[Optional[np.ndarray], Dict[str, int]]:
+        manifest_path = self._manifest_path(model_key)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            matrix = np.load(os.path.join(self.cache_dir, manifest["vectors"]), mmap_mode="r")
+            index = {key: row for row, key in enumerate(manifest["keys"])}
+            if matrix.shape[0] != len(index):
+                raise ValueError("manifest and matrix disagree")
+            return matrix, index
+        except FileNotFoundError:
+            return None, {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable embedding cache {manifest_path}: {e}")
+            return None, {}
+
+    def _write_store(self, model_key: str, matrix: np.ndarray, keys: List[str]):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        manifest_path = self._manifest_path(model_key)
+        vectors_name = f"{os.path.basename(manifest_path)[:-5]}.{uuid.uuid4().hex[:12]}.npy"
+        np.save(os.path.join(self.cache_dir, vectors_name), np.ascontiguousarray(matrix, dtype=np.float32))
+
+        tmp_path = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": model_key, "vectors": vectors_name, "keys": keys}, f)
+        os.replace(tmp_path, manifest_path)
+
+    def _sweep(self, model_key: str):
+        """Delete this model's unreferenced matrix files once no worker can still be about to map them."""
+        base = re.escape(os.path.basename(self._manifest_path(model_key))[:-5])
+        # Matrix files and leftover manifest temp files of this model only (see _write_store)
+        owned = re.compile(rf"{base}\.[0-9a-f]{{12}}\.npy|{base}\.json\.[0-9a-f]{{32}}\.tmp")
+        try:
+            with open(self._manifest_path(model_key), "r", encoding="utf-8") as f:
+                current = json.load(f).get("vectors")
+        except Exception:
+            return
+        cutoff = time.time() - EMBEDDING_CACHE_SWEEP_AFTER_SECONDS
+        for name in os.listdir(self.cache_dir):
+            if name == current or not owned.fullmatch(name):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    @contextmanager
+    def _file_lock(self, model_key: str):
+        """Exclusive lock on the model's .lock file for a read-append-write of its store."""
+        if fcntl is None:
+            yield
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            lock_file = open(f"{self._manifest_path(model_key)[:-5]}.lock", "a")
+        except OSError as e:
+            # The write that follows fails the same way and keeps the rows in memory only
+            logger.warning(f"Could not lock embedding cache for {model_key}: {e}")
+            yield
+            return
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append(self, model_key: str, new_keys: List[str], vectors: np.ndarray):
+        """Merge freshly encoded rows into the on-disk store (re-reading it under the file lock)."""
+        with self._file_lock(model_key):
+            matrix, index = self._read_store(model_key)
+            keys = [None] * len(index)
+            for key, row in index.items():
+                keys[row] = key
+
+            fresh = [(key, vector) for key, vector in zip(new_keys, vectors) if key not in index]
+            if fresh:
+                parts = [np.asarray(matrix)] if matrix is not None else []
+                parts.append(np.stack([vector for _, vector in fresh]).astype(np.float32))
+                keys.extend(key for key, _ in fresh)
+                try:
+                    self._write_store(model_key, np.concatenate(parts), keys)
+                except OSError as e:
+                    logger.warning(f"Could not persist embedding cache for {model_key}: {e}")
+                    return np.concatenate(parts), {key: row for row, key in enumerate(keys)}
+                self._sweep(model_key)
+            return self._read_store(model_key)
+
+    def encode(self, texts: List[str], encoder=None) -> np.ndarray:
+        """
+        Return float32 embeddings for texts, encoding only unseen ones.
+        When the requested rows are contiguous in the cache the result is a
+        zero-copy view of the memory-mapped matrix.
+        """
+        encoder = encoder or metric_encoder
+        model_key = encoder.cache_key
+        keys = [text_key(text) for text in texts]
+
+        with self._lock:
+            if model_key not in self._stores:
+                self._stores[model_key] = self._read_store(model_key)
+            matrix, index = self._stores[model_key]
+
+            missing = {}
+            for text, key in zip(texts, keys):
+                if key not in index and key not in missing:
+                    missing[key] = text
+
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+            if missing:
+                vectors = encoder.encode(list(missing.values()))
+                matrix, index = self._append(model_key, list(missing.keys()), vectors)
+                if matrix is None or any(key not in index for key in missing):
+                    raise RuntimeError(f"Embedding cache for {model_key} could not be updated")
+                self._stores[model_key] = (matrix, index)
+
+        rows = [index[key] for key in keys]
+        if rows and rows == list(range(rows[0], rows[0] + len(rows))):
+            return matrix[rows[0]:rows[0] + len(rows)]
+        return matrix[rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache hit/miss counters and per-model entry counts."""
+        return {
+            "cache_dir": self.cache_dir,
+            "hits": self.hits,
+            "misses": self.misses,
+            "models": {key: len(index) for key, (_, index) in self._stores.items()}
+        }
+
+# Create singleton cache instance
+embedding_cache = EmbeddingCache()
+
+stats.register("embedding_cache", embedding_cache.get_stats)
@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+import stats
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+def canonical_model_name(model_name: str) -> str:
+    """Map hub aliases ('sentence-transformers/x') onto the short name ('x')."""
+    prefix = "sentence-transformers/"
+    return model_name[len(prefix):] if model_name.startswith(prefix) else model_name
+
+class ModelRegistry:
+    """
+    Process-wide registry of SentenceTransformer models.
+    Publisher, advertiser and the RAG engine all resolve their encoder here so
+    each (model, device) pair is loaded exactly once per worker.
+    """
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._load_seconds: Dict[Tuple[str, str], float] = {}
+        self._default_device: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def resolve_device(self, device: Optional[str] = None) -> str:
+        """Resolve the device a model should live on (explicit > EMBEDDING_DEVICE > auto)."""
+        if device:
+            return device
+        if self._default_device is None:
+            env_device = os.getenv("EMBEDDING_DEVICE")
+            if env_device:
+                self._default_device = env_device
+            else:
+                import torch
+                self._default_device = "cuda" if torch.cuda.is_available() else "cpu"
+        return self._default_device
+
+    def get(self, model_name: str = DEFAULT_MODEL_NAME, device: Optional[str] = None):
+        """Return the shared model instance, loading it on first use."""
+        key = (canonical_model_name(model_name), self.resolve_device(device))
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+
+                start = time.perf_counter()
+                model = SentenceTransformer(key[0], device=key[1])
+                self._load_seconds[key] = time.perf_counter() - start
+                self._models[key] = model
+                logger.info(f"✅ Embedding model loaded: {key[0]} on {key[1]} ({self._load_seconds[key]:.2f}s)")
+        return model
+
+    def memory_report(self) -> Dict[str, Any]:
+        """Report parameter/buffer memory held by every loaded model."""
+        models = []
+        total_bytes = 0
+        for (name, device), model in list(self._models.items()):
+            param_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+            buffer_bytes = sum(b.numel() * b.element_size() for b in model.buffers())
+            total_bytes += param_bytes + buffer_bytes
+            models.append({
+                "model_name": name,
+                "device": device,
+                "parameters_mb": round(param_bytes / 1024 / 1024, 2),
+                "buffers_mb": round(buffer_bytes / 1024 / 1024, 2),
+                "load_seconds": round(self._load_seconds.get((name, device), 0.0), 3)
+            })
+
+        return {
+            "loaded_models": len(models),
+            "total_mb": round(total_bytes / 1024 / 1024, 2),
+            "models": models
+        }
+
+# Create singleton registry instance
+model_registry = ModelRegistry()
+
+stats.register("embedding_models", model_registry.memory_report)
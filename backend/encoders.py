@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import threading
+import logging
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+import stats
+from embeddings import model_registry, canonical_model_name, DEFAULT_MODEL_NAME
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch").lower()
+ONNX_EXPORT_DIR = os.getenv(
+    "ONNX_EXPORT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "onnx")
+)
+
+class TorchEncoder:
+    """Sentence encoder running the shared PyTorch SentenceTransformer."""
+
+    backend = "torch"
+    # Weights loaded before a fork stay usable (and copy-on-write shared) in the workers
+    fork_safe = True
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+        self.model_name = canonical_model_name(model_name)
+
+    @property
+    def cache_key(self) -> str:
+        """Embedding-cache namespace; vectors from different backends never mix."""
+        return self.model_name
+
+    def load(self):
+        model_registry.get(self.model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        model = model_registry.get(self.model_name)
+        return np.asarray(model.encode(list(texts)), dtype=np.float32)
+
+class OnnxEncoder:
+    """
+    Sentence encoder running an ONNX export of the model through onnxruntime,
+    optionally with dynamic int8 weight quantization. Pooling and
+    normalization mirror the SentenceTransformer pipeline, so similarities
+    stay comparable with the torch backend (and its 0.3 routing threshold).
+    """
+
+    backend = "onnx"
+    # onnxruntime's intra-op thread pool does not survive fork; each worker opens its own session
+    fork_safe = False
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, export_dir: str = ONNX_EXPORT_DIR, quantize: bool = True):
+        self.model_name = canonical_model_name(model_name)
+        self.export_dir = os.path.join(export_dir, self.model_name.replace("/", "_"))
+        self.quantize = quantize
+        self.session = None
+        self.tokenizer = None
+        self.config: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        # Process that opened the session; a forked worker must not run it
+        self._pid: Optional[int] = None
+        self._forked_sessions = []
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.model_name}@onnx-{'int8' if self.quantize else 'fp32'}"
+
+    @property
+    def _model_path(self) -> str:
+        return os.path.join(self.export_dir, "model.int8.onnx" if self.quantize else "model.onnx")
+
+    def export(self):
+        """Export the SentenceTransformer to ONNX (needs torch, run once per model)."""
+        import torch
+
+        os.makedirs(self.export_dir, exist_ok=True)
+        st_model = model_registry.get(self.model_name, device="cpu")
+        transformer = st_model[0]
+        pooling = st_model[1]
+
+        if pooling.pooling_mode_mean_tokens:
+            pooling_mode = "mean"
+        elif pooling.pooling_mode_cls_token:
+            pooling_mode = "cls"
+        else:
+            raise ValueError(f"Unsupported pooling mode for ONNX export of {self.model_name}")
+        normalize = any(type(module).__name__ == "Normalize" for module in st_model)
+
+        fp32_path = os.path.join(self.export_dir, "model.onnx")
+        dummy = transformer.tokenizer(["export"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        auto_model = transformer.auto_model.eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                auto_model,
+                tuple(dummy[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+
+        if self.quantize:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(fp32_path, self._model_path, weight_type=QuantType.QInt8)
+
+        transformer.tokenizer.save_pretrained(self.export_dir)
+        with open(os.path.join(self.export_dir, "encoder.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "model_name": self.model_name,
+                "pooling": pooling_mode,
+                "normalize": normalize,
+                "max_seq_length": transformer.max_seq_length,
+                "input_names": input_names
+            }, f)
+        logger.info(f"✅ ONNX encoder exported to {self.export_dir}")
+
+    def load(self):
+        """Open the inference session in this process, exporting the model first if needed."""
+        if self.session is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self.session is not None and self._pid == os.getpid():
+                return
+            if self.session is not None:
+                # Opened before this worker was forked (e.g. a cold embedding cache during
+                # preload). Kept referenced but never run: freeing it would join threads
+                # that do not exist in this process.
+                self._forked_sessions.append(self.session)
+                self.session = None
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+
+            if not os.path.exists(self._model_path):
+                self.export()
+
+            with open(os.path.join(self.export_dir, "encoder.json"), "r", encoding="utf-8") as f:
+                self.config = json.load(f)
+
+            tokenizer = Tokenizer.from_file(os.path.join(self.export_dir, "tokenizer.json"))
+            tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+            tokenizer.enable_padding()
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            start = time.perf_counter()
+            self.session = ort.InferenceSession(self._model_path, options, providers=["CPUExecutionProvider"])
+            self._pid = os.getpid()
+            self.tokenizer = tokenizer
+            logger.info(f"✅ ONNX encoder loaded: {self.cache_key} ({time.perf_counter() - start:.2f}s)")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        self.load()
+        encodings = self.tokenizer.encode_batch(list(texts))
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        feeds = {name: feeds[name] for name in self.config["input_names"]}
+        hidden = self.session.run(None, feeds)[0]
+
+        if self.config["pooling"] == "cls":
+            embeddings = hidden[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            embeddings = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.config["normalize"]:
+            embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+def create_encoder(backend: Optional[str] = None, model_name: str = DEFAULT_MODEL_NAME):
+    """Build an encoder for the given backend ('torch', 'onnx' or 'onnx-fp32')."""
+    backend = (backend or ENCODER_BACKEND).lower()
+    if backend == "torch":
+        return TorchEncoder(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEncoder(model_name, quantize=True)
+    if backend == "onnx-fp32":
+        return OnnxEncoder(model_name, quantize=False)
+    raise ValueError(f"Unknown encoder backend: {backend}")
+
+# Encoder used by the publisher/advertiser metric routers (ENCODER_BACKEND)
+metric_encoder = create_encoder()
+
+stats.register("metric_encoder", lambda: {"backend": metric_encoder.backend, "cache_key": metric_encoder.cache_key})
@@ -1,11 +1,11 @@
 from fastapi import HTTPException
 from pydantic import BaseModel
-from exa_py import Exa
 import google.generativeai as genai
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 import logging
+from startup_profile import startup_profiler
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -23,6 +23,9 @@ class ExaAgent:
     def __init__(self):
         self.exa_client = None
         self.gemini_model = None
+    
+    def initialize(self):
+        """Create the API clients (called during app warm-up)."""
         self._initialize_services()
     
     def _initialize_services(self):
@@ -31,6 +34,7 @@ class ExaAgent:
         exa_api_key = os.getenv("EXA_API_KEY")
         if exa_api_key:
             try:
+                from exa_py import Exa
                 self.exa_client = Exa(api_key=exa_api_key)
                 logger.info("✅ Exa API configured successfully")
             except Exception as e:
@@ -302,4 +306,5 @@ class ExaAgent:
             raise HTTPException(status_code=500, detail=f"Content strategy analysis failed: {str(e)}")
 
 # Create singleton instance
-exa_agent = ExaAgent()
\ No newline at end of file
+with startup_profiler.measure("exa_agent", kind="singleton"):
+    exa_agent = ExaAgent()
\ No newline at end of file
@@ -0,0 +1,143 @@
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict
+
+# Tag shapes the analyzers score; these regexes define the counts, and
+# scan_tags_regex still runs them for documents scan_tags cannot take
+TAG_PATTERNS = {
+    "link": re.compile(r'<a\s+[^>]*href=', re.IGNORECASE),
+    "image": re.compile(r'<img\s+[^>]*src=', re.IGNORECASE),
+    "image_with_alt": re.compile(r'<img[^>]*alt=["\'][^"\'>]+["\']', re.IGNORECASE),
+    "responsive_image": re.compile(r'<img[^>]*(?:srcset|sizes)=', re.IGNORECASE),
+    "script": re.compile(r'<script[^>]*>', re.IGNORECASE),
+    "stylesheet": re.compile(r'<link[^>]*rel=["\']stylesheet["\']', re.IGNORECASE),
+    "paragraph": re.compile(r'<p[^>]*>', re.IGNORECASE),
+    "list": re.compile(r'<(?:ul|ol)[^>]*>', re.IGNORECASE),
+    "form": re.compile(r'<form[^>]*>', re.IGNORECASE),
+    "viewport_meta": re.compile(r'<meta[^>]*name=["\']viewport["\']', re.IGNORECASE)
+}
+
+@lru_cache(maxsize=256)
+def external_patterns(domain: str) -> Dict[str, "re.Pattern"]:
+    """Links, scripts and stylesheets pointing at hosts other than domain (compiled once per domain)."""
+    domain = re.escape(domain)
+    return {
+        "links": re.compile(rf'<a\s+[^>]*href=["\'][^"\'>]*://(?!(?:www\.)?{domain})', re.IGNORECASE),
+        "scripts": re.compile(rf'<script[^>]*src=["\'][^"\'>]*://(?!(?:www\.)?{domain})', re.IGNORECASE),
+        "stylesheets": re.compile(
+            rf'<link[^>]*rel=["\']stylesheet["\'][^>]*href=["\'][^"\'>]*://(?!(?:www\.)?{domain})', re.IGNORECASE
+        )
+    }
+
+# Every tag some counter can match, from its '<' to the next '>' (or the end of a truncated document)
+_RELEVANT_TAG = re.compile(r'<(?:a\s|img|script|link|p|ul|ol|form|meta)[^>]*>?')
+
+# Sorted-token ranges of each tag family: tokens t with low <= t < high
+_FAMILIES = {
+    "a": ("<a", "<b"),
+    "img": ("<img", "<imh"),
+    "script": ("<script", "<scripu"),
+    "link": ("<link", "<linl"),
+    "p": ("<p", "<q"),
+    "ul": ("<ul", "<um"),
+    "ol": ("<ol", "<om"),
+    "form": ("<form", "<forn"),
+    "meta": ("<meta", "<metb")
+}
+
+# Checks on the tags of one family; each ends by consuming the rest of the
+# tag, so it matches at most once per tag like the patterns above
+_HREF = re.compile(r'href=[^>]*')
+_IMAGE_SRC = re.compile(r'<img\s[^>]*?src=[^>]*')
+_ALT_TEXT = re.compile(r'alt=["\'][^"\'>]+["\'][^>]*')
+_RESPONSIVE = re.compile(r'(?:srcset|sizes)=[^>]*')
+_REL_STYLESHEET = re.compile(r'rel=["\']stylesheet["\'][^>]*')
+_VIEWPORT_NAME = re.compile(r'name=["\']viewport["\'][^>]*')
+
+# The only non-ASCII characters IGNORECASE matches to ASCII letters; str.lower()
+# does not map them, so documents containing them take the regex path
+_CASE_FOLD_TRAPS = ("\u0130", "\u0131", "\u017f")
+
+@lru_cache(maxsize=256)
+def _external_checks(domain: str) -> Dict[str, "re.Pattern"]:
+    """Per-family versions of external_patterns, for lower-cased tags."""
+    elsewhere = rf'["\'][^"\'>]*://(?!(?:www\.)?{re.escape(domain)})[^>]*'
+    return {
+        "links": re.compile(r'href=' + elsewhere),
+        "scripts": re.compile(r'src=' + elsewhere),
+        "stylesheets": re.compile(r'rel=["\']stylesheet["\'][^>]*href=' + elsewhere)
+    }
+
+class TagScan:
+    """Tag counts and external-resource counts of one document."""
+
+    def __init__(self, tags: Dict[str, int], external: Dict[str, int]):
+        self.tags = tags
+        self.external = external
+
+def scan_tags_regex(html: str, domain: str) -> TagScan:
+    """Reference implementation: one regex pass over the document per counter."""
+    tags = {name: len(pattern.findall(html)) for name, pattern in TAG_PATTERNS.items()}
+    external = {name: len(pattern.findall(html)) for name, pattern in external_patterns(domain).items()}
+    return TagScan(tags, external)
+
+def scan_tags(html: str, domain: str) -> TagScan:
+    """
+    Fill every tag and external-resource counter from a single pass over
+    the document. One regex pulls out the tags any counter can match;
+    sorting groups them by family, and each counter then checks only its
+    own family's tags instead of rescanning the whole page. Counts equal
+    scan_tags_regex, since every pattern there matches at most once per
+    '<'...'>' span and only at one of these tags.
+    """
+    domain = domain.lower()
+    if not domain.isascii() or any(c in html for c in _CASE_FOLD_TRAPS):
+        return scan_tags_regex(html, domain)
+
+    tokens = _RELEVANT_TAG.findall(html.lower())
+    # A truncated document's last tag has no '>'; joined to another tag it would merge with it
+    unterminated = tokens.pop() if tokens and not tokens[-1].endswith(">") else ""
+    tokens.sort()
+    families = {
+        family: "".join(tokens[bisect_left(tokens, low):bisect_left(tokens, high)])
+        for family, (low, high) in _FAMILIES.items()
+    }
+    if sum(text.count("<") for text in families.values()) != len(tokens):
+        # A '<' inside a tag can start a match of another family; check every tag with every pattern
+        scan = scan_tags_regex("".join(tokens), domain)
+    else:
+        scan = _scan_families(families, domain)
+    if unterminated:
+        tail = scan_tags_regex(unterminated, domain)
+        for name, value in tail.tags.items():
+            scan.tags[name] += value
+        for name, value in tail.external.items():
+            scan.external[name] += value
+    return scan
+
+def _scan_families(families: Dict[str, str], domain: str) -> TagScan:
+    """Counters from '>'-terminated tags joined per family."""
+    def count(pattern, family):
+        return len(pattern.findall(families[family]))
+
+    external = _external_checks(domain)
+    return TagScan(
+        {
+            "link": count(_HREF, "a"),
+            "image": count(_IMAGE_SRC, "img"),
+            "image_with_alt": count(_ALT_TEXT, "img"),
+            "responsive_image": count(_RESPONSIVE, "img"),
+            "script": families["script"].count(">"),
+            "stylesheet": count(_REL_STYLESHEET, "link"),
+            "paragraph": families["p"].count(">"),
+            "list": families["ul"].count(">") + families["ol"].count(">"),
+            "form": families["form"].count(">"),
+            "viewport_meta": count(_VIEWPORT_NAME, "meta")
+        },
+        {
+            "links": count(external["links"], "a"),
+            "scripts": count(external["scripts"], "script"),
+            "stylesheets": count(external["stylesheets"], "link")
+        }
+    )
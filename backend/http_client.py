@@ -0,0 +1,262 @@
+import os
+import time
+import codecs
+import socket
+import asyncio
+import logging
+import importlib.util
+from typing import Dict, Any, Optional, Tuple, List
+from urllib.parse import urlparse
+
+import httpx
+import httpcore
+
+import stats
+from stats import Histogram
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "6"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+DNS_CACHE_TTL = float(os.getenv("DNS_CACHE_TTL", "300"))
+# Stop reading a page body after this many (decompressed) bytes
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(1024 * 1024)))
+
+# HTTP/2 needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+class CachingDNSBackend(httpcore.AsyncNetworkBackend):
+    """
+    httpcore network backend that resolves hostnames once per TTL and then
+    connects to the cached address. TLS still uses the original hostname
+    for SNI and certificate checks, since httpcore passes it separately.
+    """
+
+    def __init__(self, ttl: float = DNS_CACHE_TTL, backend: Optional[httpcore.AsyncNetworkBackend] = None):
+        self.ttl = ttl
+        self.backend = backend or httpcore.AnyIOBackend()
+        self._cache: Dict[Tuple[str, int], Tuple[List[str], float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def _resolve(self, host: str, port: int) -> List[str]:
+        key = (host, port)
+        cached = self._cache.get(key)
+        if cached and cached[1] > time.monotonic():
+            self.hits += 1
+            return cached[0]
+        self.misses += 1
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._cache[key] = (addresses, time.monotonic() + self.ttl)
+        return addresses
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            addresses = await self._resolve(host, port)
+        except OSError:
+            # Let the underlying backend raise its usual ConnectError
+            addresses = [host]
+        last_error = None
+        for address in addresses:
+            try:
+                return await self.backend.connect_tcp(address, port, timeout=timeout,
+                                                      local_address=local_address, socket_options=socket_options)
+            except httpcore.ConnectError as e:
+                last_error = e
+        self._cache.pop((host, port), None)
+        raise last_error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self.backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float):
+        await self.backend.sleep(seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"hosts": len(self._cache), "hits": self.hits, "misses": self.misses, "ttl_seconds": self.ttl}
+
+class CachingDNSTransport(httpx.AsyncHTTPTransport):
+    """
+    httpx transport whose connection pool connects through a network backend
+    (the DNS cache). The pool is built the way AsyncHTTPTransport builds its
+    own direct pool, plus httpcore's network_backend argument; proxies are
+    not supported.
+    """
+
+    def __init__(self, network_backend: httpcore.AsyncNetworkBackend, verify: bool = True, http2: bool = False,
+                 limits: httpx.Limits = httpx.Limits(), retries: int = 0):
+        super().__init__(verify=verify, http2=http2, limits=limits, retries=retries)
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(verify=verify),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=http2,
+            retries=retries,
+            network_backend=network_backend
+        )
+
+class StreamedPage:
+    """A page body read up to a byte budget, plus what the headers said about it."""
+
+    def __init__(self, url: str, status_code: int, headers: httpx.Headers, text: str,
+                 bytes_read: int, content_length: Optional[int], truncated: bool):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+        self.bytes_read = bytes_read
+        # Declared Content-Length (transfer size, so compressed when the body is encoded)
+        self.content_length = content_length
+        self.truncated = truncated
+
+class HttpClient:
+    """
+    Shared async HTTP client for page fetches.
+    One httpx.AsyncClient (keep-alive pooling, HTTP/2 when h2 is installed)
+    is created per event loop and closed by the app lifespan; a semaphore
+    per host keeps one slow site from taking every pooled connection.
+    """
+
+    def __init__(self, max_per_host: int = HTTP_MAX_PER_HOST):
+        self.max_per_host = max(1, max_per_host)
+        self.dns = CachingDNSBackend()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self.requests = 0
+        self.errors = 0
+        self.bytes_read = 0
+        self.truncated = 0
+        self.latency_ms = Histogram([50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000])
+
+    def _create_client(self) -> httpx.AsyncClient:
+        transport = CachingDNSTransport(
+            self.dns,
+            http2=HTTP2_AVAILABLE,
+            verify=False,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            ),
+            retries=1
+        )
+        return httpx.AsyncClient(
+            transport=transport,
+            headers={"User-Agent": USER_AGENT},
+            timeout=httpx.Timeout(HTTP_TIMEOUT),
+            follow_redirects=True
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The client for the running event loop (created on first use)."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = self._create_client()
+            self._loop = loop
+            self._host_limits = {}
+        return self._client
+
+    def start(self):
+        """Create the client up front (called from the app lifespan)."""
+        self.client
+        logger.info(f"✅ HTTP client ready (HTTP/2 {'on' if HTTP2_AVAILABLE else 'off'}, {self.max_per_host} connections per host)")
+
+    def host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        semaphore = self._host_limits.get(host)
+        if semaphore is None:
+            semaphore = self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return semaphore
+
+    async def fetch_text(self, url: str, max_bytes: int = FETCH_MAX_BYTES, headers: Optional[Dict[str, str]] = None,
+                         timeout: Optional[float] = None) -> StreamedPage:
+        """
+        Stream a page body, decoding incrementally, and stop after max_bytes.
+        Raises httpx.HTTPStatusError for 4xx/5xx; a 304 comes back with no text.
+        With max_bytes=0 only the status and headers are read.
+        """
+        client = self.client
+        start = time.perf_counter()
+        self.requests += 1
+        try:
+            async with self.host_limit(url):
+                request_timeout = httpx.Timeout(timeout) if timeout else httpx.USE_CLIENT_DEFAULT
+                async with client.stream("GET", url, headers=headers, timeout=request_timeout) as response:
+                    declared = response.headers.get("content-length", "")
+                    content_length = int(declared) if declared.isdigit() else None
+                    # Checked first: raise_for_status() treats a 304 as an unfollowed redirect
+                    if response.status_code == 304:
+                        return StreamedPage(url, 304, response.headers, "", 0, content_length, False)
+                    response.raise_for_status()
+                    if max_bytes <= 0:
+                        # Headers only: leaving the stream now closes the connection without reading the body
+                        return StreamedPage(url, response.status_code, response.headers, "", 0, content_length, True)
+
+                    try:
+                        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+                    except LookupError:
+                        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                    parts = []
+                    bytes_read = 0
+                    truncated = False
+                    async for chunk in response.aiter_bytes():
+                        if bytes_read + len(chunk) > max_bytes:
+                            chunk = chunk[:max_bytes - bytes_read]
+                            truncated = True
+                        parts.append(decoder.decode(chunk))
+                        bytes_read += len(chunk)
+                        if truncated:
+                            # Leaving the stream early closes this connection instead of draining it
+                            break
+                    parts.append(decoder.decode(b"", final=True))
+
+            self.bytes_read += bytes_read
+            if truncated:
+                self.truncated += 1
+                logger.info(f"Stopped reading {url} after {bytes_read} bytes"
+                            + (f" of {content_length}" if content_length else ""))
+            return StreamedPage(url, response.status_code, response.headers, "".join(parts),
+                                bytes_read, content_length, truncated)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.latency_ms.observe((time.perf_counter() - start) * 1000)
+
+    async def stop(self):
+        """Close pooled connections (called on app shutdown)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+        logger.info("HTTP client closed")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "max_per_host": self.max_per_host,
+            "hosts": len(self._host_limits),
+            "requests": self.requests,
+            "errors": self.errors,
+            "fetch_max_bytes": FETCH_MAX_BYTES,
+            "bytes_read": self.bytes_read,
+            "truncated_pages": self.truncated,
+            "latency_ms": self.latency_ms.snapshot(),
+            "dns_cache": self.dns.get_stats()
+        }
+
+# Create singleton client instance
+http_client = HttpClient()
+
+stats.register("http_client", http_client.get_stats)
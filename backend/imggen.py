@@ -13,6 +13,7 @@ import google.generativeai as genai
 from google.generativeai import types
 from dotenv import load_dotenv
 import logging
+from startup_profile import startup_profiler
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -43,6 +44,9 @@ class ImageGenerationService:
     
     def __init__(self):
         self.client = None
+    
+    def initialize(self):
+        """Configure the Gemini client (called during app warm-up)."""
         self._initialize_gemini()
     
     def _initialize_gemini(self):
@@ -438,4 +442,5 @@ class ImageGenerationService:
         return size_map.get(banner_size, f"{banner_size} (Custom Size)")
 
 # Create singleton instance
-image_gen_service = ImageGenerationService()
\ No newline at end of file
+with startup_profiler.measure("image_gen_service", kind="singleton"):
+    image_gen_service = ImageGenerationService()
\ No newline at end of file
@@ -1,16 +1,17 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import google.generativeai as genai
-from exa_py import Exa
 import json
 import logging
 from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 from dotenv import load_dotenv
+from warmup import warmup
+from startup_profile import startup_profiler
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -56,6 +57,9 @@ class KeywordAnalysisService:
         self.exa_client = None
         self.gemini_model = None
         self.is_initialized = False
+    
+    def initialize(self):
+        """Create the API clients (called during app warm-up)."""
         self._initialize_services()
     
     def _initialize_services(self):
@@ -70,6 +74,7 @@ class KeywordAnalysisService:
                 return
             
             # Initialize clients
+            from exa_py import Exa
             self.exa_client = Exa(api_key=exa_api_key)
             genai.configure(api_key=gemini_api_key)
             self.gemini_model = genai.GenerativeModel("gemini-2.5-flash")
@@ -346,12 +351,13 @@ class KeywordAnalysisService:
         }
 
 # Create singleton service instance
-keyword_analysis_service = KeywordAnalysisService()
+with startup_profiler.measure("keyword_analysis_service", kind="singleton"):
+    keyword_analysis_service = KeywordAnalysisService()
 
 # Create FastAPI router
 router = APIRouter()
 
-@router.post("/generate-marketing-strategy", response_model=MarketingStrategyResponse)
+@router.post("/generate-marketing-strategy", response_model=MarketingStrategyResponse, dependencies=[Depends(warmup.require("keyword"))])
 async def generate_marketing_strategy(request: CampaignRequest):
     """
     Generate comprehensive marketing strategy with AI-driven keyword analysis
@@ -366,6 +372,7 @@ async def get_service_status():
     return {
         "service": "keyword_analysis",
         "status": keyword_analysis_service.get_service_status(),
+        "readiness": warmup.router_status("keyword"),
         "description": "AI-powered keyword analysis and marketing strategy generation",
         "endpoints": [
             {"path": "/generate-marketing-strategy", "method": "POST", "description": "Generate full marketing strategy"},
@@ -380,5 +387,7 @@ async def health_check():
     """
     if keyword_analysis_service.is_initialized:
         return {"status": "healthy", "keyword_analysis_service": "initialized"}
+    elif warmup.router_status("keyword") == "warming":
+        return {"status": "warming", "keyword_analysis_service": "initializing"}
     else:
         return {"status": "unhealthy", "keyword_analysis_service": "not_initialized"}
\ No newline at end of file
@@ -0,0 +1,57 @@
+from typing import Dict, List, Tuple, Sequence
+
+import numpy as np
+
+class MetricMatcher:
+    """
+    Cosine-similarity matcher over a fixed catalogue of metric embeddings.
+    The catalogue is normalized once into a contiguous float32 matrix, so a
+    lookup is a single matmul with no torch dispatch or tensor allocation.
+    """
+
+    def __init__(self, keys: Sequence[str], embeddings):
+        matrix = np.array(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(keys):
+            raise ValueError(f"Expected {len(keys)} embeddings, got shape {matrix.shape}")
+        matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+        self.keys = list(keys)
+        # Stored transposed (dim x metrics) so queries multiply against it directly
+        self._matrix_t = np.ascontiguousarray(matrix.T)
+
+    def similarities(self, query_embeddings) -> np.ndarray:
+        """Cosine similarity of each query (rows) against every metric (columns)."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        norms = np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+        return (queries / norms) @ self._matrix_t
+
+    def scores(self, query_embedding) -> Dict[str, float]:
+        """Similarity of one query embedding to every metric key."""
+        return dict(zip(self.keys, self.similarities(query_embedding)[0].tolist()))
+
+    def match(self, query_embedding) -> Tuple[str, float]:
+        """Best metric key and its similarity for one query embedding."""
+        return self.match_batch(query_embedding)[0]
+
+    def match_batch(self, query_embeddings) -> List[Tuple[str, float]]:
+        """Best metric key and similarity for each query embedding."""
+        similarities = self.similarities(query_embeddings)
+        best = similarities.argmax(axis=1)
+        return [(self.keys[idx], float(similarities[row, idx])) for row, idx in enumerate(best)]
+
+    def top_k(self, query_embedding, k: int = 3) -> List[Tuple[str, float]]:
+        """The k best metric keys with similarities for one query, best first."""
+        return self.top_k_batch(query_embedding, k)[0]
+
+    def top_k_batch(self, query_embeddings, k: int = 3) -> List[List[Tuple[str, float]]]:
+        """The k best metric keys with similarities for each query, best first."""
+        similarities = self.similarities(query_embeddings)
+        k = min(k, similarities.shape[1])
+        candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        results = []
+        for row, indices in enumerate(candidates):
+            ordered = indices[np.argsort(-similarities[row, indices])]
+            results.append([(self.keys[idx], float(similarities[row, idx])) for idx in ordered])
+        return results
@@ -0,0 +1,130 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# Aho-Corasick automaton when the optional pyahocorasick package is installed,
+# a trie-shaped regex otherwise
+try:
+    import ahocorasick
+    ENGINE = "aho-corasick"
+except ImportError:
+    ahocorasick = None
+    ENGINE = "trie-regex"
+
+# Non-ASCII characters that IGNORECASE matches to ASCII letters but str.lower()
+# leaves alone (or, for U+0130, lengthens); folded first so counts match re
+_CASE_FOLD_TRAPS = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s", "\u212a": "k"})
+
+def _is_word_char(ch: str) -> bool:
+    # Same definition as \w in str regexes
+    return ch.isalnum() or ch == "_"
+
+def _trie_regex(literals: Iterable[str]) -> str:
+    """Regex matching the longest of literals at a position, with alternations shaped like their trie."""
+    trie: Dict = {}
+    for literal in literals:
+        node = trie
+        for ch in literal:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: Dict) -> str:
+        ends_here = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends_here:
+            # Greedy optional group: prefer the longer literal, fall back to the one ending here
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+class MultiPatternMatcher:
+    """
+    Counts many literal terms in one pass over a text.
+    Terms are grouped under keys (e.g. "facebook": ["facebook.com", "fb.com"]);
+    the automaton is built once, so the scan costs the same however many
+    terms there are. Per key, occurrences are counted like re.findall on an
+    alternation of its terms: left to right without overlaps, the longest
+    term winning at a shared start. Different keys are counted independently.
+    """
+
+    def __init__(self, terms: Dict[str, Iterable[str]], case_insensitive: bool = True, whole_words: bool = False):
+        self.case_insensitive = case_insensitive
+        self.whole_words = whole_words
+        self.keys = list(terms)
+        self._keys_by_literal: Dict[str, List[str]] = defaultdict(list)
+        for key, literals in terms.items():
+            for literal in literals:
+                if not literal:
+                    raise ValueError(f"Empty term for key {key!r}")
+                literal = literal.lower() if case_insensitive else literal
+                if key not in self._keys_by_literal[literal]:
+                    self._keys_by_literal[literal].append(key)
+        literals = list(self._keys_by_literal)
+
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for literal in literals:
+                self._automaton.add_word(literal, literal)
+            if literals:
+                self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            # Every literal that is a prefix of the longest match also starts at that position
+            self._prefixes = {
+                literal: [literal[:i] for i in range(1, len(literal) + 1) if literal[:i] in self._keys_by_literal]
+                for literal in literals
+            }
+            self._regex = re.compile(f"(?=({_trie_regex(literals)}))") if literals else None
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str], **kwargs) -> "MultiPatternMatcher":
+        """One term per non-empty, non-comment line, each its own key (e.g. a vendor-domain list)."""
+        terms = [line.strip() for line in lines]
+        return cls({term: [term] for term in terms if term and not term.startswith("#")}, **kwargs)
+
+    def _occurrences(self, text: str) -> Iterator[Tuple[int, str]]:
+        """(start, literal) of every occurrence, overlapping ones included."""
+        if self._automaton is not None:
+            if self._keys_by_literal:
+                for end, literal in self._automaton.iter(text):
+                    yield end - len(literal) + 1, literal
+        elif self._regex is not None:
+            prefixes = self._prefixes
+            for match in self._regex.finditer(text):
+                start = match.start()
+                for literal in prefixes[match.group(1)]:
+                    yield start, literal
+
+    @staticmethod
+    def _at_boundary(text: str, index: int) -> bool:
+        """Whether \b would match at index."""
+        before = index > 0 and _is_word_char(text[index - 1])
+        after = index < len(text) and _is_word_char(text[index])
+        return before != after
+
+    def find(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """(start, end, key) of each counted occurrence, in order of start."""
+        if self.case_insensitive:
+            text = text.translate(_CASE_FOLD_TRAPS).lower() if not text.isascii() else text.lower()
+        # Longest literal first at each start, then drop per-key overlaps
+        occurrences = sorted(self._occurrences(text), key=lambda o: (o[0], -len(o[1])))
+        next_free: Dict[str, int] = {}
+        for start, literal in occurrences:
+            end = start + len(literal)
+            if self.whole_words and not (self._at_boundary(text, start) and self._at_boundary(text, end)):
+                continue
+            for key in self._keys_by_literal[literal]:
+                if start >= next_free.get(key, 0):
+                    next_free[key] = end
+                    yield start, end, key
+
+    def count(self, text: str) -> Dict[str, int]:
+        """Occurrences per key (every key present, zero if absent)."""
+        counts = dict.fromkeys(self.keys, 0)
+        for _, _, key in self.find(text):
+            counts[key] += 1
+        return counts
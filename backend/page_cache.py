@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url: str) -> str:
+    """Canonical cache key: lower-case scheme/host, no default port or fragment, sorted query."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+class CachedPage:
+    """A fetched page plus the validators needed to revalidate it."""
+
+    def __init__(self, html: str, scripts: List[str], iframes: List[str],
+                 etag: Optional[str] = None, last_modified: Optional[str] = None,
+                 content_length: Optional[int] = None, truncated: bool = False,
+                 network: Optional[List[Dict[str, Any]]] = None):
+        self.html = html
+        self.scripts = list(scripts)
+        self.iframes = list(iframes)
+        self.etag = etag
+        self.last_modified = last_modified
+        # Declared Content-Length, and whether the body was cut at the byte budget
+        self.content_length = content_length
+        self.truncated = truncated
+        # Network records captured while rendering (render.NetworkCapture), if any
+        self.network = network
+        self.fetched_at = time.time()
+        self.size = sys.getsizeof(html) + sum(sys.getsizeof(s) for s in self.scripts + self.iframes)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def result(self) -> Tuple[str, List[str], List[str]]:
+        """(html, scripts, iframes) with fresh lists, as returned by the fetchers."""
+        return self.html, list(self.scripts), list(self.iframes)
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional GET headers for this page (empty if the server gave none)."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class PageCache:
+    """
+    Byte-bounded LRU cache of fetched pages keyed by (normalized URL, mode).
+    Entries younger than the TTL are served directly; older entries are kept
+    so the fetcher can revalidate them with a conditional GET.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 900):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], CachedPage]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.refetched = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, prefix: str = "PAGE_CACHE") -> "PageCache":
+        """Build a cache sized by <PREFIX>_MAX_BYTES and <PREFIX>_TTL_SECONDS."""
+        return cls(
+            max_bytes=int(os.getenv(f"{prefix}_MAX_BYTES", str(64 * 1024 * 1024))),
+            ttl_seconds=float(os.getenv(f"{prefix}_TTL_SECONDS", "900"))
+        )
+
+    def lookup(self, url: str, mode: str) -> Tuple[Optional[CachedPage], bool]:
+        """Return (entry, fresh). A stale entry is returned for revalidation."""
+        key = (normalize_url(url), mode)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            if entry.age <= self.ttl_seconds:
+                self.hits += 1
+                return entry, True
+            return entry, False
+
+    def put(self, url: str, mode: str, page: CachedPage):
+        """Store a page, evicting least-recently-used entries past max_bytes."""
+        key = (normalize_url(url), mode)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key).size
+            if page.size > self.max_bytes:
+                return
+            self._entries[key] = page
+            self._bytes += page.size
+            while self._bytes > self.max_bytes:
+                _, oldest = self._entries.popitem(last=False)
+                self._bytes -= oldest.size
+                self.evictions += 1
+
+    def mark_revalidated(self, entry: CachedPage):
+        """The server answered 304: the stale entry is fresh again."""
+        with self._lock:
+            entry.fetched_at = time.time()
+            self.revalidated += 1
+
+    def mark_refetched(self):
+        """A stale entry changed upstream and was fetched in full."""
+        with self._lock:
+            self.refetched += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss/revalidation counters and current size."""
+        served = self.hits + self.revalidated
+        lookups = served + self.misses + self.refetched
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "refetched": self.refetched,
+            "misses": self.misses,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds
+        }
@@ -0,0 +1,150 @@
+import re
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from page_fetcher import extract_static_resources
+from html_features import scan_tags, TagScan
+from render import summarize_network
+from cpu_pool import cpu_pool
+from page_fingerprint import fingerprint_html, PageFingerprint
+
+_TAG = re.compile(r'<[^>]+>')
+_WHITESPACE = re.compile(r'\s+')
+_SCRIPT_BLOCK = re.compile(r"<script[^>]*>.*?</script>", re.DOTALL | re.IGNORECASE)
+_STYLE_BLOCK = re.compile(r"<style[^>]*>.*?</style>", re.DOTALL | re.IGNORECASE)
+_TITLE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+_META_DESCRIPTION = [
+    re.compile(r'<meta[^>]*name=["\']description["\'][^>]*content=["\']([^"\'>]*)["\']', re.IGNORECASE),
+    re.compile(r'<meta[^>]*content=["\']([^"\'>]*)["\'][^>]*name=["\']description["\']', re.IGNORECASE),
+    re.compile(r'<meta[^>]*property=["\']og:description["\'][^>]*content=["\']([^"\'>]*)["\']', re.IGNORECASE)
+]
+_HEADINGS = {level: re.compile(rf'<{level}[^>]*>(.*?)</{level}>', re.IGNORECASE | re.DOTALL) for level in ("h1", "h2", "h3")}
+
+# Characters of sanitized HTML kept for analysis, and the shorter sample sent to Gemini
+SANITIZED_LIMIT = 50000
+PROMPT_EXCERPT_LIMIT = 20000
+
+def sanitize_html(html: str) -> str:
+    """Replace script/style bodies and truncate to SANITIZED_LIMIT characters."""
+    html = _SCRIPT_BLOCK.sub("<script>/* content removed */</script>", html)
+    html = _STYLE_BLOCK.sub("<style>/* content removed */</style>", html)
+    return html[:SANITIZED_LIMIT]
+
+class PageDocument:
+    """
+    One fetched page and every view the analyzers derive from it.
+    Each view is computed on first access and memoized, so metric
+    extraction, the advertiser analyzer and prompt building share a single
+    pass per view instead of re-scanning the raw HTML.
+    """
+
+    def __init__(self, html: str, url: str, scripts: Optional[List[str]] = None, iframes: Optional[List[str]] = None,
+                 network: Optional[List[Dict[str, Any]]] = None):
+        self.html = html
+        self.url = url
+        self._scripts = scripts
+        self._iframes = iframes
+        # Requests captured while rendering (see render.NetworkCapture); empty for static fetches
+        self.network = network or []
+
+    @cached_property
+    def _static_resources(self) -> Tuple[List[str], List[str]]:
+        return extract_static_resources(self.html)
+
+    @property
+    def scripts(self) -> List[str]:
+        """Script sources ('inline' for inline scripts), from the fetcher or the markup."""
+        return self._scripts if self._scripts is not None else self._static_resources[0]
+
+    @property
+    def iframes(self) -> List[str]:
+        return self._iframes if self._iframes is not None else self._static_resources[1]
+
+    @cached_property
+    def network_summary(self) -> Optional[Dict[str, Any]]:
+        """Request counts by type, third-party and ad-tag totals, or None without captured requests."""
+        return summarize_network(self.network) if self.network else None
+
+    @cached_property
+    def sanitized(self) -> str:
+        """HTML with script/style bodies removed, truncated to SANITIZED_LIMIT."""
+        return sanitize_html(self.html)
+
+    async def ensure_sanitized(self) -> "PageDocument":
+        """Compute the sanitized view, in the CPU pool for large pages, and return it as a document."""
+        if "sanitized" not in self.__dict__:
+            self.__dict__["sanitized"] = await cpu_pool.run(
+                sanitize_html, self.html, size=len(self.html), inline=lambda: self.sanitized
+            )
+        return self.sanitized_document
+
+    @cached_property
+    def sanitized_document(self) -> "PageDocument":
+        """The sanitized HTML as its own document (same URL, scripts and iframes)."""
+        return PageDocument(self.sanitized, self.url, self.scripts, self.iframes, self.network)
+
+    @cached_property
+    def fingerprint(self) -> PageFingerprint:
+        """Near-duplicate fingerprint of the visible text and tag structure."""
+        return fingerprint_html(self.html)
+
+    async def ensure_fingerprint(self) -> PageFingerprint:
+        """Compute the fingerprint, in the CPU pool for large pages."""
+        if "fingerprint" not in self.__dict__:
+            self.__dict__["fingerprint"] = await cpu_pool.run(
+                fingerprint_html, self.html, size=len(self.html), inline=lambda: self.fingerprint
+            )
+        return self.fingerprint
+
+    @cached_property
+    def prompt_excerpt(self) -> str:
+        """Sanitized HTML sample for LLM prompts."""
+        return self.sanitized[:PROMPT_EXCERPT_LIMIT]
+
+    @cached_property
+    def normalized_text(self) -> str:
+        """Visible text with tags replaced by spaces and whitespace collapsed."""
+        return _WHITESPACE.sub(' ', _TAG.sub(' ', self.html)).strip()
+
+    @cached_property
+    def words(self) -> List[str]:
+        return self.normalized_text.split()
+
+    @cached_property
+    def title(self) -> Optional[str]:
+        match = _TITLE.search(self.html)
+        return match.group(1).strip() if match else None
+
+    @cached_property
+    def meta_description(self) -> Optional[str]:
+        for pattern in _META_DESCRIPTION:
+            match = pattern.search(self.html)
+            if match:
+                return match.group(1).strip()
+        return None
+
+    @cached_property
+    def headings(self) -> Dict[str, List[str]]:
+        """Raw inner HTML of h1-h3 elements by level."""
+        return {level: pattern.findall(self.html) for level, pattern in _HEADINGS.items()}
+
+    @cached_property
+    def tag_scan(self) -> TagScan:
+        """Tag and external-resource counts, filled in one pass over the markup."""
+        return scan_tags(self.html, self.domain)
+
+    @property
+    def tag_counts(self) -> Dict[str, int]:
+        """Counts of the tag shapes the analyzers score (links, images, scripts, ...)."""
+        return self.tag_scan.tags
+
+    @cached_property
+    def domain(self) -> str:
+        """Host without a leading www., used to tell external resources apart."""
+        return urlparse(self.url).netloc.replace('www.', '')
+
+    @property
+    def external_counts(self) -> Dict[str, int]:
+        """Links, scripts and stylesheets pointing at other hosts."""
+        return self.tag_scan.external
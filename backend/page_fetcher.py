@@ -0,0 +1,215 @@
+import re
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+import httpx
+
+from fastapi import HTTPException
+
+import stats
+from http_client import http_client
+from browser_pool import browser_pool
+from render import render
+from page_cache import PageCache, CachedPage
+from snapshot_store import snapshot_store, Snapshot, SNAPSHOTS_ENABLED
+from domain_health import domain_health, CircuitOpenError
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+SCRIPT_SRC_PATTERN = re.compile(r'<script[^>]*src=["\']([^"\']+)["\'][^>]*>')
+IFRAME_SRC_PATTERN = re.compile(r'<iframe[^>]*src=["\']([^"\']+)["\'][^>]*>')
+INLINE_SCRIPT_PATTERN = re.compile(r'<script(?![^>]*src=)[^>]*>.*?</script>', re.DOTALL)
+
+# Fetched pages shared by every analyzer, keyed by (normalized URL, "basic" | "rendered")
+page_cache = PageCache.from_env()
+stats.register("page_cache", page_cache.get_stats)
+
+def extract_static_resources(html: str):
+    """Script sources ('inline' for inline scripts) and iframe sources from static HTML."""
+    external_scripts = SCRIPT_SRC_PATTERN.findall(html)
+    iframes = IFRAME_SRC_PATTERN.findall(html)
+    inline_scripts = INLINE_SCRIPT_PATTERN.findall(html)
+    return external_scripts + ['inline'] * len(inline_scripts), iframes
+
+async def gather_bounded(items: Sequence[Any], worker: Callable[[Any], Awaitable[Any]],
+                         concurrency: int, deadline: float) -> List[Any]:
+    """
+    Run worker over items concurrently, at most `concurrency` at a time, each
+    limited to `deadline` seconds once started. Results keep the input order;
+    a failed or timed-out item yields its exception instead of a result.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(item):
+        async with semaphore:
+            return await asyncio.wait_for(worker(item), timeout=deadline)
+
+    return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+
+def describe_fetch_error(error: BaseException) -> str:
+    """Readable message for an exception returned by gather_bounded."""
+    if isinstance(error, asyncio.TimeoutError):
+        return "Fetch deadline exceeded"
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    return str(error)
+
+async def record_snapshot(url: str, mode: str, html: str, scripts, iframes):
+    """Store a freshly fetched page in the snapshot store (never fails the fetch)."""
+    if not SNAPSHOTS_ENABLED:
+        return None
+    try:
+        return await asyncio.to_thread(snapshot_store.save, url, mode, html, scripts, iframes)
+    except Exception as e:
+        logger.warning(f"⚠️ Snapshot of {url} not stored: {e}")
+        return None
+
+async def load_snapshot(snapshot_id: str) -> Snapshot:
+    """Load a stored page by id for offline re-analysis."""
+    snapshot = await asyncio.to_thread(snapshot_store.load, snapshot_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"Snapshot {snapshot_id} not found")
+    return snapshot
+
+def _counts_against_domain(error: BaseException) -> bool:
+    """Client errors (4xx) mean the site answered; only they don't trip the breaker."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return True
+
+@asynccontextmanager
+async def guarded_fetch(url: str, mode: str, latency: Optional[Callable[[], float]] = None):
+    """
+    Circuit-breaker and adaptive-timeout guard around one fetch.
+    Yields the timeout (seconds) to use; raises CircuitOpenError without
+    fetching while the domain's circuit is open. latency, if given, returns
+    the seconds to record instead of the whole block's duration (the part
+    the timeout actually limits).
+    """
+    timeout = domain_health.before_fetch(url, mode)
+    start = time.perf_counter()
+    try:
+        yield timeout
+    except asyncio.CancelledError:
+        domain_health.release(url)
+        raise
+    except Exception as e:
+        if _counts_against_domain(e):
+            domain_health.record_failure(url, e)
+        else:
+            domain_health.record_success(url, mode, time.perf_counter() - start)
+        raise
+    else:
+        domain_health.record_success(url, mode, latency() if latency is not None else time.perf_counter() - start)
+
+async def fetch_basic_html(url: str):
+    """Fallback method: stream static HTML (up to FETCH_MAX_BYTES) through the shared client (cached)."""
+    entry, fresh = page_cache.lookup(url, "basic")
+    if fresh:
+        return entry.result()
+    try:
+        async with guarded_fetch(url, "basic") as timeout:
+            page = await http_client.fetch_text(url, headers=entry.validators() if entry else None, timeout=timeout)
+        if entry is not None and page.status_code == 304:
+            page_cache.mark_revalidated(entry)
+            return entry.result()
+        html = page.text
+        scripts, iframes = extract_static_resources(html)
+        if entry is not None:
+            page_cache.mark_refetched()
+        page_cache.put(url, "basic", CachedPage(
+            html, scripts, iframes,
+            etag=page.headers.get("etag"),
+            last_modified=page.headers.get("last-modified"),
+            content_length=page.content_length,
+            truncated=page.truncated
+        ))
+        await record_snapshot(url, "basic", html, scripts, iframes)
+        return html, scripts, iframes
+    except CircuitOpenError as e:
+        logger.warning(f"⚠️ {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Fallback fetch error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch URL: {str(e)}")
+
+async def _still_valid(url: str, entry: CachedPage) -> bool:
+    """Conditional GET of the document behind a stale rendered entry; True on 304."""
+    validators = entry.validators()
+    if not validators:
+        return False
+    try:
+        # Headers only: a 200 means re-rendering anyway, so its body is never downloaded
+        async with guarded_fetch(url, "basic") as timeout:
+            page = await http_client.fetch_text(url, max_bytes=0, headers=validators, timeout=timeout)
+        return page.status_code == 304
+    except Exception as e:
+        logger.debug(f"Revalidation of {url} failed: {e}")
+        return False
+
+async def fetch_rendered_html(url: str):
+    """Fetch HTML using a pooled Playwright browser for full rendering (cached)."""
+    html, scripts, iframes, _, _ = await fetch_rendered_page(url)
+    return html, scripts, iframes
+
+async def fetch_rendered_page(url: str):
+    """
+    Like fetch_rendered_html, plus the script/iframe/XHR/ad-tag requests
+    captured while the page loaded (empty when capture is off or the
+    page came from a revalidated cache entry without them), and the
+    render report (RenderReport.to_dict; None when served from the cache).
+    """
+    entry, fresh = page_cache.lookup(url, "rendered")
+    if fresh:
+        return (*entry.result(), list(entry.network or []), None)
+    if entry is not None:
+        if await _still_valid(url, entry):
+            page_cache.mark_revalidated(entry)
+            return (*entry.result(), list(entry.network or []), None)
+        page_cache.mark_refetched()
+    try:
+        async with browser_pool.page() as page:
+            # The timeout limits navigation only, so only navigation time feeds it
+            async with guarded_fetch(url, "rendered", latency=lambda: report.navigation_ms / 1000) as timeout:
+                logger.info(f"Navigating to: {url}")
+                report = await render(page, url, timeout_ms=timeout * 1000)
+
+                logger.info("Page loaded, extracting content...")
+                html = await page.content()
+
+                if report.network is not None:
+                    # Sources come from the request stream; inline scripts never hit the network
+                    inline_count = len(INLINE_SCRIPT_PATTERN.findall(html))
+                    scripts = report.network.script_urls() + ['inline'] * inline_count
+                    iframes = report.network.iframe_urls()
+                    network = report.network.to_dicts()
+                else:
+                    scripts = await page.evaluate("""
+                        () => Array.from(document.scripts).map(s => s.src || 'inline')
+                    """)
+
+                    iframes = await page.evaluate("""
+                        () => Array.from(document.querySelectorAll('iframe')).map(f => f.src).filter(src => src)
+                    """)
+                    network = []
+
+            logger.info("Content extracted successfully")
+            page_cache.put(url, "rendered", CachedPage(
+                html, scripts, iframes,
+                etag=report.headers.get("etag"),
+                last_modified=report.headers.get("last-modified"),
+                network=network
+            ))
+            await record_snapshot(url, "rendered", html, scripts, iframes)
+            return html, scripts, iframes, network, report.to_dict()
+
+    except CircuitOpenError as e:
+        logger.warning(f"⚠️ {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error fetching rendered page: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching page: {str(e)}")
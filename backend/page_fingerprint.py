@@ -0,0 +1,293 @@
+import os
+import re
+import asyncio
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import stats
+from page_cache import normalize_url
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_DIR = os.getenv(
+    "FINGERPRINT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "fingerprints")
+)
+FINGERPRINTS_ENABLED = os.getenv("FINGERPRINTS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Differing bits (of 64) up to which two pages count as the same content / the same layout
+FINGERPRINT_MAX_DISTANCE = int(os.getenv("FINGERPRINT_MAX_DISTANCE", "3"))
+FINGERPRINT_MAX_STRUCTURE_DISTANCE = int(os.getenv("FINGERPRINT_MAX_STRUCTURE_DISTANCE", "4"))
+# Stored results older than this are recomputed even if the page is unchanged, and deleted on save
+FINGERPRINT_TTL_SECONDS = float(os.getenv("FINGERPRINT_TTL_SECONDS", str(7 * 24 * 3600)))
+# Results kept per (kind, key); older ones are pruned on save
+FINGERPRINT_KEEP_PER_KEY = 5
+# Saves between passes that delete results past the TTL (for pages never looked up again)
+FINGERPRINT_PRUNE_EVERY = 50
+
+_INVISIBLE_BLOCK = re.compile(r"(<(script|style|noscript|template)\b[^>]*>).*?</\2\s*>|<!--.*?-->", re.DOTALL | re.IGNORECASE)
+_STRUCTURE_TAG = re.compile(r"<(/?[a-zA-Z][\w:-]*)([^>]*)")
+_SRC = re.compile(r"""\bsrc\s*=\s*["']?([^"'\s>]+)""", re.IGNORECASE)
+# Tags whose src is part of the page's resource (and ad) stack
+_RESOURCE_TAGS = ("script", "iframe")
+_TAG = re.compile(r"<[^>]*>")
+_WORD = re.compile(r"\w+")
+
+TEXT_SHINGLE = 3
+STRUCTURE_SHINGLE = 4
+
+def _shingles(tokens: List[str], size: int) -> Counter:
+    if len(tokens) <= size:
+        return Counter([" ".join(tokens)]) if tokens else Counter()
+    return Counter(" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+
+def simhash(features: Counter) -> int:
+    """64-bit SimHash of weighted features: near-duplicate inputs differ in few bits."""
+    if not features:
+        return 0
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little") for f in features),
+        dtype=np.uint64, count=len(features)
+    )
+    weights = np.fromiter(features.values(), dtype=np.int64, count=len(features))
+    positions = np.arange(64, dtype=np.uint64)
+    totals = np.zeros(64, dtype=np.int64)
+    # Chunked so a large page never materializes an n x 64 matrix at once
+    for i in range(0, len(hashes), 8192):
+        bits = ((hashes[i:i + 8192, None] >> positions) & np.uint64(1)).astype(np.int64)
+        totals += weights[i:i + 8192] @ bits
+    majority = totals * 2 > weights.sum()
+    return sum(1 << int(bit) for bit in np.flatnonzero(majority))
+
+class PageFingerprint:
+    """
+    SimHash of a page's visible text, SimHash of its tag structure, and an
+    exact hash of its script/iframe source hosts (the resource stack).
+    """
+
+    def __init__(self, text: int, structure: int, resources: Optional[int] = None):
+        self.text = text
+        self.structure = structure
+        self.resources = resources
+
+    def distance(self, other: "PageFingerprint") -> Tuple[int, int]:
+        """Differing bits in (text, structure)."""
+        return bin(self.text ^ other.text).count("1"), bin(self.structure ^ other.structure).count("1")
+
+    def matches(self, other: "PageFingerprint", max_distance: int = FINGERPRINT_MAX_DISTANCE,
+                max_structure_distance: int = FINGERPRINT_MAX_STRUCTURE_DISTANCE) -> bool:
+        # Scripts and ad tags are what the cached metrics measure: any change there is a new page
+        if self.resources is None or self.resources != other.resources:
+            return False
+        text_distance, structure_distance = self.distance(other)
+        return text_distance <= max_distance and structure_distance <= max_structure_distance
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"text": f"{self.text:016x}", "structure": f"{self.structure:016x}", "resources": f"{self.resources:016x}"}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, str]) -> "PageFingerprint":
+        # Entries stored before resources were fingerprinted never match
+        resources = data.get("resources")
+        return cls(int(data["text"], 16), int(data["structure"], 16), int(resources, 16) if resources else None)
+
+def _structure_tokens(html: str) -> Tuple[List[str], Counter]:
+    """Tag names in document order, scripts and iframes as name@host, plus the count of each name@host."""
+    tokens = []
+    resources = Counter()
+    for name, attributes in _STRUCTURE_TAG.findall(html):
+        name = name.lower()
+        if name in _RESOURCE_TAGS:
+            src = _SRC.search(attributes)
+            if src:
+                try:
+                    host = urlparse(src.group(1)).hostname or ""
+                except ValueError:
+                    host = ""
+                # Relative (and unparseable) sources count as the page's own host
+                name = f"{name}@{host}"
+                resources[name] += 1
+        tokens.append(name)
+    return tokens, resources
+
+def fingerprint_html(html: str) -> PageFingerprint:
+    """
+    Fingerprint normalized page content: lower-cased word shingles of the
+    visible text (script/style bodies and comments dropped, so nonces and
+    inline state do not count), shingles of the open/close tag sequence
+    with script/iframe source hosts, and the multiset of those sources.
+    """
+    # Opening tags of the dropped blocks stay for the structure; tag removal drops them from the text
+    visible = _INVISIBLE_BLOCK.sub(lambda match: match.group(1) or " ", html)
+    words = _WORD.findall(_TAG.sub(" ", visible).lower())
+    tags, resources = _structure_tokens(visible)
+    resource_digest = hashlib.blake2b(
+        "\n".join(f"{name} {count}" for name, count in sorted(resources.items())).encode("utf-8"), digest_size=8
+    ).digest()
+    return PageFingerprint(
+        simhash(_shingles(words, TEXT_SHINGLE)),
+        simhash(_shingles(tags, STRUCTURE_SHINGLE)),
+        int.from_bytes(resource_digest, "little")
+    )
+
+class FingerprintStore:
+    """
+    Analysis results (metrics, Gemini reports and insights) stored under
+    the fingerprints of the pages they were computed from. A lookup for
+    the same kind and key (normalized URL, or URLs joined) returns the
+    newest result whose pages all match the given fingerprints within
+    the Hamming distance limits, so unchanged pages skip recomputation
+    and re-prompting.
+    """
+
+    def __init__(self, directory: str = FINGERPRINT_DIR, enabled: bool = FINGERPRINTS_ENABLED,
+                 ttl_seconds: float = FINGERPRINT_TTL_SECONDS):
+        self.directory = directory
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0
+        self.pruned = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, "results.sqlite3"), check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    fingerprints TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    result TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS results_by_key ON results (kind, key, created_at);
+            """)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(urls: Iterable[str]) -> str:
+        return "|".join(normalize_url(url) for url in urls)
+
+    def find(self, kind: str, urls: List[str], fingerprints: List[PageFingerprint]) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        """(result, reuse details) of the newest matching result, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT fingerprints, created_at, result FROM results "
+                "WHERE kind = ? AND key = ? AND created_at >= ? ORDER BY created_at DESC LIMIT ?",
+                (kind, self.make_key(urls), time.time() - self.ttl_seconds, FINGERPRINT_KEEP_PER_KEY)
+            ).fetchall()
+        for row in rows:
+            stored = [PageFingerprint.from_dict(data) for data in json.loads(row["fingerprints"])]
+            if len(stored) == len(fingerprints) and all(old.matches(new) for old, new in zip(stored, fingerprints)):
+                distances = [old.distance(new) for old, new in zip(stored, fingerprints)]
+                self.hits += 1
+                return json.loads(row["result"]), {
+                    "analyzed_at": row["created_at"],
+                    "distance": max(text for text, _ in distances),
+                    "structure_distance": max(structure for _, structure in distances)
+                }
+        self.misses += 1
+        return None
+
+    def save(self, kind: str, urls: List[str], fingerprints: List[PageFingerprint], result: Any):
+        """
+        Store a result and prune all but the newest FINGERPRINT_KEEP_PER_KEY
+        for its kind and key; every FINGERPRINT_PRUNE_EVERY saves, results
+        past the TTL are dropped for all keys.
+        """
+        if not self.enabled:
+            return
+        key = self.make_key(urls)
+        with self._lock:
+            conn = self._connect()
+            if self.saved % FINGERPRINT_PRUNE_EVERY == 0:
+                self._prune(conn)
+            conn.execute(
+                "INSERT INTO results (kind, key, fingerprints, created_at, result) VALUES (?, ?, ?, ?, ?)",
+                (kind, key, json.dumps([fp.to_dict() for fp in fingerprints]), time.time(), json.dumps(result))
+            )
+            conn.execute(
+                "DELETE FROM results WHERE kind = ? AND key = ? AND id NOT IN "
+                "(SELECT id FROM results WHERE kind = ? AND key = ? ORDER BY created_at DESC LIMIT ?)",
+                (kind, key, kind, key, FINGERPRINT_KEEP_PER_KEY)
+            )
+            conn.commit()
+            self.saved += 1
+
+    def prune(self) -> int:
+        """Delete every result older than the TTL now; returns the number removed."""
+        with self._lock:
+            return self._prune(self._connect())
+
+    def _prune(self, conn: sqlite3.Connection) -> int:
+        """Delete results older than the TTL, whatever their key (lock held)."""
+        removed = conn.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.ttl_seconds,)).rowcount
+        conn.commit()
+        if removed:
+            self.pruned += removed
+            logger.info(f"Pruned {removed} expired fingerprint results")
+        return removed
+
+    async def get_or_compute(self, kind: str, urls: List[str], fingerprints: List[PageFingerprint],
+                             compute: Callable[[], Awaitable[Any]], refresh: bool = False,
+                             keep: Callable[[Any], bool] = bool) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        """
+        The stored result for these pages if one matches (unless refresh),
+        otherwise compute() and store it when keep(result) holds (e.g. not
+        an error report). Returns (result, reuse details or None).
+        """
+        if not refresh:
+            stored = await asyncio.to_thread(self.find, kind, urls, fingerprints)
+            if stored is not None:
+                logger.info(f"🔄 Reusing stored {kind} for {urls[0]} (distance {stored[1]['distance']})")
+                return stored
+        result = await compute()
+        if keep(result):
+            try:
+                await asyncio.to_thread(self.save, kind, urls, fingerprints, result)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not store {kind} result: {e}")
+        return result, None
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        result = {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved": self.saved,
+            "pruned": self.pruned,
+            "max_distance": FINGERPRINT_MAX_DISTANCE,
+            "max_structure_distance": FINGERPRINT_MAX_STRUCTURE_DISTANCE,
+            "ttl_seconds": self.ttl_seconds
+        }
+        if self._conn is None and not os.path.exists(os.path.join(self.directory, "results.sqlite3")):
+            return result
+        with self._lock:
+            result["stored"] = self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return result
+
+# Create singleton store instance
+fingerprint_store = FingerprintStore()
+
+stats.register("fingerprint_store", fingerprint_store.get_stats)
@@ -1,20 +1,29 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, HttpUrl
-from typing import Dict
-from sentence_transformers import SentenceTransformer, util
+from typing import Dict, Optional
 from urllib.parse import urlparse
-import torch
 import asyncio
 import os
 import json
 import re
 import sys
-import requests
-from playwright.async_api import async_playwright
 import google.generativeai as genai
 from dotenv import load_dotenv
 import logging
 from exa_agent import exa_agent, QueryRequest as ExaQueryRequest
+from page_fetcher import fetch_basic_html, fetch_rendered_html, fetch_rendered_page, gather_bounded, describe_fetch_error, load_snapshot
+from snapshot_store import snapshot_store
+from page_document import PageDocument
+from site_features import site_features
+from page_fingerprint import fingerprint_store
+from embedding_cache import embedding_cache
+from encoders import metric_encoder
+from batching import get_batcher
+from metric_matcher import MetricMatcher
+from query_cache import QueryCache
+from query_router import KeywordTrie, TwoStageRouter, synonyms_from_keywords
+import stats
+from warmup import warmup
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -25,8 +34,9 @@ load_dotenv()
 # Initialize router
 router = APIRouter()
 
-# Load the model at startup (shared across services)
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# Competitor fan-out: sites fetched at once, and seconds allowed per site
+COMPETITOR_FETCH_CONCURRENCY = int(os.getenv("COMPETITOR_FETCH_CONCURRENCY", "4"))
+COMPETITOR_FETCH_DEADLINE = float(os.getenv("COMPETITOR_FETCH_DEADLINE", "30"))
 
 # Global variables for website analysis
 playwright_available = False
@@ -36,7 +46,11 @@ class UserQuery(BaseModel):
     query: str
 
 class URLRequest(BaseModel):
-    url: HttpUrl
+    url: Optional[HttpUrl] = None
+    # Re-analyze a stored page instead of fetching url (see GET /publisher/snapshots)
+    snapshot_id: Optional[str] = None
+    # Re-analyze even if a stored report matches the page's fingerprint
+    refresh: bool = False
 
 # Initialize Gemini and Playwright
 def initialize_services():
@@ -66,122 +80,27 @@ def initialize_services():
         except Exception:
             playwright_available = False
 
-# Call initialization
-initialize_services()
-
 # Website analysis utility functions
-def fetch_basic_html(url: str):
-    """Fallback method using requests for basic HTML fetching."""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30, verify=False)
-        response.raise_for_status()
-        html = response.text
-        
-        # Basic script and iframe extraction from static HTML
-        script_pattern = r'<script[^>]*src=["\']([^"\']+)["\'][^>]*>'
-        iframe_pattern = r'<iframe[^>]*src=["\']([^"\']+)["\'][^>]*>'
-        
-        external_scripts = re.findall(script_pattern, html)
-        iframes = re.findall(iframe_pattern, html)
-        
-        # Count inline scripts
-        inline_script_pattern = r'<script(?![^>]*src=)[^>]*>.*?</script>'
-        inline_scripts = re.findall(inline_script_pattern, html, re.DOTALL)
-        
-        scripts = external_scripts + ['inline'] * len(inline_scripts)
-        
-        return html, scripts, iframes
-    except Exception as e:
-        logger.error(f"Fallback fetch error: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to fetch URL: {str(e)}")
-
-async def fetch_rendered_html(url: str):
-    """Fetch HTML using Playwright for full rendering."""
-    try:
-        async with async_playwright() as p:
-            logger.info(f"Launching browser for URL: {url}")
-            
-            launch_options = {
-                'headless': True,
-                'args': [
-                    '--no-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-gpu',
-                    '--disable-software-rasterizer',
-                    '--disable-background-timer-throttling',
-                    '--disable-backgrounding-occluded-windows',
-                    '--disable-renderer-backgrounding',
-                    '--disable-web-security',
-                    '--disable-features=VizDisplayCompositor'
-                ]
-            }
-            
-            if sys.platform == "win32":
-                launch_options['args'].extend([
-                    '--disable-extensions',
-                    '--no-first-run',
-                    '--disable-default-apps'
-                ])
-            
-            browser = await p.chromium.launch(**launch_options)
-            context = await browser.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
-            page = await context.new_page()
-            
-            try:
-                logger.info(f"Navigating to: {url}")
-                await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                await page.wait_for_timeout(2000)  # Wait for JS to execute
-                
-                logger.info("Page loaded, extracting content...")
-                html = await page.content()
-                
-                scripts = await page.evaluate("""
-                    () => Array.from(document.scripts).map(s => s.src || 'inline')
-                """)
-                
-                iframes = await page.evaluate("""
-                    () => Array.from(document.querySelectorAll('iframe')).map(f => f.src).filter(src => src)
-                """)
-                
-                logger.info("Content extracted successfully")
-                
-            except Exception as e:
-                logger.error(f"Error during page operations: {e}")
-                raise HTTPException(status_code=500, detail=f"Error fetching page: {str(e)}")
-            finally:
-                await browser.close()
-                
-            return html, scripts, iframes
-            
-    except Exception as e:
-        logger.error(f"Error launching browser: {e}")
-        raise HTTPException(status_code=500, detail=f"Browser launch error: {str(e)}")
-
-def sanitize_html(html: str) -> str:
-    """Remove script contents and truncate."""
-    html = re.sub(r"<script[^>]*>.*?</script>", "<script>/* content removed */</script>", html, flags=re.DOTALL|re.IGNORECASE)
-    html = re.sub(r"<style[^>]*>.*?</style>", "<style>/* content removed */</style>", html, flags=re.DOTALL|re.IGNORECASE)
-    return html[:50000]
-
-def prepare_gemini_prompt(url: str, html: str, scripts: list, iframes: list) -> str:
+def prepare_gemini_prompt(document: PageDocument) -> str:
     """Prepare the prompt for Gemini analysis."""
-    external_scripts = [s for s in scripts if s != "inline" and s]
-    inline_scripts_count = sum(1 for s in scripts if s == "inline")
+    external_scripts = [s for s in document.scripts if s != "inline" and s]
+    inline_scripts_count = sum(1 for s in document.scripts if s == "inline")
+    
+    # Sanitized HTML, truncated more aggressively to leave room for response
+    html_sample = document.prompt_excerpt
     
-    # Truncate HTML more aggressively to leave room for response
-    html_sample = html[:20000] if len(html) > 20000 else html
+    network_line = ""
+    if document.network_summary:
+        summary = document.network_summary
+        network_line = (f"\nNetwork: {summary['requests']} script/iframe/XHR/ad requests, "
+                        f"{summary['third_party']} third-party, {summary['ad_tags']} to ad servers")
     
     return f"""Analyze this website for security, SEO, and ad placement opportunities.
 
-URL: {url}
+URL: {document.url}
 HTML (sample): {html_sample}
 Scripts: {len(external_scripts)} external, {inline_scripts_count} inline
-Iframes: {len(iframes)}
+Iframes: {len(document.iframes)}{network_line}
 
 Return JSON with exactly these keys:
 {{
@@ -401,6 +320,10 @@ PUBLISHER_METRICS = {
     "geography": "Geography / Device breakdown"
 }
 
+# Keywords that name one metric outright (lexical routing stage); generic ones
+# that name no single metric are left to the embedding stage
+PUBLISHER_SYNONYMS = synonyms_from_keywords(PUBLISHER_KEYWORDS, PUBLISHER_METRICS)
+
 # Function mapping for publisher
 PUBLISHER_FUNCTION_MAP = {
     "impressions": get_impressions,
@@ -410,45 +333,95 @@ PUBLISHER_FUNCTION_MAP = {
     "geography": get_geography
 }
 
-# Pre-compute embeddings
-publisher_keywords_embeddings = model.encode(PUBLISHER_KEYWORDS)
+# Embeddings are computed during warm-up (see load_metric_embeddings)
 publisher_metric_texts = [f"{key}: {desc}" for key, desc in PUBLISHER_METRICS.items()]
 publisher_metric_keys = list(PUBLISHER_METRICS.keys())
-publisher_metric_embeddings = model.encode(publisher_metric_texts)
+publisher_metric_embeddings = None
+publisher_matcher = None
+
+# Cache of normalized chat query -> (matched metric, similarity)
+publisher_query_cache = QueryCache.from_env()
+stats.register("publisher_query_cache", publisher_query_cache.get_stats)
+
+# Lexical fast path -> query cache -> embedding matcher
+publisher_query_router = TwoStageRouter(
+    "publisher",
+    KeywordTrie.from_catalogue(publisher_metric_keys, PUBLISHER_SYNONYMS),
+    publisher_query_cache
+)
+stats.register("publisher_query_router", publisher_query_router.get_stats)
+
+def load_metric_embeddings():
+    """Load metric embeddings from the on-disk cache (encoding only new texts)."""
+    global publisher_metric_embeddings, publisher_matcher
+    
+    publisher_metric_embeddings = embedding_cache.encode(publisher_metric_texts)
+    publisher_matcher = MetricMatcher(publisher_metric_keys, publisher_metric_embeddings)
+    phrases = [phrase for phrase, _ in publisher_query_router.trie.phrase_list()]
+    publisher_query_router.set_phrase_similarities(publisher_matcher, embedding_cache.encode(phrases))
+    publisher_query_cache.clear()
 
-@router.post("/analyze")
+@router.post("/analyze", dependencies=[Depends(warmup.require("publisher"))])
 async def analyze_site(request: URLRequest):
-    """Analyze a website for security, SEO, and ad opportunities."""
-    url = str(request.url)
+    """Analyze a website (or a stored snapshot of one) for security, SEO, and ad opportunities."""
+    if request.snapshot_id:
+        snapshot = await load_snapshot(request.snapshot_id)
+        url = snapshot.url
+    elif request.url:
+        snapshot = None
+        url = str(request.url)
+    else:
+        raise HTTPException(status_code=400, detail="Provide a url or a snapshot_id")
     logger.info(f"Publisher analyzing URL: {url}")
     
     try:
         # Fetch HTML content
-        if playwright_available:
+        network = None
+        render_report = None
+        if snapshot is not None:
+            html, scripts, iframes = snapshot.result()
+            fetch_method = "snapshot"
+        elif playwright_available:
             try:
-                html, scripts, iframes = await fetch_rendered_html(url)
+                html, scripts, iframes, network, render_report = await fetch_rendered_page(url)
                 fetch_method = "playwright"
             except Exception as playwright_error:
                 logger.warning(f"Playwright failed: {playwright_error}")
                 logger.info("Falling back to basic HTTP request...")
-                html, scripts, iframes = fetch_basic_html(url)
+                html, scripts, iframes = await fetch_basic_html(url)
                 fetch_method = "fallback"
         else:
             logger.info("Using fallback HTTP method")
-            html, scripts, iframes = fetch_basic_html(url)
+            html, scripts, iframes = await fetch_basic_html(url)
             fetch_method = "fallback"
         
-        # Sanitize HTML
-        sanitized_html = sanitize_html(html)
+        document = PageDocument(html, url, scripts, iframes, network)
         
-        # Prepare prompt and call Gemini
-        prompt = prepare_gemini_prompt(url, sanitized_html, scripts, iframes)
-        report = call_gemini(prompt)
+        async def analyze() -> dict:
+            await document.ensure_sanitized()
+            # Prepare prompt and call Gemini
+            prompt = prepare_gemini_prompt(document)
+            return call_gemini(prompt)
+        
+        # Reuse the stored report while the page's content is unchanged
+        report, reused = await fingerprint_store.get_or_compute(
+            "publisher_analysis", [url], [await document.ensure_fingerprint()], analyze,
+            refresh=request.refresh, keep=lambda result: "error" not in result
+        )
         
         # Add metadata to response
         report["fetch_method"] = fetch_method
+        if reused:
+            report["reused"] = reused
+        if document.network_summary:
+            report["network"] = document.network_summary
+        if render_report:
+            # Blocked requests, bytes avoided and settle time of this fetch's render
+            report["render"] = render_report
         report["url"] = url
         report["service"] = "publisher"
+        if snapshot is not None:
+            report["snapshot_id"] = snapshot.id
         
         logger.info(f"Website analysis completed for {url}")
         return {"url": url, "report": report}
@@ -459,7 +432,7 @@ async def analyze_site(request: URLRequest):
         logger.error(f"Analysis failed for {url}: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-@router.post("/exa-content-strategy")
+@router.post("/exa-content-strategy", dependencies=[Depends(warmup.require("publisher"))])
 async def exa_content_strategy(request: ExaQueryRequest):
     """Get AI-powered content strategy using Exa web search."""
     logger.info(f"Publisher Exa content strategy request: {request.query}")
@@ -476,36 +449,31 @@ async def exa_content_strategy(request: ExaQueryRequest):
 
 class CompetitiveAnalysisRequest(BaseModel):
     url: HttpUrl
+    # Recompute metrics and insights even for pages whose fingerprint matches a stored one
+    refresh: bool = False
 
 class MultiCompetitiveAnalysisRequest(BaseModel):
     my_website: HttpUrl
     competitor_urls: list[HttpUrl]
+    refresh: bool = False
 
-def extract_metrics(html: str, url: str) -> dict:
-    """Extract quantifiable metrics from website HTML."""
+async def extract_metrics(document: PageDocument, sanitized: bool = False) -> dict:
+    """Extract quantifiable metrics from a page document (or its sanitized view)."""
+    url = document.url
     try:
-        # Word count
-        text_content = re.sub(r'<[^>]+>', '', html)  # Strip HTML tags
-        word_count = len(text_content.split())
-
-        # Keyword frequency (basic)
-        keywords = ['tech', 'AI', 'startup', 'news']  # Example keywords
-        keyword_freq = {kw: len(re.findall(rf'\b{kw}\b', text_content, re.IGNORECASE)) for kw in keywords}
+        features = await site_features.extract_async(document, [
+            "word_count", "keyword_freq", "ad_mentions", "title", "meta_description", "link_count", "image_count"
+        ], sanitized=sanitized)
+        html = document.sanitized if sanitized else document.html
+        word_count = features["word_count"]
 
         # Ad density estimation
-        ad_patterns = ['ad', 'advert', 'banner', 'sponsored']
-        ad_count = sum(len(re.findall(pattern, html, re.IGNORECASE)) for pattern in ad_patterns)
+        ad_count = sum(features["ad_mentions"].values())
         ad_density = min((ad_count / max(len(html), 1)) * 100, 100)  # Percentage
 
         # SEO factors
-        title_match = re.search(r'<title>(.*?)</title>', html, re.IGNORECASE)
-        title_length = len(title_match.group(1)) if title_match else 0
-        meta_desc_match = re.search(r'<meta\s+name=["\']description["\']\s+content=["\'](.*?)["\']', html, re.IGNORECASE)
-        meta_desc_length = len(meta_desc_match.group(1)) if meta_desc_match else 0
-
-        # Engagement cues (basic)
-        link_count = len(re.findall(r'<a\s+href=', html, re.IGNORECASE))
-        image_count = len(re.findall(r'<img\s+src=', html, re.IGNORECASE))
+        title_length = len(features["title"]) if features["title"] is not None else 0
+        meta_desc_length = len(features["meta_description"]) if features["meta_description"] is not None else 0
 
         # Traffic estimates (placeholder, based on content volume)
         impressions = 1000000 if word_count > 500 else 500000
@@ -515,13 +483,13 @@ def extract_metrics(html: str, url: str) -> dict:
 
         return {
             "word_count": word_count,
-            "keyword_freq": keyword_freq,
+            "keyword_freq": features["keyword_freq"],
             "ad_density": round(ad_density, 2),
             "ad_count": ad_count,
             "title_length": title_length,
             "meta_desc_length": meta_desc_length,
-            "link_count": link_count,
-            "image_count": image_count,
+            "link_count": features["link_count"],
+            "image_count": features["image_count"],
             "impressions": impressions,
             "ctr": ctr,
             "revenue": round(revenue, 2),
@@ -533,49 +501,64 @@ def extract_metrics(html: str, url: str) -> dict:
         logger.error(f"Metric extraction failed for {url}: {e}")
         return {}
 
-@router.post("/competitive-analysis")
+async def page_metrics(document: PageDocument, sanitized: bool = False, refresh: bool = False) -> dict:
+    """extract_metrics(), reused from the fingerprint store while the page's content is unchanged."""
+    metrics, _ = await fingerprint_store.get_or_compute(
+        "metrics:sanitized" if sanitized else "metrics", [document.url], [await document.ensure_fingerprint()],
+        lambda: extract_metrics(document, sanitized), refresh=refresh
+    )
+    return metrics
+
+@router.post("/competitive-analysis", dependencies=[Depends(warmup.require("publisher"))])
 async def competitive_analysis(request: CompetitiveAnalysisRequest):
     """Perform competitive analysis for a given website URL."""
     url = str(request.url)
     logger.info(f"Competitive analysis for URL: {url}")
+    # Fingerprint of each analyzed competitor page, for reusing insights
+    fingerprints = {}
     
-    try:
-        # Step 1: Fetch and analyze the input website
+    async def fetch_input_site():
         if playwright_available:
             try:
                 html, scripts, iframes = await fetch_rendered_html(url)
-                fetch_method = "playwright"
+                return html, "playwright"
             except Exception as playwright_error:
                 logger.warning(f"Playwright failed: {playwright_error}")
-                html, scripts, iframes = fetch_basic_html(url)
-                fetch_method = "fallback"
+        html, scripts, iframes = await fetch_basic_html(url)
+        return html, "fallback"
+    
+    async def analyze_competitor(comp_url: str) -> dict:
+        if playwright_available:
+            comp_html, _, _ = await fetch_rendered_html(comp_url)
         else:
-            html, scripts, iframes = fetch_basic_html(url)
-            fetch_method = "fallback"
-        
-        sanitized_html = sanitize_html(html)
-        input_metrics = extract_metrics(sanitized_html, url)
-        
+            comp_html, _, _ = await fetch_basic_html(comp_url)
+        comp_document = PageDocument(comp_html, comp_url)
+        comp_metrics = await page_metrics(comp_document, refresh=request.refresh)
+        comp_metrics["url"] = comp_url
+        fingerprints[comp_url] = comp_document.fingerprint
+        return comp_metrics
+    
+    # Step 1: Fetch the input website while competitors are looked up
+    input_task = asyncio.create_task(fetch_input_site())
+    try:
         # Step 2: Find competitors using Exa
         domain = urlparse(url).netloc.replace('www.', '')
         query = f"site:*.{domain.split('.')[-1]} {domain.split('.')[0]} similar sites"
         exa_request = ExaQueryRequest(query=query, num_results=3)
         competitor_results = await exa_agent.publisher_content_strategy(exa_request)
         
+        competitor_urls = [result["url"] for result in competitor_results.get("trending_content", [])[:3]]
+        results = await gather_bounded(competitor_urls, analyze_competitor, COMPETITOR_FETCH_CONCURRENCY, COMPETITOR_FETCH_DEADLINE)
         competitors = []
-        for result in competitor_results.get("trending_content", [])[:3]:
-            comp_url = result["url"]
-            try:
-                if playwright_available:
-                    comp_html, _, _ = await fetch_rendered_html(comp_url)
-                else:
-                    comp_html, _, _ = fetch_basic_html(comp_url)
-                comp_metrics = extract_metrics(comp_html, comp_url)
-                comp_metrics["url"] = comp_url
-                competitors.append(comp_metrics)
-            except Exception as e:
-                logger.warning(f"Failed to fetch competitor {comp_url}: {e}")
+        for comp_url, result in zip(competitor_urls, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to fetch competitor {comp_url}: {describe_fetch_error(result)}")
                 continue
+            competitors.append(result)
+        
+        html, fetch_method = await input_task
+        input_document = PageDocument(html, url)
+        input_metrics = await page_metrics(input_document, sanitized=True, refresh=request.refresh)
         
         # Step 3: Prepare comparative data
         comparison = {
@@ -603,7 +586,15 @@ async def competitive_analysis(request: CompetitiveAnalysisRequest):
         Focus on why competitors perform better and specific, actionable improvements for the input site.
         """
         
-        insights = call_gemini(insights_prompt)
+        async def generate_insights() -> dict:
+            return call_gemini(insights_prompt)
+        
+        # Same input site and competitors with unchanged content: reuse the stored insights
+        insights, insights_reused = await fingerprint_store.get_or_compute(
+            "competitive_insights", [url] + [c["url"] for c in competitors],
+            [input_document.fingerprint] + [fingerprints[c["url"]] for c in competitors],
+            generate_insights, refresh=request.refresh, keep=lambda result: "error" not in result
+        )
         
         # Step 5: Format visualization data
         chart_data = {
@@ -659,52 +650,58 @@ async def competitive_analysis(request: CompetitiveAnalysisRequest):
             "fetch_method": fetch_method,
             "comparison": comparison,
             "insights": insights,
+            "insights_reused": insights_reused,
             "chart_data": chart_data
         }
         
     except Exception as e:
         logger.error(f"Competitive analysis failed for {url}: {e}")
         raise HTTPException(status_code=500, detail=f"Competitive analysis failed: {str(e)}")
+    finally:
+        if not input_task.done():
+            input_task.cancel()
 
-@router.post("/competitive-analysis-multiple")
+@router.post("/competitive-analysis-multiple", dependencies=[Depends(warmup.require("publisher"))])
 async def competitive_analysis_multiple(request: MultiCompetitiveAnalysisRequest):
     """Perform competitive analysis between user's website and multiple competitor URLs."""
     my_website = str(request.my_website)
     competitor_urls = [str(url) for url in request.competitor_urls]
     logger.info(f"Multi-competitive analysis: {my_website} vs {competitor_urls}")
     
-    try:
-        fetch_method = "playwright" if playwright_available else "fallback"
-        
-        # Step 1: Analyze user's website
+    async def fetch_site(site_url: str):
+        """Rendered fetch with static fallback; returns (html, fetch_method)."""
         if playwright_available:
             try:
-                html, scripts, iframes = await fetch_rendered_html(my_website)
+                html, _, _ = await fetch_rendered_html(site_url)
+                return html, "playwright"
             except Exception:
-                html, scripts, iframes = fetch_basic_html(my_website)
-                fetch_method = "fallback"
-        else:
-            html, scripts, iframes = fetch_basic_html(my_website)
+                pass
+        html, _, _ = await fetch_basic_html(site_url)
+        return html, "fallback"
+    
+    try:
+        # Steps 1-2: Fetch the user's website and every competitor concurrently
+        sites = [my_website] + competitor_urls
+        results = await gather_bounded(sites, fetch_site, COMPETITOR_FETCH_CONCURRENCY, COMPETITOR_FETCH_DEADLINE)
         
-        sanitized_html = sanitize_html(html)
-        my_metrics = extract_metrics(sanitized_html, my_website)
+        if isinstance(results[0], Exception):
+            raise Exception(describe_fetch_error(results[0]))
+        html, fetch_method = results[0]
+        my_document = PageDocument(html, my_website)
+        my_metrics = await page_metrics(my_document, sanitized=True, refresh=request.refresh)
         
-        # Step 2: Analyze competitor websites
         competitors = []
-        for comp_url in competitor_urls:
+        fingerprints = [my_document.fingerprint]
+        for comp_url, result in zip(competitor_urls, results[1:]):
             try:
-                if playwright_available:
-                    try:
-                        comp_html, _, _ = await fetch_rendered_html(comp_url)
-                    except Exception:
-                        comp_html, _, _ = fetch_basic_html(comp_url)
-                else:
-                    comp_html, _, _ = fetch_basic_html(comp_url)
-                    
-                comp_sanitized_html = sanitize_html(comp_html)
-                comp_metrics = extract_metrics(comp_sanitized_html, comp_url)
+                if isinstance(result, Exception):
+                    raise Exception(describe_fetch_error(result))
+                comp_html, _ = result
+                comp_document = PageDocument(comp_html, comp_url)
+                comp_metrics = await page_metrics(comp_document, sanitized=True, refresh=request.refresh)
                 comp_metrics["url"] = comp_url
                 competitors.append(comp_metrics)
+                fingerprints.append(comp_document.fingerprint)
                 
             except Exception as e:
                 logger.warning(f"Failed to analyze competitor {comp_url}: {e}")
@@ -757,7 +754,17 @@ async def competitive_analysis_multiple(request: MultiCompetitiveAnalysisRequest
         3. Opportunities to gain competitive advantage
         """
         
-        insights = call_gemini(insights_prompt)
+        async def generate_insights() -> dict:
+            return call_gemini(insights_prompt)
+        
+        if len(fingerprints) == len(competitor_urls) + 1:
+            # Every page analyzed: reuse stored insights while none of them changed
+            insights, insights_reused = await fingerprint_store.get_or_compute(
+                "competitive_insights_multiple", [my_website] + competitor_urls, fingerprints,
+                generate_insights, refresh=request.refresh, keep=lambda result: "error" not in result
+            )
+        else:
+            insights, insights_reused = await generate_insights(), None
         
         # Step 5: Create visualization data
         site_labels = [my_website] + [comp.get("url", f"Competitor {i+1}") for i, comp in enumerate(competitors)]
@@ -838,6 +845,7 @@ async def competitive_analysis_multiple(request: MultiCompetitiveAnalysisRequest
             "fetch_method": fetch_method,
             "comparison": comparison,
             "insights": insights,
+            "insights_reused": insights_reused,
             "chart_data": chart_data
         }
         
@@ -845,7 +853,16 @@ async def competitive_analysis_multiple(request: MultiCompetitiveAnalysisRequest
         logger.error(f"Multi-competitive analysis failed: {e}")
         raise HTTPException(status_code=500, detail=f"Multi-competitive analysis failed: {str(e)}")
 
-@router.post("/query")
+async def _embedding_scores(query: str):
+    """Embedding stage of the query router: encode (batched) and score every metric."""
+    if publisher_matcher is None:
+        # Encoding the catalogue takes seconds; keep it off the event loop
+        await asyncio.to_thread(load_metric_embeddings)
+    
+    query_embedding = await get_batcher(metric_encoder).encode(query)
+    return publisher_matcher.scores(query_embedding)
+
+@router.post("/query", dependencies=[Depends(warmup.require("publisher"))])
 async def handle_publisher_query(user_query: UserQuery):
     """Handle natural language queries for publisher metrics or website analysis."""
     query = user_query.query.lower().strip()
@@ -880,18 +897,14 @@ async def handle_publisher_query(user_query: UserQuery):
             **result
         }
     
-    # Semantic search for metric
-    query_embedding = model.encode(query)
-    metric_similarities = util.cos_sim(query_embedding, publisher_metric_embeddings)[0]
-    max_similarity_idx = torch.argmax(metric_similarities).item()
-    max_similarity = metric_similarities[max_similarity_idx].item()
+    # Keyword fast path, then semantic search for metric
+    found_metric, max_similarity, stage = await publisher_query_router.route(query, _embedding_scores)
 
-    if max_similarity < 0.3:  # Threshold for minimum relevance
+    if stage != "lexical" and max_similarity < 0.3:  # Threshold for minimum relevance (a named metric needs none)
         return {
             "error": "No matching publisher metric found. Try asking about impressions, clicks, revenue, RPM, geography, or provide a website URL to analyze."
         }
 
-    found_metric = publisher_metric_keys[max_similarity_idx]
     result = PUBLISHER_FUNCTION_MAP[found_metric]()
     result["chat_response"] = f"Here's your {result['metric']} data with visualization"
     result["timestamp"] = "2025-09-26T10:30:00Z"
@@ -902,12 +915,19 @@ async def handle_publisher_query(user_query: UserQuery):
         **result
     }
 
+@router.get("/snapshots")
+async def list_snapshots(url: Optional[str] = None, limit: int = 50):
+    """List stored page snapshots (newest first), optionally for one URL."""
+    snapshots = await asyncio.to_thread(snapshot_store.list, url, min(max(limit, 1), 500))
+    return {"snapshots": snapshots, "count": len(snapshots)}
+
 @router.get("/")
 def publisher_info():
     """Get publisher service information."""
     return {
         "service": "publisher",
         "description": "Publisher analytics, revenue metrics, and website analysis",
+        "readiness": warmup.router_status("publisher"),
         "available_metrics": list(PUBLISHER_METRICS.keys()),
         "features": {
             "analytics": "Revenue, RPM, impressions, geography data",
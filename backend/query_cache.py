@@ -0,0 +1,98 @@
+import os
+import re
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Dict, Any
+
+# Rough per-entry bookkeeping cost (OrderedDict node + tuple) on top of the strings
+_ENTRY_OVERHEAD_BYTES = 200
+
+def normalize_query(query: str) -> str:
+    """Canonical cache key: lower-case, collapsed whitespace, no trailing punctuation."""
+    query = re.sub(r"\s+", " ", query.lower()).strip()
+    return query.rstrip("?!. ")
+
+class QueryCache:
+    """
+    Bounded LRU cache of normalized chat query -> (matched metric, similarity).
+    Bounded both by entry count and by approximate memory, with an optional
+    TTL, so repeated dashboard questions skip the encoder entirely.
+    """
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 2 * 1024 * 1024, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float, Optional[float], int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, prefix: str = "QUERY_CACHE") -> "QueryCache":
+        """Build a cache sized by <PREFIX>_MAX_ENTRIES, _MAX_BYTES and _TTL_SECONDS."""
+        ttl = os.getenv(f"{prefix}_TTL_SECONDS")
+        return cls(
+            max_entries=int(os.getenv(f"{prefix}_MAX_ENTRIES", "2048")),
+            max_bytes=int(os.getenv(f"{prefix}_MAX_BYTES", str(2 * 1024 * 1024))),
+            ttl_seconds=float(ttl) if ttl else None
+        )
+
+    def get(self, query: str) -> Optional[Tuple[str, float]]:
+        """Return (metric, similarity) for a query, or None on a miss."""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, query: str, metric: str, similarity: float):
+        """Store the routing decision for a query, evicting least-recently-used entries."""
+        key = normalize_query(query)
+        size = sys.getsizeof(key) + sys.getsizeof(metric) + _ENTRY_OVERHEAD_BYTES
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (metric, similarity, expires_at, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[3]
+
+    def clear(self):
+        """Drop every entry (e.g. after the metric catalogue is reloaded)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds
+        }
@@ -0,0 +1,177 @@
+import re
+import logging
+from typing import Dict, List, Tuple, Callable, Awaitable, Iterable
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Description terms keep hyphenated compounds whole ('site-wise')
+_TERM_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+_END = object()
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case alphanumeric tokens ('site-wise' -> ['site', 'wise'])."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+class KeywordTrie:
+    """
+    Token-level trie of keyword/synonym phrases -> metric key.
+    Lookups take the longest phrase at each position, so 'cost per click'
+    resolves to cpc rather than clicks.
+    """
+
+    def __init__(self):
+        self._root: Dict = {}
+        self.phrases = 0
+        # Token tuple of each phrase -> its metric
+        self._phrase_metrics: Dict[Tuple[str, ...], str] = {}
+
+    @classmethod
+    def from_catalogue(cls, metric_keys: Iterable[str], synonyms: Dict[str, List[str]]) -> "KeywordTrie":
+        """Build a trie from the metric keys plus their synonym phrases."""
+        trie = cls()
+        for key in metric_keys:
+            trie.add(key, key)
+        for key, phrases in synonyms.items():
+            for phrase in phrases:
+                trie.add(phrase, key)
+        return trie
+
+    def add(self, phrase: str, metric: str):
+        tokens = tokenize(phrase)
+        if not tokens:
+            return
+        node = self._root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        if node.get(_END) not in (None, metric):
+            logger.warning(f"Keyword '{phrase}' maps to both {node[_END]} and {metric}; keeping {node[_END]}")
+            return
+        node[_END] = metric
+        self._phrase_metrics[tuple(tokens)] = metric
+        self.phrases += 1
+
+    def phrase_list(self) -> List[Tuple[str, str]]:
+        """(phrase, metric) for every phrase, phrases as their space-joined tokens."""
+        return [(" ".join(tokens), metric) for tokens, metric in self._phrase_metrics.items()]
+
+    def find_phrases(self, text: str) -> List[Tuple[str, Tuple[str, ...]]]:
+        """(metric, phrase tokens) of each longest phrase match, in order."""
+        tokens = tokenize(text)
+        found: List[Tuple[str, Tuple[str, ...]]] = []
+        i = 0
+        while i < len(tokens):
+            node = self._root
+            match, match_end = None, i
+            j = i
+            while j < len(tokens) and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if _END in node:
+                    match, match_end = node[_END], j
+            if match is not None:
+                found.append((match, tuple(tokens[i:match_end])))
+                i = match_end
+            else:
+                i += 1
+        return found
+
+def synonyms_from_keywords(keywords: Iterable[str], metrics: Dict[str, str]) -> Dict[str, List[str]]:
+    """
+    Assign each keyword to the one metric it names: a metric whose key is
+    one of the keyword's tokens, otherwise a metric whose description
+    contains the keyword as a run of whole terms ('site-wise' but not
+    'site'). Keywords naming no metric, or several, are left out and
+    left to the embedding stage.
+    """
+    def terms(text: str) -> List[str]:
+        return _TERM_PATTERN.findall(text.lower())
+
+    def contains(haystack: List[str], needle: List[str]) -> bool:
+        return any(haystack[i:i + len(needle)] == needle for i in range(len(haystack) - len(needle) + 1))
+
+    described = {key: terms(description) for key, description in metrics.items()}
+    synonyms: Dict[str, List[str]] = {}
+    for keyword in keywords:
+        named = [key for key in metrics if key in tokenize(keyword)]
+        if not named:
+            named = [key for key, description in described.items() if contains(description, terms(keyword))]
+        if len(named) == 1:
+            synonyms.setdefault(named[0], []).append(keyword)
+        else:
+            logger.debug(f"Keyword '{keyword}' names {len(named)} metrics; left to the embedding stage")
+    return synonyms
+
+class TwoStageRouter:
+    """
+    Routes a chat query to a metric in up to three steps:
+    1. lexical - every keyword/synonym in the query names the same metric;
+       the similarity is that phrase's precomputed cosine to the metric;
+    2. cache   - the normalized query was routed before;
+    3. embedding - the caller's encoder + matcher decide.
+    Only the embedding stage runs the encoder, so per-stage counters show
+    how many forward passes are avoided.
+    """
+
+    def __init__(self, name: str, trie: KeywordTrie, cache=None):
+        self.name = name
+        self.trie = trie
+        self.cache = cache
+        self.stage_hits = {"lexical": 0, "cache": 0, "embedding": 0}
+        self.ambiguous = 0
+        # Cosine similarity of each trie phrase to its own metric (see set_phrase_similarities)
+        self._phrase_similarities: Dict[Tuple[str, ...], float] = {}
+
+    def set_phrase_similarities(self, matcher, phrase_embeddings):
+        """Score every trie phrase against its metric with the catalogue matcher (phrase_list() order)."""
+        phrases = self.trie.phrase_list()
+        similarities = matcher.similarities(phrase_embeddings)
+        columns = {key: column for column, key in enumerate(matcher.keys)}
+        self._phrase_similarities = {
+            tuple(tokenize(phrase)): float(similarities[row, columns[metric]])
+            for row, (phrase, metric) in enumerate(phrases) if metric in columns
+        }
+
+    async def route(self, query: str, embedding_scores: Callable[[str], Awaitable[Dict[str, float]]]) -> Tuple[str, float, str]:
+        """
+        Return (metric, similarity, stage) for a query. embedding_scores
+        returns the query's cosine similarity to every metric.
+        """
+        matches = self.trie.find_phrases(query)
+        metrics = set(metric for metric, _ in matches)
+        if len(metrics) == 1:
+            # Phrase similarities are known once the catalogue embeddings have loaded
+            known = [self._phrase_similarities[phrase] for _, phrase in matches if phrase in self._phrase_similarities]
+            if known:
+                self.stage_hits["lexical"] += 1
+                return metrics.pop(), max(known), "lexical"
+        elif len(metrics) > 1:
+            self.ambiguous += 1
+
+        if self.cache is not None:
+            cached = self.cache.get(query)
+            if cached:
+                self.stage_hits["cache"] += 1
+                return cached[0], cached[1], "cache"
+
+        scores = await embedding_scores(query)
+        metric = max(scores, key=scores.get)
+        self.stage_hits["embedding"] += 1
+        if self.cache is not None:
+            self.cache.put(query, metric, scores[metric])
+        return metric, scores[metric], "embedding"
+
+    def get_stats(self) -> Dict:
+        total = sum(self.stage_hits.values())
+        return {
+            "queries": total,
+            "stage_hits": dict(self.stage_hits),
+            "stage_hit_rates": {
+                stage: round(hits / total, 4) if total else 0.0
+                for stage, hits in self.stage_hits.items()
+            },
+            "ambiguous_lexical": self.ambiguous,
+            "forward_passes_avoided": self.stage_hits["lexical"] + self.stage_hits["cache"],
+            "trie_phrases": self.trie.phrases
+        }
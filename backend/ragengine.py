@@ -1,9 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 import os
 import logging
 from typing import List, Dict, Any
 from dotenv import load_dotenv
+from embeddings import model_registry, canonical_model_name
+from warmup import warmup
+from startup_profile import startup_profiler
+from encoders import TorchEncoder
+from batching import get_batcher
+
+try:
+    from langchain_core.embeddings import Embeddings as _EmbeddingsBase
+except ImportError:
+    _EmbeddingsBase = object
 
 # Load environment variables
 load_dotenv()
@@ -20,6 +30,25 @@ class QueryResponse(BaseModel):
     sources: List[str] = []
     confidence: float = 0.0
 
+EMBEDDINGS_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+class SharedEmbeddings(_EmbeddingsBase):
+    """LangChain embeddings backed by the process-wide model registry"""
+    
+    def __init__(self, model_name: str = EMBEDDINGS_MODEL_NAME):
+        self.model_name = canonical_model_name(model_name)
+        self.encoder = TorchEncoder(self.model_name)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encoder.encode(list(texts)).tolist()
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a query through the shared micro-batcher."""
+        return (await get_batcher(self.encoder).encode(text)).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
 class RAGEngine:
     """
     RAG (Retrieval Augmented Generation) Engine for Media.net Q&A
@@ -31,6 +60,9 @@ class RAGEngine:
         self.llm = None
         self.embeddings = None
         self.is_initialized = False
+    
+    def initialize(self):
+        """Initialize all components (called during app warm-up)."""
         self._initialize_rag_components()
     
     def _initialize_rag_components(self):
@@ -60,15 +92,13 @@ class RAGEngine:
             self.is_initialized = False
     
     def _setup_embeddings(self):
-        """Setup HuggingFace embeddings"""
+        """Setup embeddings on the shared sentence-transformer model"""
         try:
-            from langchain_community.embeddings import HuggingFaceEmbeddings
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2"
-            )
-            logger.info("✅ Embeddings loaded: sentence-transformers/all-MiniLM-L6-v2")
+            self.embeddings = SharedEmbeddings(EMBEDDINGS_MODEL_NAME)
+            model_registry.get(self.embeddings.model_name)
+            logger.info(f"✅ Embeddings loaded: {EMBEDDINGS_MODEL_NAME} (shared registry)")
         except ImportError:
-            logger.error("❌ langchain-community not installed. Run: pip install langchain-community")
+            logger.error("❌ sentence-transformers not installed. Run: pip install sentence-transformers")
         except Exception as e:
             logger.error(f"❌ Embeddings setup failed: {e}")
     
@@ -139,13 +169,12 @@ Answer:"""
         try:
             logger.info(f"Processing RAG query: {question}")
             
-            # Retrieve relevant documents
-            retriever = self.vectorstore.as_retriever(
-                search_kwargs={"k": 3}  # Get top 3 most relevant chunks
+            # Retrieve relevant documents (query embedding is batched with concurrent callers)
+            query_embedding = await self.embeddings.aembed_query(question)
+            retrieved_docs = self.vectorstore.similarity_search_by_vector(
+                query_embedding, k=3  # Get top 3 most relevant chunks
             )
             
-            retrieved_docs = retriever.get_relevant_documents(question)
-            
             # Extract context and sources
             context_parts = []
             sources = []
@@ -197,19 +226,20 @@ Answer:"""
                 "llm": self.llm is not None
             },
             "model_info": {
-                "embeddings_model": "sentence-transformers/all-MiniLM-L6-v2",
+                "embeddings_model": EMBEDDINGS_MODEL_NAME,
                 "llm_model": os.getenv("GEMINI_MODEL", "gemini-2.5-pro"),
                 "index_name": os.getenv("PINECONE_INDEX_NAME", "pdf-query-index")
             }
         }
 
 # Create singleton RAG engine instance
-rag_engine = RAGEngine()
+with startup_profiler.measure("rag_engine", kind="singleton"):
+    rag_engine = RAGEngine()
 
 # Create FastAPI router
 router = APIRouter()
 
-@router.post("/query", response_model=QueryResponse)
+@router.post("/query", response_model=QueryResponse, dependencies=[Depends(warmup.require("rag"))])
 async def query_media_net(req: QueryRequest):
     """
     Query the Media.net RAG system
@@ -224,6 +254,7 @@ async def get_rag_status():
     return {
         "service": "rag_engine",
         "status": rag_engine.get_status(),
+        "readiness": warmup.router_status("rag"),
         "description": "Media.net RAG (Retrieval Augmented Generation) Engine",
         "endpoints": [
             {"path": "/query", "method": "POST", "description": "Query Media.net documents"},
@@ -238,5 +269,7 @@ async def health_check():
     """
     if rag_engine.is_initialized:
         return {"status": "healthy", "rag_engine": "initialized"}
+    elif warmup.router_status("rag") == "warming":
+        return {"status": "warming", "rag_engine": "initializing"}
     else:
         return {"status": "unhealthy", "rag_engine": "not_initialized"}
\ No newline at end of file
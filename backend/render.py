@@ -0,0 +1,412 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Set, Optional
+from urllib.parse import urlparse
+
+import stats
+from stats import Histogram
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# RENDER_MODE=fast blocks heavy resources and settles adaptively; "full" keeps the old behaviour
+RENDER_MODE = os.getenv("RENDER_MODE", "fast").lower()
+BLOCKED_RESOURCE_TYPES = {t.strip() for t in os.getenv("RENDER_BLOCK_TYPES", "image,font,media").split(",") if t.strip()}
+SETTLE_QUIET_MS = int(os.getenv("RENDER_SETTLE_QUIET_MS", "500"))
+SETTLE_MAX_MS = int(os.getenv("RENDER_SETTLE_MAX_MS", "2000"))
+SETTLE_POLL_MS = 50
+# RENDER_CAPTURE=network records scripts/iframes from the request stream; "evaluate" queries the DOM after load
+RENDER_CAPTURE = os.getenv("RENDER_CAPTURE", "network").lower()
+
+# The fixed wait used before fast mode; time saved is reported against it
+LEGACY_WAIT_MS = 2000
+
+# Typical transfer sizes, used only for blocked requests whose size was never measured
+ESTIMATED_BYTES = {"image": 40_000, "font": 30_000, "media": 500_000}
+# URLs whose declared size is remembered from renders that did load them
+RESOURCE_SIZES_MAX_ENTRIES = int(os.getenv("RENDER_RESOURCE_SIZES_MAX_ENTRIES", "4096"))
+
+_MUTATION_OBSERVER_JS = """
+() => {
+    if (window.__renderLastMutation !== undefined) return;
+    window.__renderLastMutation = performance.now();
+    new MutationObserver(() => { window.__renderLastMutation = performance.now(); })
+        .observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+}
+"""
+
+# Hosts whose requests are flagged as ad tags (matched on the host suffix)
+AD_TAG_HOSTS = (
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "googletagservices.com",
+    "adnxs.com", "amazon-adsystem.com", "adsrvr.org", "criteo.com", "criteo.net", "pubmatic.com",
+    "rubiconproject.com", "openx.net", "taboola.com", "outbrain.com", "media.net", "moatads.com",
+    "casalemedia.com", "smartadserver.com", "adform.net", "yieldmo.com"
+)
+_SECOND_LEVEL_LABELS = {"co", "com", "org", "net", "ac", "gov", "edu"}
+
+def site_of(host: str) -> str:
+    """Approximate registrable domain (example.co.uk, cdn.example.com -> example.com)."""
+    labels = host.lower().rstrip(".").split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SECOND_LEVEL_LABELS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+def is_ad_tag(host: str) -> bool:
+    host = host.lower()
+    return any(host == ad_host or host.endswith("." + ad_host) for ad_host in AD_TAG_HOSTS)
+
+class NetworkRecord:
+    """One captured script/iframe/XHR/ad-tag request."""
+
+    def __init__(self, url: str, kind: str, started_ms: float, third_party: bool, ad_tag: bool):
+        self.url = url
+        self.kind = kind
+        self.started_ms = started_ms
+        self.duration_ms: Optional[float] = None
+        self.status: Optional[int] = None
+        # Declared Content-Length of the response (None when the server streams it)
+        self.bytes: Optional[int] = None
+        self.third_party = third_party
+        self.ad_tag = ad_tag
+        self.failed = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "type": self.kind,
+            "status": self.status,
+            "bytes": self.bytes,
+            "started_ms": round(self.started_ms, 1),
+            "duration_ms": round(self.duration_ms, 1) if self.duration_ms is not None else None,
+            "third_party": self.third_party,
+            "ad_tag": self.ad_tag,
+            "failed": self.failed
+        }
+
+class NetworkCapture:
+    """
+    Records script, iframe, XHR/fetch and ad-tag requests from the page's
+    network events while it loads, so the script and iframe lists need no
+    DOM queries afterwards and include elements that were injected and
+    removed again.
+    """
+
+    def __init__(self, page, url: str):
+        self.page = page
+        self.site = site_of(urlparse(url).hostname or "")
+        self.started = time.perf_counter()
+        self.records: List[NetworkRecord] = []
+        self._pending: Dict[Any, NetworkRecord] = {}
+        page.on("request", self._on_request)
+        page.on("response", self._on_response)
+        page.on("requestfinished", self._on_done)
+        page.on("requestfailed", self._on_failed)
+
+    def _kind(self, request, host: str) -> Optional[str]:
+        resource_type = request.resource_type
+        if resource_type == "script":
+            return "script"
+        if resource_type == "document" and request.frame != self.page.main_frame:
+            return "iframe"
+        if resource_type in ("xhr", "fetch"):
+            return "xhr"
+        if is_ad_tag(host):
+            return "ad_tag"
+        return None
+
+    def _on_request(self, request):
+        host = urlparse(request.url).hostname or ""
+        kind = self._kind(request, host)
+        if kind is None:
+            return
+        record = NetworkRecord(
+            request.url, kind,
+            started_ms=(time.perf_counter() - self.started) * 1000,
+            third_party=bool(host) and site_of(host) != self.site,
+            ad_tag=is_ad_tag(host)
+        )
+        self.records.append(record)
+        self._pending[request] = record
+
+    def _on_response(self, response):
+        record = self._pending.get(response.request)
+        if record is not None:
+            record.status = response.status
+            declared = response.headers.get("content-length", "")
+            record.bytes = int(declared) if declared.isdigit() else None
+
+    def _finish(self, request) -> Optional[NetworkRecord]:
+        record = self._pending.pop(request, None)
+        if record is not None:
+            record.duration_ms = (time.perf_counter() - self.started) * 1000 - record.started_ms
+        return record
+
+    def _on_done(self, request):
+        self._finish(request)
+
+    def _on_failed(self, request):
+        record = self._finish(request)
+        if record is not None:
+            record.failed = True
+
+    def script_urls(self) -> List[str]:
+        return list(dict.fromkeys(r.url for r in self.records if r.kind == "script"))
+
+    def iframe_urls(self) -> List[str]:
+        return list(dict.fromkeys(r.url for r in self.records if r.kind == "iframe" and r.url.startswith("http")))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [record.to_dict() for record in self.records]
+
+def summarize_network(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Counts by type, third-party and ad-tag requests, and declared bytes of captured records."""
+    by_type: Dict[str, int] = {}
+    for record in records:
+        by_type[record["type"]] = by_type.get(record["type"], 0) + 1
+    return {
+        "requests": len(records),
+        "by_type": by_type,
+        "third_party": sum(1 for r in records if r["third_party"]),
+        "ad_tags": sum(1 for r in records if r["ad_tag"]),
+        "failed": sum(1 for r in records if r["failed"]),
+        "bytes": sum(r["bytes"] or 0 for r in records)
+    }
+
+class ResourceSizes:
+    """
+    Bounded LRU of Content-Length by URL for image/font/media responses.
+    Blocked requests are never downloaded, so their bytes avoided are only
+    known when an earlier render (full mode, or a type that was not
+    blocked) loaded the same URL.
+    """
+
+    def __init__(self, max_entries: int = RESOURCE_SIZES_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record_response(self, response):
+        if response.request.resource_type not in ESTIMATED_BYTES:
+            return
+        declared = response.headers.get("content-length", "")
+        if not declared.isdigit():
+            return
+        with self._lock:
+            self._sizes[response.url] = int(declared)
+            self._sizes.move_to_end(response.url)
+            while len(self._sizes) > self.max_entries:
+                self._sizes.popitem(last=False)
+
+    def get(self, url: str) -> Optional[int]:
+        with self._lock:
+            return self._sizes.get(url)
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+# Create singleton size table instance
+resource_sizes = ResourceSizes()
+
+class RenderReport:
+    """What a single render blocked and how long it waited to settle."""
+
+    def __init__(self, url: str, mode: str):
+        self.url = url
+        self.mode = mode
+        self.blocked: Dict[str, List[str]] = {}
+        # Declared sizes of the blocked requests whose size is known (see ResourceSizes)
+        self.measured_bytes_avoided = 0
+        self.measured_requests = 0
+        self._unmeasured: Dict[str, int] = {}
+        self.settle_ms = 0.0
+        self.settle_reason = ""
+        # Time spent in page.goto (to domcontentloaded), excluding settling
+        self.navigation_ms = 0.0
+        # Headers of the main document response (lower-cased names)
+        self.headers: Dict[str, str] = {}
+        self.network: Optional[NetworkCapture] = None
+
+    @property
+    def blocked_count(self) -> int:
+        return sum(len(urls) for urls in self.blocked.values())
+
+    def record_blocked(self, kind: str, url: str):
+        self.blocked.setdefault(kind, []).append(url)
+        size = resource_sizes.get(url)
+        if size is not None:
+            self.measured_bytes_avoided += size
+            self.measured_requests += 1
+        else:
+            self._unmeasured[kind] = self._unmeasured.get(kind, 0) + 1
+
+    @property
+    def estimated_bytes_avoided(self) -> int:
+        """Typical sizes of the blocked requests that were never measured."""
+        return sum(ESTIMATED_BYTES.get(kind, 0) * count for kind, count in self._unmeasured.items())
+
+    @property
+    def time_saved_ms(self) -> float:
+        return LEGACY_WAIT_MS - self.settle_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "settle_ms": round(self.settle_ms, 1),
+            "settle_reason": self.settle_reason,
+            "time_saved_ms": round(self.time_saved_ms, 1),
+            "navigation_ms": round(self.navigation_ms, 1),
+            "blocked_requests": {kind: len(urls) for kind, urls in self.blocked.items()},
+            "bytes_avoided": self.measured_bytes_avoided,
+            "measured_blocked_requests": self.measured_requests,
+            "estimated_bytes_avoided": self.estimated_bytes_avoided,
+            "network": summarize_network(self.network.to_dicts()) if self.network else None
+        }
+
+class _NetworkTracker:
+    """Counts in-flight requests and remembers when the network last changed."""
+
+    def __init__(self, page):
+        self.inflight: Set = set()
+        self.last_activity = time.perf_counter()
+        page.on("request", self._started)
+        page.on("requestfinished", self._done)
+        page.on("requestfailed", self._done)
+
+    def _started(self, request):
+        self.inflight.add(request)
+        self.last_activity = time.perf_counter()
+
+    def _done(self, request):
+        self.inflight.discard(request)
+        self.last_activity = time.perf_counter()
+
+async def block_heavy_resources(page, report: RenderReport):
+    """Abort image/font/media requests while recording their URLs."""
+    async def handle(route):
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES:
+            report.record_blocked(request.resource_type, request.url)
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await page.route("**/*", handle)
+
+async def settle(page, network: _NetworkTracker, report: RenderReport,
+                 quiet_ms: int = SETTLE_QUIET_MS, max_ms: int = SETTLE_MAX_MS):
+    """Wait until the network is idle and the DOM has stopped mutating for quiet_ms, up to max_ms."""
+    start = time.perf_counter()
+    try:
+        await page.evaluate(_MUTATION_OBSERVER_JS)
+    except Exception as e:
+        logger.debug(f"Mutation observer unavailable: {e}")
+
+    reason = "max_wait"
+    while (time.perf_counter() - start) * 1000 < max_ms:
+        network_quiet = not network.inflight and (time.perf_counter() - network.last_activity) * 1000 >= quiet_ms
+        if network_quiet:
+            try:
+                dom_quiet_ms = await page.evaluate("() => performance.now() - (window.__renderLastMutation || 0)")
+            except Exception:
+                dom_quiet_ms = quiet_ms
+            if dom_quiet_ms >= quiet_ms:
+                reason = "quiet"
+                break
+        await asyncio.sleep(SETTLE_POLL_MS / 1000)
+    report.settle_ms = (time.perf_counter() - start) * 1000
+    report.settle_reason = reason
+
+class RenderStats:
+    """Aggregate savings of fast-mode renders across pages."""
+
+    def __init__(self):
+        self.pages = 0
+        self.blocked_requests = 0
+        self.measured_blocked_requests = 0
+        self.bytes_avoided = 0
+        self.estimated_bytes_avoided = 0
+        self.time_saved_ms = 0.0
+        self.settle_reasons: Dict[str, int] = {}
+        self.settle_ms = Histogram([100, 250, 500, 750, 1000, 1500, 2000, 3000])
+        self.captured_pages = 0
+        self.captured_requests = 0
+        self.third_party_requests = 0
+        self.ad_tag_requests = 0
+
+    def record_capture(self, capture: NetworkCapture):
+        self.captured_pages += 1
+        self.captured_requests += len(capture.records)
+        self.third_party_requests += sum(1 for r in capture.records if r.third_party)
+        self.ad_tag_requests += sum(1 for r in capture.records if r.ad_tag)
+
+    def record(self, report: RenderReport):
+        self.pages += 1
+        self.blocked_requests += report.blocked_count
+        self.measured_blocked_requests += report.measured_requests
+        self.bytes_avoided += report.measured_bytes_avoided
+        self.estimated_bytes_avoided += report.estimated_bytes_avoided
+        self.time_saved_ms += report.time_saved_ms
+        self.settle_reasons[report.settle_reason] = self.settle_reasons.get(report.settle_reason, 0) + 1
+        self.settle_ms.observe(report.settle_ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": RENDER_MODE,
+            "blocked_resource_types": sorted(BLOCKED_RESOURCE_TYPES),
+            "pages": self.pages,
+            "blocked_requests": self.blocked_requests,
+            "measured_blocked_requests": self.measured_blocked_requests,
+            "bytes_avoided": self.bytes_avoided,
+            "estimated_bytes_avoided": self.estimated_bytes_avoided,
+            "known_resource_sizes": len(resource_sizes),
+            "time_saved_ms": round(self.time_saved_ms, 1),
+            "settle_reasons": dict(self.settle_reasons),
+            "settle_ms": self.settle_ms.snapshot(),
+            "capture": RENDER_CAPTURE,
+            "captured_pages": self.captured_pages,
+            "captured_requests": self.captured_requests,
+            "third_party_requests": self.third_party_requests,
+            "ad_tag_requests": self.ad_tag_requests
+        }
+
+# Create singleton stats instance
+render_stats = RenderStats()
+
+stats.register("render", render_stats.get_stats)
+
+async def _navigate(page, url: str, timeout_ms: float, report: RenderReport):
+    start = time.perf_counter()
+    response = await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+    report.navigation_ms = (time.perf_counter() - start) * 1000
+    return response
+
+async def render(page, url: str, mode: str = RENDER_MODE, timeout_ms: float = 30000) -> RenderReport:
+    """Navigate to url and wait for it to settle, in "fast" or "full" mode."""
+    report = RenderReport(url, mode)
+    page.on("response", resource_sizes.record_response)
+    if RENDER_CAPTURE == "network":
+        report.network = NetworkCapture(page, url)
+    if mode == "fast":
+        await block_heavy_resources(page, report)
+        network = _NetworkTracker(page)
+        response = await _navigate(page, url, timeout_ms, report)
+        await settle(page, network, report)
+        render_stats.record(report)
+        logger.info(f"Rendered {url} in fast mode: settled in {report.settle_ms:.0f}ms ({report.settle_reason}), "
+                    f"blocked {report.blocked_count} requests ({report.measured_bytes_avoided / 1024:.0f} KiB measured "
+                    f"for {report.measured_requests}, ~{report.estimated_bytes_avoided / 1024:.0f} KiB estimated for the rest), "
+                    f"saved {report.time_saved_ms:.0f}ms")
+    else:
+        response = await _navigate(page, url, timeout_ms, report)
+        await page.wait_for_timeout(LEGACY_WAIT_MS)  # Wait for JS to execute
+        report.settle_ms = LEGACY_WAIT_MS
+        report.settle_reason = "fixed"
+    if response is not None:
+        report.headers = dict(response.headers)
+    if report.network is not None:
+        render_stats.record_capture(report.network)
+    return report
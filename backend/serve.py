@@ -0,0 +1,171 @@
+"""
+Pre-fork launcher for multi-worker deployments.
+
+    python serve.py --workers 4 --port 8000
+
+The parent process imports the app, loads every fork-safe warm-up component
+(metric embedding matrices, and the sentence-transformer weights with the torch
+encoder backend) and freezes the GC, then binds the listening socket and forks
+the workers, which start with those pages copy-on-write. Each worker
+re-creates the fork-unsafe components (Gemini, Exa, Pinecone and Playwright
+clients, and the onnxruntime session with ENCODER_BACKEND=onnx) in its own
+background warm-up.
+
+`uvicorn app:app --workers N` still works, but every worker then loads its own
+copy of the weights.
+
+How much memory the sharing saves has not been measured yet; it depends on how
+many preloaded pages the workers dirty again. To measure it, send SIGUSR1 to
+the parent (`kill -USR1 <pid>`) to log RSS, PSS and shared bytes for each
+worker, read from /proc/<pid>/smaps_rollup. RSS counts shared pages in full in
+every worker. PSS splits them among the workers that share them, so sum(PSS)
+is the real footprint. Compare it with the same load against
+`uvicorn --workers N` (`grep -E '^(Rss|Pss)' /proc/<pid>/smaps_rollup` for each
+worker pid after warm-up).
+"""
+import os
+import gc
+import sys
+import signal
+import socket
+import logging
+import argparse
+from typing import Dict, Optional
+
+import uvicorn
+
+from app import app
+from warmup import warmup
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def preload():
+    """Load fork-safe components in the parent so workers share their pages."""
+    names = [name for name, c in warmup.report()["components"].items() if c["fork_safe"]]
+    logger.info(f"Preloading in parent: {', '.join(names)}")
+    warmup.run_sync(names)
+    # Objects alive now are never collected, so GC passes in workers won't dirty their pages
+    gc.collect()
+    gc.freeze()
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(sock: socket.socket, args) -> None:
+    """Worker entry point after fork: re-create fork-unsafe clients and serve."""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+    warmup.reset_fork_unsafe()
+    config = uvicorn.Config(app, host=args.host, port=args.port, log_level=args.log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def memory_usage(pid: int) -> Optional[Dict[str, int]]:
+    """RSS/PSS/shared bytes for a process from /proc/<pid>/smaps_rollup (Linux only)."""
+    fields = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared_clean", "Shared_Dirty": "shared_dirty",
+              "Private_Clean": "private_clean", "Private_Dirty": "private_dirty"}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            usage = {}
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    usage[fields[key]] = int(value.split()[0]) * 1024
+            return usage
+    except (OSError, ValueError):
+        return None
+
+class PreforkSupervisor:
+    """Forks workers on a shared socket and replaces any that die."""
+
+    def __init__(self, sock: socket.socket, args):
+        self.sock = sock
+        self.args = args
+        self.workers: Dict[int, int] = {}
+        self.stopping = False
+
+    def spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(self.sock, self.args)
+            finally:
+                os._exit(0)
+        self.workers[pid] = slot
+        logger.info(f"✅ Worker {slot} started (pid {pid})")
+
+    def log_memory(self, *_):
+        total_pss = 0
+        for pid, slot in sorted(self.workers.items(), key=lambda item: item[1]):
+            usage = memory_usage(pid)
+            if usage is None:
+                logger.warning(f"⚠️ Memory usage unavailable for worker {slot} (pid {pid})")
+                continue
+            total_pss += usage.get("pss", 0)
+            logger.info(
+                f"Worker {slot} (pid {pid}): RSS {usage.get('rss', 0) / 2**20:.1f} MiB, "
+                f"PSS {usage.get('pss', 0) / 2**20:.1f} MiB, "
+                f"shared {(usage.get('shared_clean', 0) + usage.get('shared_dirty', 0)) / 2**20:.1f} MiB"
+            )
+        parent = memory_usage(os.getpid())
+        if parent:
+            total_pss += parent.get("pss", 0)
+        logger.info(f"Total PSS (parent + {len(self.workers)} workers): {total_pss / 2**20:.1f} MiB")
+
+    def stop(self, signum, _frame):
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGUSR1, self.log_memory)
+
+        for slot in range(self.args.workers):
+            self.spawn(slot)
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except InterruptedError:
+                continue
+            except ChildProcessError:
+                break
+            slot = self.workers.pop(pid, None)
+            if slot is None:
+                continue
+            if not self.stopping:
+                logger.error(f"❌ Worker {slot} (pid {pid}) exited with status {status}; restarting")
+                self.spawn(slot)
+        logger.info("All workers stopped")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with pre-forked workers sharing preloaded models")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        logger.error("❌ Pre-fork mode needs os.fork; use `python app.py` on this platform")
+        sys.exit(1)
+
+    preload()
+    sock = bind_socket(args.host, args.port)
+    logger.info(f"Listening on {args.host}:{args.port} with {args.workers} workers")
+    PreforkSupervisor(sock, args).run()
+
+if __name__ == "__main__":
+    main()
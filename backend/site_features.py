@@ -0,0 +1,165 @@
+import os
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from page_document import PageDocument
+from cpu_pool import cpu_pool
+from multi_pattern import MultiPatternMatcher
+
+# Optional file of ad-vendor domains, one per line, counted as the "ad_vendors" feature
+AD_VENDOR_FILE = os.getenv("AD_VENDOR_FILE")
+
+_INNER_TAG = re.compile(r'<[^>]+>')
+
+class Feature:
+    """A named page feature and how to compute it from a PageDocument."""
+
+    def __init__(self, name: str, compute: Callable[[PageDocument], Any], description: str = ""):
+        self.name = name
+        self.compute = compute
+        self.description = description
+
+class FeatureRegistry:
+    """
+    Declarative registry of the site features the publisher and advertiser
+    analyzers score. Patterns are compiled once at registration, and values
+    are memoized on the PageDocument, so a page shared by several analyses
+    is measured once and every feature is defined in one place.
+    """
+
+    def __init__(self):
+        self._features: Dict[str, Feature] = {}
+
+    def register(self, name: str, compute: Callable[[PageDocument], Any], description: str = "") -> Feature:
+        if name in self._features:
+            raise ValueError(f"Feature already registered: {name}")
+        feature = self._features[name] = Feature(name, compute, description)
+        return feature
+
+    def feature(self, name: str, description: str = ""):
+        """Decorator form of register()."""
+        def decorator(compute):
+            self.register(name, compute, description)
+            return compute
+        return decorator
+
+    def term_counts(self, name: str, terms: Dict[str, List[str]], source: str = "html", whole_words: bool = False,
+                    description: str = "") -> Feature:
+        """
+        Case-insensitive counts of literal terms, grouped under keys, in a
+        document view ("html" or "normalized_text"). One automaton pass covers every
+        term, however long the lists.
+        """
+        matcher = MultiPatternMatcher(terms, whole_words=whole_words)
+        return self.register(name, lambda document: matcher.count(getattr(document, source)), description)
+
+    def keyword_counts(self, name: str, keywords: List[str], source: str = "normalized_text", description: str = "") -> Feature:
+        """Whole-word, case-insensitive keyword counts."""
+        return self.term_counts(name, {kw: [kw] for kw in keywords}, source, whole_words=True, description=description)
+
+    def names(self) -> List[str]:
+        return list(self._features)
+
+    def extract(self, document: PageDocument, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Values of the named features (all of them by default), memoized on the document."""
+        cache = document.__dict__.setdefault("_features", {})
+        values = {}
+        for name in (self._features if names is None else names):
+            if name not in cache:
+                cache[name] = self._features[name].compute(document)
+            values[name] = cache[name]
+        return values
+
+    async def extract_async(self, document: PageDocument, names: Optional[Iterable[str]] = None,
+                            sanitized: bool = False) -> Dict[str, Any]:
+        """
+        extract() for request handlers: large pages are measured in the CPU
+        pool instead of on the event loop. With sanitized=True the features
+        are those of the document's sanitized view.
+        """
+        if sanitized:
+            # The sanitized view is at most SANITIZED_LIMIT characters; only producing it is costly
+            return self.extract(await document.ensure_sanitized(), names)
+        names = list(self._features if names is None else names)
+        cache = document.__dict__.setdefault("_features", {})
+        missing = [name for name in names if name not in cache]
+        if missing:
+            cache.update(await cpu_pool.run(
+                _extract_detached, document.html, document.url, missing,
+                size=len(document.html), inline=lambda: self.extract(document, missing)
+            ))
+        return {name: cache[name] for name in names}
+
+def _extract_detached(html: str, url: str, names: List[str]) -> Dict[str, Any]:
+    """Worker-side extract() on a fresh document (runs in the CPU pool)."""
+    return site_features.extract(PageDocument(html, url), names)
+
+# Create singleton registry instance
+site_features = FeatureRegistry()
+
+# Content and SEO
+site_features.register("word_count", lambda d: len(d.words), "Words of visible text")
+site_features.register("char_count", lambda d: len(d.normalized_text), "Characters of visible text, whitespace collapsed")
+site_features.register("title", lambda d: d.title, "Stripped <title> text, None if missing")
+site_features.register("meta_description", lambda d: d.meta_description, "Meta or og: description, None if missing")
+site_features.register(
+    "heading_counts", lambda d: {level: len(found) for level, found in d.headings.items()}, "h1/h2/h3 counts"
+)
+site_features.register(
+    "h1_text", lambda d: [_INNER_TAG.sub('', h1).strip() for h1 in d.headings["h1"]], "Text of each h1"
+)
+
+# Tag structure (one pass over the markup for all of these)
+for _name, _tag in [
+    ("link_count", "link"), ("image_count", "image"), ("image_alt_count", "image_with_alt"),
+    ("responsive_image_count", "responsive_image"), ("script_count", "script"), ("stylesheet_count", "stylesheet"),
+    ("paragraph_count", "paragraph"), ("list_count", "list"), ("form_count", "form")
+]:
+    site_features.register(_name, lambda d, tag=_tag: d.tag_counts[tag], f"Count of <{_tag}> tags")
+site_features.register("has_viewport_meta", lambda d: d.tag_counts["viewport_meta"] > 0, "Viewport meta tag present")
+for _name, _kind in [("external_link_count", "links"), ("external_script_count", "scripts"),
+                     ("external_stylesheet_count", "stylesheets")]:
+    site_features.register(_name, lambda d, kind=_kind: d.external_counts[kind], f"External {_kind}")
+
+# Social platforms and ad-tech markers
+site_features.term_counts("social_presence", {
+    'facebook': ['facebook.com', 'fb.com'],
+    'twitter': ['twitter.com', 'x.com'],
+    'linkedin': ['linkedin.com'],
+    'instagram': ['instagram.com'],
+    'youtube': ['youtube.com'],
+    'tiktok': ['tiktok.com'],
+    'pinterest': ['pinterest.com']
+}, description="Mentions of social platforms")
+site_features.term_counts("ad_tags", {
+    'google_ads': ['google-ads'],
+    'adsystem': ['adsystem'],
+    'doubleclick': ['doubleclick'],
+    'adsense': ['adsense'],
+    'advertisement': ['advertisement'],
+    'sponsored': ['sponsored'],
+    'adnxs': ['adnxs'],
+    'amazon_adsystem': ['amazon-adsystem'],
+    'googlesyndication': ['googlesyndication'],
+    'googletagmanager': ['googletagmanager'],
+    'facebook_net': ['facebook.net'],
+    'outbrain': ['outbrain'],
+    'taboola': ['taboola'],
+    'media_net': ['media.net']
+}, description="Ad-tech vendor markers")
+site_features.term_counts("ad_mentions", {
+    'ad': ['ad'],
+    'advert': ['advert'],
+    'banner': ['banner'],
+    'sponsored': ['sponsored']
+}, description="Loose ad wording anywhere in the markup")
+site_features.keyword_counts("keyword_freq", ['tech', 'AI', 'startup', 'news'], description="Example topic keywords")
+
+if AD_VENDOR_FILE:
+    with open(AD_VENDOR_FILE, encoding="utf-8") as vendor_file:
+        _vendors = MultiPatternMatcher.from_lines(vendor_file)
+    site_features.register(
+        "ad_vendors",
+        lambda d: {vendor: n for vendor, n in _vendors.count(d.html).items() if n},
+        f"Mentions of the {len(_vendors.keys)} domains in AD_VENDOR_FILE"
+    )
@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any
+
+import stats
+from page_cache import normalize_url
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv(
+    "SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "snapshots")
+)
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Retention: snapshots older than this, and the oldest ones past the compressed-size cap, are pruned
+SNAPSHOT_MAX_AGE_DAYS = float(os.getenv("SNAPSHOT_MAX_AGE_DAYS", "30"))
+SNAPSHOT_MAX_BYTES = int(os.getenv("SNAPSHOT_MAX_BYTES", str(1024 * 1024 * 1024)))
+# Saves between retention passes
+SNAPSHOT_PRUNE_EVERY = 50
+
+# zstd when the optional zstandard package is installed, zlib otherwise
+try:
+    import zstandard
+    DEFAULT_CODEC = "zstd"
+except ImportError:
+    zstandard = None
+    DEFAULT_CODEC = "zlib"
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 6)
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Snapshot was stored with zstd but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+class Snapshot:
+    """A stored page: what the fetchers returned plus when and how it was fetched."""
+
+    def __init__(self, row: sqlite3.Row, html: Optional[str] = None):
+        self.id = row["id"]
+        self.url = row["url"]
+        self.mode = row["mode"]
+        self.fetched_at = row["fetched_at"]
+        self.content_hash = row["content_hash"]
+        self.scripts = json.loads(row["scripts"])
+        self.iframes = json.loads(row["iframes"])
+        self.html = html
+
+    def result(self):
+        """(html, scripts, iframes), as returned by the fetchers."""
+        return self.html, list(self.scripts), list(self.iframes)
+
+class SnapshotStore:
+    """
+    Local store of every fetched page for replay and offline analysis.
+    HTML bodies are compressed and stored once per content hash; a sqlite
+    index records each fetch (URL, mode, time, script/iframe lists) under a
+    snapshot id that analyzers can use instead of a live URL.
+    """
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, codec: str = DEFAULT_CODEC,
+                 max_age_days: float = SNAPSHOT_MAX_AGE_DAYS, max_bytes: int = SNAPSHOT_MAX_BYTES):
+        self.directory = directory
+        self.codec = codec
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.saved = 0
+        self.deduplicated = 0
+        self.pruned = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.join(self.directory, "blobs"), exist_ok=True)
+            # Autocommit; writes use explicit BEGIN IMMEDIATE transactions (see _transaction)
+            conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=30,
+                                   isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    normalized_url TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    scripts TEXT NOT NULL,
+                    iframes TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS snapshots_by_url ON snapshots (normalized_url, fetched_at);
+                CREATE TABLE IF NOT EXISTS blobs (
+                    content_hash TEXT PRIMARY KEY,
+                    codec TEXT NOT NULL,
+                    raw_bytes INTEGER NOT NULL,
+                    stored_bytes INTEGER NOT NULL
+                );
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, "blobs", content_hash[:2], content_hash)
+
+    def save(self, url: str, mode: str, html: str, scripts: List[str], iframes: List[str]) -> str:
+        """Store a fetched page and return its snapshot id."""
+        raw = html.encode("utf-8")
+        content_hash = hashlib.sha256(raw).hexdigest()
+        snapshot_id = uuid.uuid4().hex
+        with self._lock:
+            conn = self._connect()
+            compressed = None
+            if not conn.execute("SELECT 1 FROM blobs WHERE content_hash = ?", (content_hash,)).fetchone():
+                # Compressed before taking the write lock; other workers only wait for the inserts
+                compressed = _compress(raw, self.codec)
+            with self._transaction(conn):
+                if compressed is None and not conn.execute(
+                    "SELECT 1 FROM blobs WHERE content_hash = ?", (content_hash,)
+                ).fetchone():
+                    # Pruned by another worker since the check above
+                    compressed = _compress(raw, self.codec)
+                added = compressed is not None and conn.execute(
+                    "INSERT OR IGNORE INTO blobs (content_hash, codec, raw_bytes, stored_bytes) VALUES (?, ?, ?, ?)",
+                    (content_hash, self.codec, len(raw), len(compressed))
+                ).rowcount == 1
+                if added:
+                    path = self._blob_path(content_hash)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp_path = f"{path}.{snapshot_id}.tmp"
+                    with open(tmp_path, "wb") as f:
+                        f.write(compressed)
+                    os.replace(tmp_path, path)
+                else:
+                    self.deduplicated += 1
+                conn.execute(
+                    "INSERT INTO snapshots (id, url, normalized_url, mode, fetched_at, content_hash, scripts, iframes) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (snapshot_id, url, normalize_url(url), mode, time.time(), content_hash,
+                     json.dumps(list(scripts)), json.dumps(list(iframes)))
+                )
+            self.saved += 1
+            if self.saved % SNAPSHOT_PRUNE_EVERY == 1:
+                self._prune(conn)
+        return snapshot_id
+
+    @staticmethod
+    @contextmanager
+    def _transaction(conn: sqlite3.Connection):
+        """
+        Write transaction that holds the database write lock from the start,
+        so blob and snapshot rows (and blob files) change atomically across
+        worker processes sharing the directory.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def prune(self) -> int:
+        """Apply the retention policy now; returns the number of snapshots removed."""
+        with self._lock:
+            return self._prune(self._connect())
+
+    def _prune(self, conn: sqlite3.Connection) -> int:
+        """Drop snapshots past max_age_days, then the oldest until blobs fit in max_bytes (lock held)."""
+        with self._transaction(conn):
+            removed = self._prune_rows(conn)
+        if removed:
+            self.pruned += removed
+            logger.info(f"Pruned {removed} snapshots")
+        return removed
+
+    def _prune_rows(self, conn: sqlite3.Connection) -> int:
+        removed = conn.execute(
+            "DELETE FROM snapshots WHERE fetched_at < ?", (time.time() - self.max_age_days * 86400,)
+        ).rowcount
+        self._delete_orphan_blobs(conn)
+        if conn.execute("SELECT COALESCE(SUM(stored_bytes), 0) FROM blobs").fetchone()[0] > self.max_bytes:
+            # Keep the newest snapshots whose distinct blobs fit; older ones sharing a kept blob cost nothing
+            kept, kept_bytes, full, expired = set(), 0, False, []
+            for row in conn.execute(
+                "SELECT s.id, s.content_hash, b.stored_bytes FROM snapshots s JOIN blobs b USING (content_hash) "
+                "ORDER BY s.fetched_at DESC"
+            ).fetchall():
+                if row["content_hash"] in kept:
+                    continue
+                if full or kept_bytes + row["stored_bytes"] > self.max_bytes:
+                    full = True
+                    expired.append((row["id"],))
+                    continue
+                kept.add(row["content_hash"])
+                kept_bytes += row["stored_bytes"]
+            conn.executemany("DELETE FROM snapshots WHERE id = ?", expired)
+            removed += len(expired)
+            self._delete_orphan_blobs(conn)
+        return removed
+
+    def _delete_orphan_blobs(self, conn: sqlite3.Connection):
+        """Remove blobs no snapshot refers to any more, with their files (inside a write transaction)."""
+        orphans = [row[0] for row in conn.execute(
+            "SELECT content_hash FROM blobs WHERE content_hash NOT IN (SELECT content_hash FROM snapshots)"
+        )]
+        for content_hash in orphans:
+            try:
+                os.remove(self._blob_path(content_hash))
+            except FileNotFoundError:
+                pass
+        conn.executemany("DELETE FROM blobs WHERE content_hash = ?", [(h,) for h in orphans])
+
+    def load(self, snapshot_id: str) -> Optional[Snapshot]:
+        """Load a snapshot with its HTML, or None if the id is unknown."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT s.*, b.codec FROM snapshots s JOIN blobs b USING (content_hash) WHERE s.id = ?",
+                (snapshot_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._blob_path(row["content_hash"]), "rb") as f:
+                html = _decompress(f.read(), row["codec"]).decode("utf-8")
+        except FileNotFoundError:
+            # Pruned between the index lookup and the read
+            return None
+        return Snapshot(row, html)
+
+    def list(self, url: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent snapshots, optionally only those of one URL."""
+        query = "SELECT s.*, b.raw_bytes, b.stored_bytes FROM snapshots s JOIN blobs b USING (content_hash)"
+        params: list = []
+        if url:
+            query += " WHERE s.normalized_url = ?"
+            params.append(normalize_url(url))
+        query += " ORDER BY s.fetched_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        return [
+            {
+                "snapshot_id": row["id"],
+                "url": row["url"],
+                "mode": row["mode"],
+                "fetched_at": row["fetched_at"],
+                "content_hash": row["content_hash"],
+                "bytes": row["raw_bytes"],
+                "stored_bytes": row["stored_bytes"]
+            }
+            for row in rows
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot/blob counts and the on-disk compression ratio."""
+        result = {
+            "enabled": SNAPSHOTS_ENABLED,
+            "codec": self.codec,
+            "saved": self.saved,
+            "deduplicated": self.deduplicated,
+            "pruned": self.pruned,
+            "max_age_days": self.max_age_days,
+            "max_bytes": self.max_bytes
+        }
+        if self._conn is None and not os.path.exists(os.path.join(self.directory, "index.sqlite3")):
+            return result
+        with self._lock:
+            conn = self._connect()
+            snapshots = conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+            blobs, raw, stored = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(stored_bytes), 0) FROM blobs"
+            ).fetchone()
+        return {
+            **result,
+            "snapshots": snapshots,
+            "blobs": blobs,
+            "raw_bytes": raw,
+            "stored_bytes": stored,
+            "compression_ratio": round(raw / stored, 2) if stored else 0.0
+        }
+
+# Create singleton store instance
+snapshot_store = SnapshotStore()
+
+stats.register("snapshot_store", snapshot_store.get_stats)
@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Enable with STARTUP_PROFILE=1; STARTUP_PROFILE_TOP limits the per-module listing
+PROFILE_ENABLED = os.getenv("STARTUP_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_TOP = int(os.getenv("STARTUP_PROFILE_TOP", "25"))
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size, or None where it cannot be read cheaply."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+def _delta(after: Optional[int], before: Optional[int]) -> Optional[int]:
+    return after - before if after is not None and before is not None else None
+
+class StartupProfiler:
+    """
+    Records wall time and RSS delta for every module import (via a
+    sys.meta_path hook) and for named startup steps such as singleton
+    constructors and warm-up loaders. Import times are reported both
+    inclusive (with nested imports) and self (excluding them).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started_at = time.perf_counter()
+        self.rss_at_start = _rss_bytes()
+        self.imports: Dict[str, Dict[str, Any]] = {}
+        self.steps: List[Dict[str, Any]] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self):
+        """Start profiling imports from this point on."""
+        if self.enabled:
+            return
+        self.enabled = True
+        sys.meta_path.insert(0, _ProfilingFinder(self))
+        logger.info("⏱️ Startup profiling enabled")
+
+    def _stack(self) -> List[List[float]]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record_import(self, name: str, exec_module, module):
+        stack = self._stack()
+        # [seconds, RSS bytes] spent in nested imports while this one runs
+        frame = [0.0, 0]
+        stack.append(frame)
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        try:
+            exec_module(module)
+        finally:
+            seconds = time.perf_counter() - start
+            rss_delta = _delta(_rss_bytes(), rss_before)
+            stack.pop()
+            if stack:
+                stack[-1][0] += seconds
+                stack[-1][1] += rss_delta or 0
+            with self._lock:
+                self.imports[name] = {
+                    "seconds": seconds,
+                    "self_seconds": max(seconds - frame[0], 0.0),
+                    "rss_delta_bytes": rss_delta,
+                    "self_rss_delta_bytes": rss_delta - frame[1] if rss_delta is not None else None,
+                    "nested": bool(stack)
+                }
+
+    @contextmanager
+    def measure(self, name: str, kind: str = "step"):
+        """Time a named startup step (no-op unless profiling is enabled)."""
+        if not self.enabled:
+            yield
+            return
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.steps.append({
+                    "name": name,
+                    "kind": kind,
+                    "seconds": round(time.perf_counter() - start, 4),
+                    "rss_delta_bytes": _delta(_rss_bytes(), rss_before)
+                })
+
+    def report(self, top: int = PROFILE_TOP) -> Dict[str, Any]:
+        """Structured startup report: slowest imports, per-package totals and steps."""
+        if not self.enabled:
+            return {"enabled": False, "hint": "Set STARTUP_PROFILE=1 to record startup timings"}
+
+        with self._lock:
+            imports = dict(self.imports)
+            steps = list(self.steps)
+
+        packages: Dict[str, Dict[str, Any]] = {}
+        for name, record in imports.items():
+            package = packages.setdefault(name.split(".")[0], {"modules": 0, "self_seconds": 0.0, "rss_delta_bytes": 0})
+            package["modules"] += 1
+            package["self_seconds"] += record["self_seconds"]
+            package["rss_delta_bytes"] += record["self_rss_delta_bytes"] or 0
+
+        slowest = sorted(imports.items(), key=lambda item: item[1]["self_seconds"], reverse=True)[:top]
+        return {
+            "enabled": True,
+            "uptime_seconds": round(time.perf_counter() - self.started_at, 3),
+            "rss_bytes": _rss_bytes(),
+            "rss_at_start_bytes": self.rss_at_start,
+            "imports": {
+                "modules": len(imports),
+                "seconds": round(sum(r["seconds"] for r in imports.values() if not r["nested"]), 4),
+                "slowest": [
+                    {
+                        "module": name,
+                        "seconds": round(r["seconds"], 4),
+                        "self_seconds": round(r["self_seconds"], 4),
+                        "rss_delta_bytes": r["rss_delta_bytes"],
+                        "self_rss_delta_bytes": r["self_rss_delta_bytes"]
+                    }
+                    for name, r in slowest
+                ],
+                "by_package": {
+                    name: {**p, "self_seconds": round(p["self_seconds"], 4)}
+                    for name, p in sorted(packages.items(), key=lambda item: item[1]["self_seconds"], reverse=True)[:top]
+                }
+            },
+            "steps": steps
+        }
+
+    def log_report(self, phase: str):
+        """Log a one-line-per-entry summary of the report."""
+        if not self.enabled:
+            return
+        report = self.report(top=10)
+        mib = lambda value: f"{value / (1024 * 1024):+.1f} MiB" if value is not None else "n/a"
+        logger.info(f"⏱️ Startup profile after {phase}: {report['uptime_seconds']:.2f}s, "
+                    f"{report['imports']['modules']} modules imported in {report['imports']['seconds']:.2f}s")
+        for name, package in report["imports"]["by_package"].items():
+            logger.info(f"   import {name}: {package['self_seconds']:.3f}s ({package['modules']} modules, RSS {mib(package['rss_delta_bytes'])})")
+        for step in report["steps"]:
+            logger.info(f"   {step['kind']} {step['name']}: {step['seconds']:.3f}s (RSS {mib(step['rss_delta_bytes'])})")
+
+class _ProfilingFinder:
+    """Meta path finder that defers to the real finders and times exec_module."""
+
+    def __init__(self, profiler: StartupProfiler):
+        self.profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            loader = spec.loader
+            # Builtin/frozen importers are classes shared by all modules; leave them alone
+            if (loader is not None and not isinstance(loader, type)
+                    and hasattr(loader, "exec_module") and not getattr(loader, "_startup_profiled", False)):
+                self._wrap(loader)
+            return spec
+        return None
+
+    def _wrap(self, loader):
+        # Some loaders (e.g. zipimporter) serve several modules, so key records by module name
+        exec_module = loader.exec_module
+        try:
+            loader.exec_module = lambda module: self.profiler._record_import(module.__name__, exec_module, module)
+            loader._startup_profiled = True
+        except AttributeError:
+            pass
+
+# Create singleton profiler instance
+startup_profiler = StartupProfiler()
+
+def install_from_env():
+    """Install the import hook when STARTUP_PROFILE is set."""
+    if PROFILE_ENABLED:
+        startup_profiler.install()
@@ -0,0 +1,55 @@
+import logging
+from typing import Callable, Dict, Any
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Named callables returning a JSON-serialisable snapshot of some component
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+def register(name: str, provider: Callable[[], Dict[str, Any]]):
+    """Register a stats provider exposed under /debug/stats."""
+    _providers[name] = provider
+
+def snapshot() -> Dict[str, Any]:
+    """Collect the current stats of every registered provider."""
+    result = {}
+    for name, provider in list(_providers.items()):
+        try:
+            result[name] = provider()
+        except Exception as e:
+            logger.error(f"Stats provider '{name}' failed: {e}")
+            result[name] = {"error": str(e)}
+    return result
+
+class Histogram:
+    """Cumulative bucket histogram (Prometheus 'le' semantics)."""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self._counts[i] += 1
+                break
+        else:
+            self._counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + ["+Inf"], self._counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "buckets": buckets,
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 3) if self.count else 0.0
+        }
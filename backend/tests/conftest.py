@@ -0,0 +1,30 @@
+import os
+import sys
+import asyncio
+import tempfile
+
+import httpx
+import pytest
+
+# Backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the module-level stores' files out of the source tree
+_cache_dir = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.setdefault("SNAPSHOT_DIR", os.path.join(_cache_dir, "snapshots"))
+os.environ.setdefault("FINGERPRINT_DIR", os.path.join(_cache_dir, "fingerprints"))
+
+@pytest.fixture
+def mock_http():
+    """Route the shared http_client through an httpx.MockTransport handler (call inside the test's event loop)."""
+    from http_client import http_client
+
+    def install(handler):
+        http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True)
+        http_client._loop = asyncio.get_running_loop()
+        http_client._host_limits = {}
+        return http_client
+
+    yield install
+    http_client._client = None
+    http_client._loop = None
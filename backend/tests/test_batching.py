@@ -0,0 +1,69 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from batching import MicroBatchEncoder
+
+class BlockingEncoder:
+    """Encoder whose forward pass waits until released, so a batch can be caught in flight."""
+
+    cache_key = "blocking"
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+
+    def encode(self, texts):
+        self.batches.append(list(texts))
+        self.entered.set()
+        self.release.wait(5)
+        return np.array([[float(len(text))] for text in texts])
+
+def test_concurrent_callers_share_a_batch():
+    encoder = BlockingEncoder()
+    encoder.release.set()
+    batcher = MicroBatchEncoder(encoder, max_batch_size=8, max_wait_ms=20)
+
+    async def run():
+        vectors = await asyncio.gather(*(batcher.encode("x" * n) for n in range(1, 6)))
+        await batcher.stop()
+        return vectors
+
+    vectors = asyncio.run(run())
+    assert [vector[0] for vector in vectors] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert encoder.batches == [["x", "xx", "xxx", "xxxx", "xxxxx"]]
+
+def test_stop_cancels_in_flight_and_queued_callers():
+    encoder = BlockingEncoder()
+    batcher = MicroBatchEncoder(encoder, max_batch_size=2, max_wait_ms=0)
+
+    async def run():
+        callers = [asyncio.ensure_future(batcher.encode(f"sentence {i}")) for i in range(5)]
+        await asyncio.to_thread(encoder.entered.wait, 5)
+        await batcher.stop()
+        results = await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), 1)
+        encoder.release.set()
+        return results
+
+    results = asyncio.run(run())
+    assert len(encoder.batches) == 1
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+
+def test_encoder_errors_reach_every_caller():
+    class FailingEncoder:
+        cache_key = "failing"
+
+        def encode(self, texts):
+            raise RuntimeError("model unavailable")
+
+    batcher = MicroBatchEncoder(FailingEncoder(), max_wait_ms=5)
+
+    async def run():
+        results = await asyncio.gather(batcher.encode("a"), batcher.encode("b"), return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from domain_health import DomainHealthTracker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN, FETCH_TIMEOUT_MAX
+
+URL = "https://flaky.test/page"
+
+def fail(tracker, times=1):
+    for _ in range(times):
+        tracker.before_fetch(URL, "basic")
+        tracker.record_failure(URL, RuntimeError("boom"))
+
+def state(tracker):
+    return tracker._get(URL).state
+
+def test_circuit_opens_after_consecutive_failures():
+    tracker = DomainHealthTracker(failure_threshold=3, cooldown_seconds=60)
+    fail(tracker, 2)
+    assert state(tracker) == CLOSED
+    fail(tracker)
+    assert state(tracker) == OPEN
+    with pytest.raises(CircuitOpenError):
+        tracker.before_fetch(URL, "basic")
+
+def test_success_resets_failure_count():
+    tracker = DomainHealthTracker(failure_threshold=2)
+    fail(tracker)
+    tracker.before_fetch(URL, "basic")
+    tracker.record_success(URL, "basic", 0.1)
+    fail(tracker)
+    assert state(tracker) == CLOSED
+
+def test_half_open_allows_one_trial_and_closes_on_success():
+    tracker = DomainHealthTracker(failure_threshold=1, cooldown_seconds=60)
+    fail(tracker)
+    tracker._get(URL).opened_at = time.monotonic() - 61
+    tracker.before_fetch(URL, "basic")
+    assert state(tracker) == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        tracker.before_fetch(URL, "basic")
+    tracker.record_success(URL, "basic", 0.1)
+    assert state(tracker) == CLOSED
+
+def test_failed_trial_reopens_and_cancelled_trial_is_released():
+    tracker = DomainHealthTracker(failure_threshold=1, cooldown_seconds=60)
+    fail(tracker)
+    tracker._get(URL).opened_at = time.monotonic() - 61
+    fail(tracker)
+    assert state(tracker) == OPEN
+
+    tracker._get(URL).opened_at = time.monotonic() - 61
+    tracker.before_fetch(URL, "basic")
+    tracker.release(URL)
+    tracker.before_fetch(URL, "basic")
+    assert state(tracker) == HALF_OPEN
+
+def test_timeout_follows_domain_latency_per_mode():
+    tracker = DomainHealthTracker()
+    assert tracker.before_fetch(URL, "basic") == FETCH_TIMEOUT_MAX
+    for _ in range(10):
+        tracker.record_success(URL, "basic", 2.0)
+    assert tracker.before_fetch(URL, "basic") == 6.0
+    assert tracker.before_fetch(URL, "rendered") == FETCH_TIMEOUT_MAX
+
+def test_least_recently_fetched_domains_are_evicted():
+    tracker = DomainHealthTracker(max_domains=2)
+    tracker.before_fetch("https://a.test/", "basic")
+    tracker.before_fetch("https://b.test/", "basic")
+    tracker.before_fetch("https://a.test/", "basic")
+    tracker.before_fetch("https://c.test/", "basic")
+    assert list(tracker._domains) == ["a.test", "c.test"]
+    assert tracker.get_stats()["evictions"] == 1
+
+def test_guarded_fetch_records_given_latency(monkeypatch):
+    import asyncio
+    import page_fetcher
+
+    tracker = DomainHealthTracker()
+    monkeypatch.setattr(page_fetcher, "domain_health", tracker)
+
+    async def run():
+        async with page_fetcher.guarded_fetch(URL, "rendered", latency=lambda: 1.5):
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert list(tracker._get(URL).latencies["rendered"]) == [1.5]
@@ -0,0 +1,62 @@
+import os
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+class CountingEncoder:
+    """Deterministic toy encoder that records how many sentences it encoded."""
+
+    cache_key = "toy-encoder"
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts):
+        self.encoded += len(texts)
+        return np.array([[len(text), sum(map(ord, text)) % 97] for text in texts], dtype=np.float32)
+
+def _warm_up(directory, worker, start):
+    # Every worker shares the catalogue texts and adds some of its own, all at once
+    start.wait()
+    texts = [f"metric {i}" for i in range(20)] + [f"worker {worker} phrase {i}" for i in range(20)]
+    for i in range(0, len(texts), 5):
+        EmbeddingCache(directory).encode(texts[i:i + 5], CountingEncoder())
+
+@pytest.mark.skipif(embedding_cache.fcntl is None, reason="file locks need fcntl")
+def test_concurrent_workers_keep_every_row(tmp_path):
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    workers = [context.Process(target=_warm_up, args=(str(tmp_path), worker, start)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    start.set()
+    for process in workers:
+        process.join(30)
+    assert [process.exitcode for process in workers] == [0, 0, 0, 0]
+
+    encoder = CountingEncoder()
+    texts = [f"metric {i}" for i in range(20)] + [f"worker {w} phrase {i}" for w in range(4) for i in range(20)]
+    vectors = EmbeddingCache(str(tmp_path)).encode(texts, encoder)
+    assert encoder.encoded == 0
+    assert np.array_equal(vectors, CountingEncoder().encode(texts))
+
+def test_superseded_matrices_are_swept_only_after_grace(tmp_path, monkeypatch):
+    cache, encoder = EmbeddingCache(str(tmp_path)), CountingEncoder()
+    cache.encode(["first"], encoder)
+    cache.encode(["second"], encoder)
+    matrices = sorted(name for name in os.listdir(tmp_path) if name.endswith(".npy"))
+    # The superseded matrix stays for workers that may still map it
+    assert len(matrices) == 2
+
+    for name in matrices:
+        os.utime(tmp_path / name, (0, 0))
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_SWEEP_AFTER_SECONDS", 60)
+    cache.encode(["third"], encoder)
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".npy")]) == 1
+    assert np.array_equal(EmbeddingCache(str(tmp_path)).encode(["first", "third"], encoder),
+                          CountingEncoder().encode(["first", "third"]))
+    assert encoder.encoded == 3
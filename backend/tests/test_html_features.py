@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from benchmark_html_features import BLOCKS, synthetic_page
+from html_features import scan_tags, scan_tags_regex
+
+DOMAIN = "example.com"
+
+def assert_same_counts(html, domain=DOMAIN):
+    fast, reference = scan_tags(html, domain), scan_tags_regex(html, domain)
+    assert fast.tags == reference.tags, html
+    assert fast.external == reference.external, html
+
+@pytest.mark.parametrize("seed", range(5))
+def test_synthetic_pages(seed):
+    html = synthetic_page(200, seed)
+    assert_same_counts(html)
+    assert_same_counts(html.upper())
+
+def test_truncated_documents():
+    html = synthetic_page(40, seed=7)
+    for cut in range(0, len(html), 37):
+        assert_same_counts(html[:cut])
+
+def test_nested_angle_brackets_and_odd_markup():
+    pages = [
+        '<a href="<img src=x>">x</a><p<script src="https://evil.net/a.js">',
+        '<img alt="a<p>b" src="https://cdn.net/i.png"><a <a href="https://partner.org/">',
+        '<link href="https://fonts.net/f.css" rel="stylesheet"><link rel=\'stylesheet\' href="https://fonts.net/g.css">',
+        '<META NAME="viewport" content="x"><A HREF="https://WWW.Example.com/">in</A><Script SRC="https://other.net/s.js">',
+        '<pre>if (a<b && c>d) {}</pre><p>a < b</p><ol><ul><form><p',
+        '<a\thref="https://partner.org/">tab</a><img\nsrc="https://cdn.net/x.png" sizes="100vw">',
+    ]
+    for html in pages:
+        assert_same_counts(html)
+
+def test_case_fold_traps_and_non_ascii_domains():
+    html = '<SCRİPT src="https://other.net/a.js"></SCRİPT><ſcript><a href="https://ſite.net/">x</a><p>ı</p>'
+    assert_same_counts(html)
+    assert_same_counts(synthetic_page(20), domain="exämple.com")
+
+def test_random_block_soup():
+    rng = random.Random(3)
+    fragments = BLOCKS + ["<", ">", "<p", "<a ", "<img", '"', "'", "İ", "\n", "://"]
+    for _ in range(200):
+        assert_same_counts("".join(rng.choice(fragments) for _ in range(rng.randint(0, 30))))
@@ -0,0 +1,125 @@
+import asyncio
+
+import httpx
+import pytest
+
+import page_fetcher
+from page_fetcher import fetch_basic_html, page_cache
+
+PAGE = "<html><head><title>Cached</title></head><body><p>Hello</p></body></html>"
+
+def test_fetch_text_reads_body(mock_http):
+    async def run():
+        client = mock_http(lambda request: httpx.Response(200, text=PAGE, headers={"etag": '"v1"'}))
+        return await client.fetch_text("https://fetch-200.test/")
+
+    page = asyncio.run(run())
+    assert page.status_code == 200
+    assert page.text == PAGE
+    assert page.headers["etag"] == '"v1"'
+    assert not page.truncated
+
+def test_fetch_text_returns_304_without_raising(mock_http):
+    async def run():
+        client = mock_http(lambda request: httpx.Response(304, headers={"etag": '"v1"'}))
+        return await client.fetch_text("https://fetch-304.test/", headers={"If-None-Match": '"v1"'})
+
+    page = asyncio.run(run())
+    assert page.status_code == 304
+    assert page.text == ""
+
+def test_fetch_text_stops_at_byte_budget(mock_http):
+    body = "é" * 1000  # two bytes each, so the cut lands inside a character
+
+    async def run():
+        client = mock_http(lambda request: httpx.Response(200, content=body.encode("utf-8"),
+                                                          headers={"content-type": "text/html; charset=utf-8"}))
+        return await client.fetch_text("https://fetch-budget.test/", max_bytes=101)
+
+    page = asyncio.run(run())
+    assert page.truncated
+    assert page.bytes_read == 101
+    assert page.text.startswith("é" * 50)
+    assert len(page.text) == 51  # the split character decodes as a replacement
+
+def test_fetch_text_raises_on_server_error(mock_http):
+    async def run():
+        client = mock_http(lambda request: httpx.Response(503))
+        return await client.fetch_text("https://fetch-503.test/")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+
+def test_stale_basic_page_is_revalidated_with_304(mock_http, monkeypatch):
+    url = "https://revalidate-304.test/"
+    seen = []
+    monkeypatch.setattr(page_fetcher, "SNAPSHOTS_ENABLED", False)
+
+    def handler(request):
+        seen.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"etag": '"v1"'})
+        return httpx.Response(200, text=PAGE, headers={"etag": '"v1"'})
+
+    async def run():
+        mock_http(handler)
+        first = await fetch_basic_html(url)
+        entry, _ = page_cache.lookup(url, "basic")
+        entry.fetched_at -= page_cache.ttl_seconds + 1
+        revalidated_before = page_cache.revalidated
+        second = await fetch_basic_html(url)
+        return first, second, page_cache.revalidated - revalidated_before
+
+    first, second, revalidations = asyncio.run(run())
+    assert seen == [None, '"v1"']
+    assert second == first
+    assert revalidations == 1
+
+def test_rendered_revalidation_reads_headers_only(mock_http):
+    from page_cache import CachedPage
+
+    entry = CachedPage(PAGE, [], [], etag='"v1"')
+
+    def handler(request):
+        if request.headers.get("if-none-match") == '"v1"' and "unchanged" in request.url.host:
+            return httpx.Response(304)
+        return httpx.Response(200, text=PAGE * 100)
+
+    async def run():
+        client = mock_http(handler)
+        bytes_before = client.bytes_read
+        unchanged = await page_fetcher._still_valid("https://unchanged.test/", entry)
+        changed = await page_fetcher._still_valid("https://changed.test/", entry)
+        return unchanged, changed, client.bytes_read - bytes_before
+
+    unchanged, changed, bytes_read = asyncio.run(run())
+    assert unchanged is True
+    assert changed is False
+    assert bytes_read == 0
+
+def test_client_connects_through_the_dns_cache():
+    import time
+    from http_client import HttpClient
+
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: 5\r\n\r\nhello")
+        await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = HttpClient()
+        # An unresolvable name only connects if the cached address is used
+        client.dns._cache[("cached-only.invalid", port)] = (["127.0.0.1"], time.monotonic() + 60)
+        try:
+            page = await client.fetch_text(f"http://cached-only.invalid:{port}/")
+        finally:
+            await client.stop()
+            server.close()
+        return page, client.dns.hits
+
+    page, hits = asyncio.run(run())
+    assert page.text == "hello"
+    assert hits == 1
@@ -0,0 +1,47 @@
+import re
+import random
+
+import pytest
+
+from multi_pattern import MultiPatternMatcher
+
+ALPHABET = "ab.-_ İıſKKSI"
+
+def reference_counts(terms, text, case_insensitive=True, whole_words=False):
+    """Per key, re.findall on an alternation of its terms (longest first)."""
+    counts = {}
+    for key, literals in terms.items():
+        alternation = "|".join(re.escape(literal) for literal in sorted(literals, key=len, reverse=True))
+        if whole_words:
+            alternation = rf"\b(?:{alternation})\b"
+        counts[key] = len(re.findall(alternation, text, re.IGNORECASE if case_insensitive else 0))
+    return counts
+
+def random_terms(rng):
+    alphabet = "abks.-"
+    return {
+        f"key{i}": ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 3))]
+        for i in range(rng.randint(1, 5))
+    }
+
+@pytest.mark.parametrize("whole_words", [False, True])
+@pytest.mark.parametrize("case_insensitive", [True, False])
+def test_counts_match_re_findall(case_insensitive, whole_words):
+    rng = random.Random(f"{case_insensitive}-{whole_words}")
+    for _ in range(300):
+        terms = random_terms(rng)
+        text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 60)))
+        matcher = MultiPatternMatcher(terms, case_insensitive=case_insensitive, whole_words=whole_words)
+        assert matcher.count(text) == reference_counts(terms, text, case_insensitive, whole_words), (terms, text)
+
+def test_vendor_domains_in_page():
+    matcher = MultiPatternMatcher.from_lines(["# ad vendors", "doubleclick.net", "", "googlesyndication.com", "ads.example"])
+    html = ('<script src="https://securepubads.g.DoubleClick.net/gpt.js"></script>'
+            '<iframe src="https://googleads.g.doubleclick.net/x"></iframe>'
+            '<script src="https://pagead2.googlesyndication.com/a.js"></script>')
+    assert matcher.count(html) == {"doubleclick.net": 2, "googlesyndication.com": 1, "ads.example": 0}
+    assert [key for _, _, key in matcher.find(html)] == ["doubleclick.net", "doubleclick.net", "googlesyndication.com"]
+
+def test_empty_term_is_rejected():
+    with pytest.raises(ValueError):
+        MultiPatternMatcher({"broken": ["ok", ""]})
@@ -0,0 +1,121 @@
+import json
+import asyncio
+
+from page_fingerprint import FingerprintStore, PageFingerprint, fingerprint_html
+
+ARTICLE = " ".join(f"Paragraph {i} of the story talks about publishing, audiences and revenue." for i in range(40))
+PAGE = (
+    '<html><head><title>News</title><script src="/static/app.js"></script>'
+    '<script>window.nonce = "a1b2c3";</script></head><body>'
+    + "".join(f'<div class="row"><p>{sentence}.</p><a href="/s/{i}">More</a></div>'
+              for i, sentence in enumerate(ARTICLE.split(".")))
+    + "</body></html>"
+)
+AD_STACK = "".join(
+    '<script async src="https://securepubads.g.doubleclick.net/tag/js/gpt.js"></script>'
+    '<script async src="https://pagead2.googlesyndication.com/pagead/js/adsbygoogle.js?client=ca-pub-1"></script>'
+    for _ in range(5)
+)
+
+def test_fingerprint_ignores_inline_state_and_small_edits():
+    base = fingerprint_html(PAGE)
+    edited = PAGE.replace('"a1b2c3"', '"zz99"').replace("</body>", "<p>Updated 5 minutes ago</p></body>")
+    assert base.matches(fingerprint_html(edited))
+
+def test_changed_ad_stack_does_not_match():
+    base = fingerprint_html(PAGE)
+    with_ads = fingerprint_html(PAGE.replace("</head>", AD_STACK + "</head>"))
+    assert not base.matches(with_ads)
+    one_more = fingerprint_html(PAGE.replace("</head>", AD_STACK + AD_STACK[:80] + "</head>"))
+    assert not with_ads.matches(one_more)
+
+def test_fingerprint_round_trips_and_old_entries_never_match():
+    fingerprint = fingerprint_html(PAGE)
+    restored = PageFingerprint.from_dict(json.loads(json.dumps(fingerprint.to_dict())))
+    assert restored.matches(fingerprint)
+    legacy = {key: value for key, value in fingerprint.to_dict().items() if key != "resources"}
+    assert not PageFingerprint.from_dict(legacy).matches(fingerprint)
+
+def compute_counter(results):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return results[len(calls) - 1]
+
+    return compute, calls
+
+def test_get_or_compute_reuses_until_page_changes(tmp_path):
+    store = FingerprintStore(directory=str(tmp_path))
+    compute, calls = compute_counter([{"ads": 0}, {"ads": 10}])
+    url = "https://site.test/"
+
+    async def run():
+        first = await store.get_or_compute("metrics", [url], [fingerprint_html(PAGE)], compute)
+        # Same content under an equivalent URL
+        second = await store.get_or_compute("metrics", ["https://SITE.test"], [fingerprint_html(PAGE)], compute)
+        changed = fingerprint_html(PAGE.replace("</head>", AD_STACK + "</head>"))
+        third = await store.get_or_compute("metrics", [url], [changed], compute)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first == ({"ads": 0}, None)
+    assert second[0] == {"ads": 0} and second[1]["distance"] == 0
+    assert third == ({"ads": 10}, None)
+    assert len(calls) == 2
+
+def test_get_or_compute_refresh_and_keep(tmp_path):
+    store = FingerprintStore(directory=str(tmp_path))
+    compute, calls = compute_counter([{"error": "quota"}, {"ok": 1}, {"ok": 2}])
+    fingerprints = [fingerprint_html(PAGE)]
+    keep = lambda result: "error" not in result
+
+    async def run():
+        failed = await store.get_or_compute("report", ["https://a.test/"], fingerprints, compute, keep=keep)
+        ok = await store.get_or_compute("report", ["https://a.test/"], fingerprints, compute, keep=keep)
+        refreshed = await store.get_or_compute("report", ["https://a.test/"], fingerprints, compute, refresh=True)
+        reused = await store.get_or_compute("report", ["https://a.test/"], fingerprints, compute)
+        return failed, ok, refreshed, reused
+
+    failed, ok, refreshed, reused = asyncio.run(run())
+    assert failed == ({"error": "quota"}, None)
+    assert ok == ({"ok": 1}, None)
+    assert refreshed == ({"ok": 2}, None)
+    assert reused[0] == {"ok": 2}
+    assert len(calls) == 3
+
+def test_expired_and_multi_page_entries(tmp_path):
+    store = FingerprintStore(directory=str(tmp_path), ttl_seconds=0)
+    pages = [fingerprint_html(PAGE), fingerprint_html(PAGE.replace("</head>", AD_STACK + "</head>"))]
+    store.save("insights", ["https://a.test/", "https://b.test/"], pages, {"x": 1})
+    assert store.find("insights", ["https://a.test/", "https://b.test/"], pages) is None
+
+    store.ttl_seconds = 3600
+    assert store.find("insights", ["https://a.test/", "https://b.test/"], pages)[0] == {"x": 1}
+    assert store.find("insights", ["https://a.test/", "https://b.test/"], pages[::-1]) is None
+    assert store.find("insights", ["https://a.test/"], pages[:1]) is None
+
+def test_results_past_ttl_are_pruned_for_every_key(tmp_path):
+    store = FingerprintStore(directory=str(tmp_path), ttl_seconds=3600)
+    pages = [fingerprint_html(PAGE)]
+    store.save("metrics", ["https://old.test/"], pages, {"x": 1})
+    store.save("metrics", ["https://fresh.test/"], pages, {"x": 2})
+    with store._lock:
+        store._connect().execute("UPDATE results SET created_at = created_at - 7200 WHERE key LIKE '%old.test%'")
+        store._connect().commit()
+
+    assert store.prune() == 1
+    assert store.get_stats()["stored"] == 1
+    assert store.find("metrics", ["https://fresh.test/"], pages)[0] == {"x": 2}
+
+def test_save_prunes_periodically(tmp_path, monkeypatch):
+    import page_fingerprint
+
+    monkeypatch.setattr(page_fingerprint, "FINGERPRINT_PRUNE_EVERY", 2)
+    store = FingerprintStore(directory=str(tmp_path), ttl_seconds=0)
+    pages = [fingerprint_html(PAGE)]
+    for i in range(3):
+        store.save("metrics", [f"https://site{i}.test/"], pages, {"x": i})
+    # The third save prunes the two expired results before storing its own
+    assert store.pruned == 2
+    assert store.get_stats()["stored"] == 1
@@ -0,0 +1,81 @@
+import asyncio
+
+import numpy as np
+
+from metric_matcher import MetricMatcher
+from query_router import KeywordTrie, TwoStageRouter, synonyms_from_keywords
+from query_cache import QueryCache
+
+METRICS = {
+    "clicks": "How many times ads were clicked (CTR)",
+    "cpc": "Cost Per Click",
+    "geography": "Geography / Device breakdown (site-wise)"
+}
+KEYS = list(METRICS)
+KEYWORDS = ["cost per click", "device", "site-wise", "site", "publisher"]
+# Toy embedding: one axis per metric
+MATCHER = MetricMatcher(KEYS, np.eye(3))
+
+def make_router():
+    trie = KeywordTrie.from_catalogue(KEYS, synonyms_from_keywords(KEYWORDS, METRICS))
+    router = TwoStageRouter("test", trie, QueryCache())
+    # Every phrase leans towards its own metric with a known cosine
+    embeddings = [np.eye(3)[KEYS.index(metric)] + 0.5 for _, metric in trie.phrase_list()]
+    router.set_phrase_similarities(MATCHER, embeddings)
+    return router
+
+def scorer(vector, calls):
+    async def embedding_scores(query):
+        calls.append(query)
+        return MATCHER.scores(np.array(vector, dtype=np.float32))
+    return embedding_scores
+
+PHRASE_SIMILARITY = 1.5 / np.linalg.norm([0.5, 0.5, 1.5])
+
+def test_synonyms_come_from_keywords():
+    assert synonyms_from_keywords(KEYWORDS, METRICS) == {
+        "cpc": ["cost per click"],
+        "geography": ["device", "site-wise"]
+    }
+
+def test_trie_prefers_longest_phrase():
+    trie = KeywordTrie.from_catalogue(KEYS, synonyms_from_keywords(KEYWORDS, METRICS))
+    assert trie.find_phrases("what is my cost per click") == [("cpc", ("cost", "per", "click"))]
+    assert [metric for metric, _ in trie.find_phrases("clicks by device")] == ["clicks", "geography"]
+
+def test_single_keyword_routes_without_encoder():
+    router, calls = make_router(), []
+    for query in ("show clicks", "clicks today", "split by device?"):
+        metric, similarity, stage = asyncio.run(router.route(query, scorer([0, 0, 1], calls)))
+        assert stage == "lexical"
+        assert abs(similarity - PHRASE_SIMILARITY) < 1e-6
+    assert calls == []
+
+def test_repeated_phrase_query_never_encodes():
+    router, calls = make_router(), []
+    for _ in range(3):
+        metric, similarity, stage = asyncio.run(router.route("show the cost per click trend", scorer([1, 0, 0], calls)))
+        assert (metric, stage) == ("cpc", "lexical")
+        assert abs(similarity - PHRASE_SIMILARITY) < 1e-6
+    assert calls == []
+    stats = router.get_stats()
+    assert stats["stage_hits"]["lexical"] == 3
+    assert stats["forward_passes_avoided"] == 3
+
+def test_ambiguous_and_unknown_queries_use_embedding_and_cache():
+    router, calls = make_router(), []
+    first = asyncio.run(router.route("clicks by device", scorer([0, 0, 1], calls)))
+    second = asyncio.run(router.route("Clicks by device?", scorer([0, 0, 1], calls)))
+    assert first == ("geography", 1.0, "embedding")
+    assert second == ("geography", 1.0, "cache")
+    metric, _, stage = asyncio.run(router.route("how is my site doing", scorer([1, 0, 0], calls)))
+    assert (metric, stage) == ("clicks", "embedding")
+    assert len(calls) == 2
+    assert router.get_stats()["ambiguous_lexical"] == 2
+
+def test_lexical_waits_for_phrase_similarities():
+    router, calls = make_router(), []
+    router._phrase_similarities = {}
+    metric, _, stage = asyncio.run(router.route("show clicks", scorer([0, 1, 0], calls)))
+    assert (metric, stage) == ("cpc", "embedding")
+    assert calls == ["show clicks"]
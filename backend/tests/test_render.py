@@ -0,0 +1,71 @@
+import asyncio
+
+import render
+from render import RenderReport, ResourceSizes, block_heavy_resources
+
+class FakeRequest:
+    def __init__(self, url, resource_type):
+        self.url = url
+        self.resource_type = resource_type
+
+class FakeResponse:
+    def __init__(self, url, resource_type, headers):
+        self.url = url
+        self.request = FakeRequest(url, resource_type)
+        self.headers = headers
+
+class FakeRoute:
+    def __init__(self, request):
+        self.request = request
+        self.outcome = None
+
+    async def abort(self):
+        self.outcome = "aborted"
+
+    async def continue_(self):
+        self.outcome = "continued"
+
+class FakePage:
+    def __init__(self):
+        self.handler = None
+
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+def test_resource_sizes_keep_declared_lengths_of_heavy_types_only():
+    sizes = ResourceSizes(max_entries=2)
+    sizes.record_response(FakeResponse("https://cdn.test/a.png", "image", {"content-length": "1200"}))
+    sizes.record_response(FakeResponse("https://cdn.test/app.js", "script", {"content-length": "900"}))
+    sizes.record_response(FakeResponse("https://cdn.test/b.woff2", "font", {}))
+    assert sizes.get("https://cdn.test/a.png") == 1200
+    assert sizes.get("https://cdn.test/app.js") is None
+    assert sizes.get("https://cdn.test/b.woff2") is None
+    sizes.record_response(FakeResponse("https://cdn.test/c.png", "image", {"content-length": "1"}))
+    sizes.record_response(FakeResponse("https://cdn.test/d.png", "image", {"content-length": "2"}))
+    assert sizes.get("https://cdn.test/a.png") is None
+    assert len(sizes) == 2
+
+def test_blocked_requests_count_measured_sizes_and_estimate_the_rest(monkeypatch):
+    sizes = ResourceSizes()
+    sizes.record_response(FakeResponse("https://cdn.test/hero.jpg", "image", {"content-length": "250000"}))
+    monkeypatch.setattr(render, "resource_sizes", sizes)
+
+    page, report = FakePage(), RenderReport("https://site.test/", "fast")
+
+    async def run():
+        await block_heavy_resources(page, report)
+        routes = [FakeRoute(FakeRequest(url, kind)) for url, kind in [
+            ("https://cdn.test/hero.jpg", "image"),
+            ("https://cdn.test/other.jpg", "image"),
+            ("https://cdn.test/app.js", "script")
+        ]]
+        for route in routes:
+            await page.handler(route)
+        return [route.outcome for route in routes]
+
+    assert asyncio.run(run()) == ["aborted", "aborted", "continued"]
+    summary = report.to_dict()
+    assert summary["blocked_requests"] == {"image": 2}
+    assert summary["bytes_avoided"] == 250000
+    assert summary["measured_blocked_requests"] == 1
+    assert summary["estimated_bytes_avoided"] == render.ESTIMATED_BYTES["image"]
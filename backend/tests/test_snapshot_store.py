@@ -0,0 +1,54 @@
+import os
+import time
+
+from snapshot_store import SnapshotStore
+
+def test_save_load_and_deduplicate(tmp_path):
+    store = SnapshotStore(directory=str(tmp_path), codec="zlib")
+    first = store.save("https://a.test/", "basic", "<p>same</p>", ["x.js"], [])
+    second = store.save("https://a.test/", "basic", "<p>same</p>", [], [])
+    assert store.deduplicated == 1
+    assert store.load(first).result() == ("<p>same</p>", ["x.js"], [])
+    assert store.load(second).html == "<p>same</p>"
+    assert store.load("missing") is None
+
+def test_prune_removes_expired_snapshots_and_their_blobs(tmp_path):
+    store = SnapshotStore(directory=str(tmp_path), codec="zlib", max_age_days=1)
+    old = store.save("https://a.test/", "basic", "<p>old</p>", [], [])
+    kept = store.save("https://a.test/", "basic", "<p>new</p>", [], [])
+    with store._lock:
+        store._connect().execute("UPDATE snapshots SET fetched_at = ? WHERE id = ?", (time.time() - 2 * 86400, old))
+    old_blob = store._blob_path(store.load(old).content_hash)
+
+    assert store.prune() == 1
+    assert store.load(old) is None
+    assert not os.path.exists(old_blob)
+    assert store.load(kept).html == "<p>new</p>"
+
+def test_prune_keeps_newest_snapshots_within_byte_cap(tmp_path):
+    store = SnapshotStore(directory=str(tmp_path), codec="zlib", max_bytes=10 ** 9)
+    ids = [store.save(f"https://a.test/{i}", "basic", os.urandom(2000).hex(), [], []) for i in range(5)]
+    sizes = [row["stored_bytes"] for row in store.list(limit=5)]
+    store.max_bytes = sum(sizes[:2])
+
+    store.prune()
+    assert [store.load(snapshot_id) is not None for snapshot_id in ids] == [False, False, False, True, True]
+    assert store.get_stats()["stored_bytes"] <= store.max_bytes
+
+def test_workers_saving_the_same_page_share_one_blob(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Separate stores on one directory stand in for worker processes (own connection, own lock)
+    workers = [SnapshotStore(directory=str(tmp_path), codec="zlib") for _ in range(4)]
+    page = "<html>" + "shared page " * 500 + "</html>"
+
+    def save(i):
+        return workers[i % len(workers)].save(f"https://a.test/{i}", "basic", page, [], [])
+
+    with ThreadPoolExecutor(8) as pool:
+        ids = list(pool.map(save, range(40)))
+
+    assert all(workers[0].load(snapshot_id).html == page for snapshot_id in ids)
+    stats = workers[0].get_stats()
+    assert (stats["snapshots"], stats["blobs"]) == (40, 1)
+    assert sum(worker.deduplicated for worker in workers) == 39
@@ -0,0 +1,145 @@
+import asyncio
+import time
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional
+
+from fastapi import HTTPException
+
+import stats
+from startup_profile import startup_profiler
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+class Component:
+    """A heavy dependency that is loaded in the background after startup."""
+
+    def __init__(self, name: str, loader: Callable[[], Any], fork_safe: bool = True):
+        self.name = name
+        self.loader = loader
+        # Fork-unsafe components (network clients, browsers) must be re-created per worker
+        self.fork_safe = fork_safe
+        self.status = PENDING
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+class Warmup:
+    """
+    Ordered background warm-up of models and API clients.
+    Components are loaded one after another in registration order, so the
+    app can answer /health immediately while routers report "warming"
+    until their own dependencies are in place.
+    """
+
+    def __init__(self):
+        self._components: "OrderedDict[str, Component]" = OrderedDict()
+        self._routers: Dict[str, List[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, loader: Callable[[], Any], fork_safe: bool = True):
+        """Register a component; components warm up in registration order."""
+        self._components[name] = Component(name, loader, fork_safe)
+
+    def declare_router(self, router: str, components: List[str]):
+        """Declare which components a router needs before it is ready."""
+        self._routers[router] = list(components)
+
+    def _load(self, component: Component):
+        if component.status == READY:
+            return
+        component.status = WARMING
+        start = time.perf_counter()
+        try:
+            with startup_profiler.measure(component.name, kind="warmup"):
+                component.loader()
+            component.status = READY
+            component.error = None
+        except Exception as e:
+            component.status = FAILED
+            component.error = str(e)
+            logger.error(f"❌ Warm-up of '{component.name}' failed: {e}")
+        finally:
+            component.seconds = time.perf_counter() - start
+        logger.info(f"Warm-up: {component.name} {component.status} in {component.seconds:.2f}s")
+
+    def run_sync(self, names: Optional[List[str]] = None):
+        """Load components synchronously (used before forking workers)."""
+        for name, component in self._components.items():
+            if names is None or name in names:
+                self._load(component)
+
+    async def run(self):
+        """Load all pending components in order without blocking the event loop."""
+        start = time.perf_counter()
+        for component in self._components.values():
+            if component.status != READY:
+                await asyncio.to_thread(self._load, component)
+        logger.info(f"✅ Warm-up finished in {time.perf_counter() - start:.2f}s")
+
+    def start(self) -> asyncio.Task:
+        """Start background warm-up on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        """Cancel an in-flight warm-up (loaders already running finish in their thread)."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def reset_fork_unsafe(self):
+        """Mark fork-unsafe components pending again so a forked worker re-creates them."""
+        for component in self._components.values():
+            if not component.fork_safe:
+                component.status = PENDING
+                component.seconds = None
+
+    def router_status(self, router: str) -> str:
+        """Readiness of a router: warming, ready or degraded (a dependency failed)."""
+        names = self._routers.get(router, [])
+        components = [self._components[name] for name in names if name in self._components]
+        if any(c.status in (PENDING, WARMING) for c in components):
+            return WARMING
+        if any(c.status == FAILED for c in components):
+            return "degraded"
+        return READY
+
+    def require(self, router: str):
+        """FastAPI dependency that answers 503 while a router is still warming."""
+        def dependency():
+            if self.router_status(router) == WARMING:
+                raise HTTPException(
+                    status_code=503,
+                    detail={"status": WARMING, "router": router, "components": self.report()["components"]}
+                )
+        return dependency
+
+    def report(self) -> Dict[str, Any]:
+        """Per-component status and load time, plus per-router readiness."""
+        return {
+            "components": {
+                name: {
+                    "status": c.status,
+                    "seconds": round(c.seconds, 3) if c.seconds is not None else None,
+                    "fork_safe": c.fork_safe,
+                    **({"error": c.error} if c.error else {})
+                }
+                for name, c in self._components.items()
+            },
+            "routers": {router: self.router_status(router) for router in self._routers}
+        }
+
+# Create singleton warm-up instance
+warmup = Warmup()
+
+stats.register("warmup", warmup.report)